@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AssetsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.assets'
+    verbose_name = 'Assets'
+
+    def ready(self):
+        from . import signals  # Connects the receivers
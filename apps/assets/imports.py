@@ -0,0 +1,481 @@
+import codecs
+import csv
+import os
+import time
+from collections import Counter as Tally, defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from apps.categories.models import Category
+from apps.categories.tree import CategoryTree, to_cents
+from apps.departments.models import Department
+from apps.reports.dashboard import DashboardService
+from apps.reports.metrics import MetricsRollupService
+from apps.tags.models import Tag
+from core.cache_tags import TaggedCache, model_tag
+from core.constants import ASSET_STATUS_AVAILABLE, ASSET_STATUS_CHOICES
+from core.counters import TAG_ASSETS, CounterService
+from core.sequences import allocate_ids
+from .models import Asset
+from .search import bump_generation
+from .signals import ASSET_COUNTERS
+
+AssetTag = Asset.tags.through
+
+# Rows validated and inserted per transaction
+IMPORT_BATCH_SIZE = 5000
+
+# Row errors kept in the report; the failed count covers them all
+MAX_REPORTED_ERRORS = 1000
+
+# Normalised header -> column; the asset export's headers are accepted too
+COLUMN_ALIASES = {
+    'asset_id': 'asset_id',
+    'name': 'name',
+    'description': 'description',
+    'category': 'category',
+    'department': 'department',
+    'status': 'asset_status',
+    'asset_status': 'asset_status',
+    'purchase_date': 'purchase_date',
+    'purchase_price': 'purchase_price',
+    'manufacturer': 'manufacturer',
+    'model_number': 'model_number',
+    'serial_number': 'serial_number',
+    'warranty_expiry': 'warranty_expiry',
+    'location': 'location',
+    'tags': 'tags',
+}
+
+REQUIRED_COLUMNS = ('name', 'category', 'purchase_date', 'purchase_price')
+
+TEXT_COLUMNS = {
+    'asset_id': 20,
+    'name': 255,
+    'description': None,
+    'manufacturer': 100,
+    'model_number': 50,
+    'serial_number': 50,
+    'location': 100,
+}
+
+# Values of each valid row, in this order, as handed to AssetImport.insert
+IMPORTED_COLUMNS = (
+    'asset_id', 'name', 'description', 'category_id', 'department_id',
+    'asset_status', 'purchase_date', 'purchase_price', 'manufacturer',
+    'model_number', 'serial_number', 'warranty_expiry', 'location',
+)
+
+ASSET_STATUSES = {value for value, _ in ASSET_STATUS_CHOICES}
+
+# Largest price the purchase_price column holds (10 digits, 2 decimals)
+MAX_PRICE = Decimal('99999999.99')
+
+
+def normalise_header(header):
+    return str(header or '').strip().lower().replace(' ', '_')
+
+
+def lookup_key(value):
+    # Matches SQL LOWER(), which SQLite applies to ASCII only
+    return str(value).strip().lower()
+
+
+def parse_name(value):
+    return '' if value is None else lookup_key(value)
+
+
+def parse_text(value, max_length):
+    value = '' if value is None else str(value).strip()
+    if max_length and len(value) > max_length:
+        raise ValueError(f"Longer than {max_length} characters")
+    return value
+
+
+def parse_date(value):
+    if value in (None, ''):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError("Expected a YYYY-MM-DD date")
+
+
+def parse_price(value):
+    if value in (None, ''):
+        raise ValueError("This field is required")
+    try:
+        price = Decimal(str(value).strip().replace(',', ''))
+        price = price.quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError("Expected a number")
+    if not 0 <= price <= MAX_PRICE:
+        raise ValueError(f"Must be between 0 and {MAX_PRICE}")
+    return price
+
+
+def split_tags(value):
+    if value in (None, ''):
+        return []
+    return [
+        tag.strip() for tag in str(value).replace(';', ',').split(',') if tag.strip()
+    ]
+
+
+class AssetImport:
+    """
+    Imports assets from a CSV or XLSX file.
+
+    The file is read row by row and handled ``batch_size`` rows at a time:
+    each column of the batch is parsed in one pass, category, department
+    and tag names (or codes) are resolved with one query per model for
+    the names not seen in earlier batches, and given asset IDs are checked
+    with one query while missing ones are allocated as one block. Valid
+    rows are inserted in bulk, together with their tag links and counter
+    updates, in one transaction per batch; invalid rows are skipped and
+    reported with their line number. With ``dry_run`` nothing is written.
+
+    QR codes are left to be generated on first use
+    (``QRCodeService.ensure``), and other processes' search indexes catch
+    up through the generation counter.
+    """
+
+    def __init__(self, user=None, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+        self.user = user
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        # Lookup key -> pk, None for names known not to exist
+        self.resolved = {Category: {}, Department: {}, Tag: {}}
+        self.seen_ids = set()
+        self.total = self.valid = self.imported = self.failed = 0
+        self.errors = []
+
+    def run(self, fileobj, name=None, file_format=None):
+        """Import a file; returns the import report"""
+        started = time.monotonic()
+        file_format = file_format or self.detect_format(name or getattr(fileobj, 'name', ''))
+        rows = self.read(fileobj, file_format)
+        header = next(rows, None)
+        if header is None:
+            raise ValidationError("The file is empty")
+        columns, ignored = self.map_columns(header)
+
+        batch = []
+        for line, values in enumerate(rows, 2):
+            if not any(value not in (None, '') for value in values):
+                continue
+            batch.append((line, values))
+            if len(batch) == self.batch_size:
+                self.process(batch, columns)
+                batch = []
+        if batch:
+            self.process(batch, columns)
+
+        seconds = time.monotonic() - started
+        return {
+            'dry_run': self.dry_run,
+            'total': self.total,
+            'valid': self.valid,
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'ignored_columns': ignored,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(self.total / seconds) if seconds else None,
+        }
+
+    @staticmethod
+    def detect_format(name):
+        extension = os.path.splitext(name)[1].lower()
+        if extension == '.csv':
+            return 'CSV'
+        if extension in ('.xlsx', '.xlsm'):
+            return 'EXCEL'
+        raise ValidationError("Unsupported file type, expected .csv or .xlsx")
+
+    @staticmethod
+    def read(fileobj, file_format):
+        """Yield the header, then every row, as lists of cell values"""
+        if file_format == 'CSV':
+            try:
+                yield from csv.reader(codecs.iterdecode(fileobj, 'utf-8-sig'))
+            except (UnicodeDecodeError, csv.Error) as e:
+                # Batches before the unreadable line are already imported
+                raise ValidationError(f"Could not read the CSV file: {e}")
+        elif file_format == 'EXCEL':
+            from openpyxl import load_workbook
+
+            workbook = load_workbook(fileobj, read_only=True, data_only=True)
+            try:
+                for row in workbook.active.iter_rows(values_only=True):
+                    yield list(row)
+            finally:
+                workbook.close()
+        else:
+            raise ValidationError(f"Unsupported import format: {file_format}")
+
+    @staticmethod
+    def map_columns(header):
+        """Return ``{column: index}`` and the headers that were ignored"""
+        columns, ignored = {}, []
+        for index, title in enumerate(header):
+            column = COLUMN_ALIASES.get(normalise_header(title))
+            if column is None or column in columns:
+                if title not in (None, ''):
+                    ignored.append(str(title))
+                continue
+            columns[column] = index
+        missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+        if missing:
+            raise ValidationError(f"Missing columns: {', '.join(missing)}")
+        return columns, ignored
+
+    def process(self, batch, columns):
+        self.total += len(batch)
+        errors = [{} for _ in batch]
+
+        def column(name, parse):
+            index = columns.get(name)
+            if index is None:
+                # Absent columns parse to the same default on every row
+                return [parse(None)] * len(batch)
+            parsed = []
+            for position, (_, values) in enumerate(batch):
+                value = values[index] if index < len(values) else None
+                try:
+                    parsed.append(parse(value))
+                except ValueError as e:
+                    errors[position][name] = str(e)
+                    parsed.append(None)
+            return parsed
+
+        fields = {
+            name: column(name, lambda value, limit=limit: parse_text(value, limit))
+            for name, limit in TEXT_COLUMNS.items()
+        }
+        for position, value in enumerate(fields['name']):
+            if value == '':
+                errors[position]['name'] = "This field is required"
+        fields['purchase_date'] = column('purchase_date', parse_date)
+        for position, value in enumerate(fields['purchase_date']):
+            if value is None and 'purchase_date' not in errors[position]:
+                errors[position]['purchase_date'] = "This field is required"
+        fields['warranty_expiry'] = column('warranty_expiry', parse_date)
+        fields['purchase_price'] = column('purchase_price', parse_price)
+        fields['asset_status'] = column('asset_status', self.parse_status)
+
+        fields['category_id'] = self.resolve(
+            Category, column('category', parse_name), errors, 'category', required=True
+        )
+        fields['department_id'] = self.resolve(
+            Department, column('department', parse_name), errors, 'department'
+        )
+        tag_names = column('tags', split_tags)
+        tag_ids = self.resolve_tags(tag_names, errors)
+
+        self.check_asset_ids(fields['asset_id'], errors)
+
+        ordered = [fields[name] for name in IMPORTED_COLUMNS]
+        assets, tags = [], []
+        for position, (line, _) in enumerate(batch):
+            if errors[position]:
+                self.failed += 1
+                if len(self.errors) < MAX_REPORTED_ERRORS:
+                    self.errors.append({'row': line, 'errors': errors[position]})
+                continue
+            assets.append([values[position] for values in ordered])
+            tags.append(tag_ids[position])
+
+        self.valid += len(assets)
+        if assets and not self.dry_run:
+            # Only rows being inserted use up sequence numbers
+            missing = [row for row in assets if not row[0]]
+            for row, asset_id in zip(missing, allocate_ids('AST', len(missing))):
+                row[0] = asset_id
+            self.insert(assets, tags)
+            self.imported += len(assets)
+
+    @staticmethod
+    def parse_status(value):
+        if value in (None, ''):
+            return ASSET_STATUS_AVAILABLE
+        status = str(value).strip().upper()
+        if status not in ASSET_STATUSES:
+            raise ValueError(f"Unknown status {value!r}")
+        return status
+
+    def lookup(self, model, keys):
+        """Resolve lookup keys by name or code, querying only unseen ones"""
+        known = self.resolved[model]
+        unseen = {key for key in keys if key not in known}
+        if unseen:
+            known.update(dict.fromkeys(unseen))
+            matches = model.objects.annotate(
+                lookup_name=Lower('name'), lookup_code=Lower('code')
+            ).filter(
+                Q(lookup_name__in=unseen) | Q(lookup_code__in=unseen)
+            ).values_list('pk', 'lookup_name', 'lookup_code')
+            for pk, name, code in matches:
+                # Names win over codes that happen to look alike
+                if code in unseen and known.get(code) is None:
+                    known[code] = pk
+                if name in unseen:
+                    known[name] = pk
+        return known
+
+    def resolve(self, model, names, errors, field, required=False):
+        known = self.lookup(model, {name for name in names if name})
+        pks = []
+        for position, name in enumerate(names):
+            pk = known.get(name) if name else None
+            if name and pk is None:
+                errors[position][field] = f"Unknown {field} {name!r}"
+            elif not name and required and field not in errors[position]:
+                errors[position][field] = "This field is required"
+            pks.append(pk)
+        return pks
+
+    def resolve_tags(self, tag_names, errors):
+        keys = {lookup_key(name) for names in tag_names if names for name in names}
+        known = self.lookup(Tag, keys)
+        resolved = []
+        for position, names in enumerate(tag_names):
+            pks, unknown = [], []
+            for name in names or ():
+                pk = known.get(lookup_key(name))
+                if pk is None:
+                    unknown.append(name)
+                elif pk not in pks:
+                    pks.append(pk)
+            if unknown:
+                errors[position]['tags'] = f"Unknown tags: {', '.join(unknown)}"
+            resolved.append(pks)
+        return resolved
+
+    def check_asset_ids(self, asset_ids, errors):
+        """Reject given asset IDs repeated in the file or already stored"""
+        given = []
+        for position, asset_id in enumerate(asset_ids):
+            if not asset_id:
+                continue
+            if asset_id in self.seen_ids:
+                errors[position]['asset_id'] = f"Duplicate asset ID {asset_id}"
+            else:
+                self.seen_ids.add(asset_id)
+                given.append(position)
+        if not given:
+            return
+        taken = set(Asset.objects.filter(
+            asset_id__in=[asset_ids[position] for position in given]
+        ).values_list('asset_id', flat=True))
+        for position in given:
+            if asset_ids[position] in taken:
+                errors[position]['asset_id'] = f"Asset ID {asset_ids[position]} already exists"
+
+    def insert(self, rows, tags):
+        """
+        Insert a batch of rows, given as values in ``IMPORTED_COLUMNS`` order
+
+        Rows go through ``executemany`` rather than ``bulk_create``: the ORM
+        compiles every value of every row, which holds SQLite imports to a
+        few thousand rows a second, while only the date and decimal
+        columns need adapting here. Other columns take their model default.
+        """
+        db = connections[Asset.objects.db]
+        now = timezone.now()
+        values = {
+            'created_at': now,
+            'updated_at': now,
+            'last_modified_by_id': getattr(self.user, 'pk', None),
+        }
+        fields = [field for field in Asset._meta.concrete_fields if not field.primary_key]
+        template, slots = [], []
+        for position, field in enumerate(fields):
+            if field.attname in IMPORTED_COLUMNS:
+                adapt = column_adapter(field, db)
+                slots.append((position, IMPORTED_COLUMNS.index(field.attname), adapt))
+                template.append(None)
+            else:
+                value = values[field.attname] if field.attname in values else field.get_default()
+                template.append(field.get_db_prep_save(value, db))
+
+        records = []
+        for row in rows:
+            record = template.copy()
+            for position, index, adapt in slots:
+                value = row[index]
+                record[position] = adapt(value) if adapt and value is not None else value
+            records.append(record)
+
+        with transaction.atomic(using=db.alias):
+            insert_rows(db, Asset, [field.column for field in fields], records)
+            asset_pks = dict(Asset.objects.filter(
+                asset_id__in=[row[0] for row in rows]
+            ).values_list('asset_id', 'pk'))
+            if any(tags):
+                insert_rows(db, AssetTag, ['asset_id', 'tag_id'], [
+                    (asset_pks[row[0]], tag_id)
+                    for row, tag_ids in zip(rows, tags)
+                    for tag_id in tag_ids
+                ])
+            for name, attname in ASSET_COUNTERS.items():
+                index = IMPORTED_COLUMNS.index(attname)
+                CounterService.apply(name, Tally(row[index] for row in rows))
+            CounterService.apply(TAG_ASSETS, Tally(pk for pks in tags for pk in pks))
+            CategoryTree.apply_assets(category_totals(rows))
+            MetricsRollupService.add_assets(list(asset_pks.values()))
+            # Raw inserts send no signals for track_model or the dashboard
+            TaggedCache.invalidate(model_tag(Asset), model_tag(Tag))
+            DashboardService.invalidate()
+            transaction.on_commit(bump_generation)
+
+
+def category_totals(rows):
+    """``{category_id: (assets, cents)}`` of imported rows"""
+    category_index = IMPORTED_COLUMNS.index('category_id')
+    price_index = IMPORTED_COLUMNS.index('purchase_price')
+    totals = defaultdict(lambda: (0, 0))
+    for row in rows:
+        count, cents = totals[row[category_index]]
+        totals[row[category_index]] = (count + 1, cents + to_cents(row[price_index]))
+    return totals
+
+
+def column_adapter(field, db):
+    """Return the function adapting imported values for ``field``, if any"""
+    internal_type = field.get_internal_type()
+    if internal_type in ('CharField', 'TextField', 'ForeignKey'):
+        return None
+    if internal_type == 'DateField':
+        return db.ops.adapt_datefield_value
+    if internal_type == 'DecimalField':
+        return partial(
+            db.ops.adapt_decimalfield_value,
+            max_digits=field.max_digits,
+            decimal_places=field.decimal_places,
+        )
+    return partial(field.get_db_prep_save, connection=db)
+
+
+def insert_rows(db, model, columns, rows):
+    """INSERT already adapted rows into ``model``'s table in one executemany"""
+    quote = db.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(column) for column in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+    with db.cursor() as cursor:
+        cursor.executemany(sql, rows)
@@ -0,0 +1,99 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+
+from apps.assets.models import Asset
+from apps.assets.services import QRCodeService
+from core.qrcodes import get_qr_cache, render_qr_png
+
+
+class Command(BaseCommand):
+    help = (
+        'Render QR codes for assets whose code is missing or stale, moving '
+        'assets off legacy per-asset files into the shared QR cache'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of rendering processes (default: CPU count)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Assets rendered and stored per batch'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-render every code, replacing files already in the QR cache'
+        )
+
+    def handle(self, *args, **options):
+        assets = Asset.objects.only('pk', 'asset_id', 'name', 'qr_code')
+        total = assets.count()
+        if not total:
+            self.stdout.write(self.style.SUCCESS('No QR codes to generate'))
+            return
+
+        self.stdout.write(
+            f"Checking {total} assets with {options['workers']} workers..."
+        )
+        checked = updated = rendered = 0
+        last_pk = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            # Keyset batches, so no read cursor stays open while we write
+            while True:
+                batch = list(
+                    assets.filter(pk__gt=last_pk)
+                    .order_by('pk')[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                batch_updated, batch_rendered = self.process_batch(
+                    pool, batch, options['workers'], options['all']
+                )
+                checked += len(batch)
+                updated += batch_updated
+                rendered += batch_rendered
+                last_pk = batch[-1].pk
+                self.stdout.write(f'  {checked}/{total}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {updated} QR codes ({rendered} rendered, '
+            f'{updated - rendered} reused from the cache)'
+        ))
+
+    def process_batch(self, pool, batch, workers, force):
+        """Point stale assets at cached codes, rendering misses in the pool"""
+        cache = get_qr_cache()
+        stale = [
+            asset for asset in batch
+            if force or not QRCodeService.is_current(asset)
+        ]
+        if not stale:
+            return 0, 0
+
+        # Several assets may share a payload, render each one once
+        missing = sorted({
+            asset.qr_payload for asset in stale
+            if force or not cache.exists(asset.qr_payload)
+        })
+        chunksize = max(1, len(missing) // (workers * 4))
+        render = partial(render_qr_png, options=cache.options)
+        pngs = pool.map(render, missing, chunksize=chunksize)
+        for payload, png in zip(missing, pngs):
+            # Other assets may point at the file: swap it, never delete it
+            (cache.replace if force else cache.put)(payload, png)
+
+        previous = [asset.qr_code.name for asset in stale]
+        for asset in stale:
+            asset.qr_code.name = cache.path_for(asset.qr_payload)
+        Asset.objects.bulk_update(stale, ['qr_code'])
+        QRCodeService.release(previous)
+        return len(stale), len(missing)
@@ -0,0 +1,47 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.assets.imports import IMPORT_BATCH_SIZE, AssetImport
+
+
+class Command(BaseCommand):
+    help = 'Import assets from a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file to import')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file without creating any assets'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Rows validated and inserted per transaction'
+        )
+
+    def handle(self, *args, **options):
+        importer = AssetImport(
+            dry_run=options['dry_run'], batch_size=options['batch_size']
+        )
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                report = importer.run(fileobj, name=options['path'])
+        except (OSError, ValidationError) as e:
+            raise CommandError(str(e))
+
+        for error in report['errors']:
+            details = '; '.join(f'{field}: {message}' for field, message in error['errors'].items())
+            self.stderr.write(f"Row {error['row']}: {details}")
+        if report['errors_truncated']:
+            self.stderr.write(f"... {report['failed'] - len(report['errors'])} more invalid rows")
+        if report['ignored_columns']:
+            self.stdout.write(f"Ignored columns: {', '.join(report['ignored_columns'])}")
+
+        verb = 'Validated' if report['dry_run'] else 'Imported'
+        count = report['valid'] if report['dry_run'] else report['imported']
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {count} of {report['total']} rows in {report['seconds']:.2f}s "
+            f"({report['rows_per_second']} rows/s), {report['failed']} invalid"
+        ))
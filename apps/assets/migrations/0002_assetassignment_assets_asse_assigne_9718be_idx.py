@@ -0,0 +1,20 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0001_initial'),
+        ('users', '0004_userprofile_last_activity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assetassignment',
+            index=models.Index(fields=['assigned_date'], name='assets_asse_assigne_9718be_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0002_assetassignment_assets_asse_assigne_9718be_idx'),
+        ('categories', '0001_initial'),
+        ('departments', '0001_initial'),
+        ('tags', '0001_initial'),
+        ('users', '0005_useractivitylog_users_usera_timesta_aabea0_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['created_at'], name='assets_asse_created_6d1779_idx'),
+        ),
+    ]
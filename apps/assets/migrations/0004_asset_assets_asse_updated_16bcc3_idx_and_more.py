@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0003_asset_assets_asse_created_6d1779_idx'),
+        ('categories', '0001_initial'),
+        ('departments', '0001_initial'),
+        ('tags', '0001_initial'),
+        ('users', '0005_useractivitylog_users_usera_timesta_aabea0_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['updated_at'], name='assets_asse_updated_16bcc3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assetassignment',
+            index=models.Index(fields=['updated_at'], name='assets_asse_updated_9e3df0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assetmaintenance',
+            index=models.Index(fields=['updated_at'], name='assets_asse_updated_9205c0_idx'),
+        ),
+    ]
@@ -1,14 +1,10 @@
 from django.db import models
 from core.models import AuditableModel
-from core.utils import generate_unique_id
+from core.sequences import next_id, register_id_prefix
 from core.constants import ASSET_STATUS_CHOICES, ASSET_STATUS_AVAILABLE
 from django.core.validators import MinValueValidator
+from django.db import transaction
 from decimal import Decimal
-import qrcode
-from io import BytesIO
-from django.core.files import File
-from PIL import Image
-from django.core.files.uploadedfile import InMemoryUploadedFile
 
 ASSET_REQUEST_STATUS_CHOICES = [
     ('PENDING', 'Pending'),
@@ -74,6 +70,8 @@ class Asset(AuditableModel):
     class Meta:
         ordering = ['-created_at']
         indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['updated_at']),
             models.Index(fields=['asset_id']),
             models.Index(fields=['asset_status']),
             models.Index(fields=['category']),
@@ -86,35 +84,24 @@ class Asset(AuditableModel):
 
     def save(self, *args, **kwargs):
         if not self.asset_id:
-            self.asset_id = generate_unique_id(prefix='AST')
-        
-        # Generate QR code if it doesn't exist
-        if not self.qr_code:
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(f'Asset ID: {self.asset_id}\nName: {self.name}')
-            qr.make(fit=True)
-
-            img = qr.make_image(fill_color="black", back_color="white")
-            buffer = BytesIO()
-            img.save(buffer, format='PNG')
-            
-            filename = f'asset_qr_{self.asset_id}.png'
-            filebuffer = InMemoryUploadedFile(
-                buffer,
-                None,
-                filename,
-                'image/png',
-                buffer.tell(),
-                None
-            )
-            self.qr_code.save(filename, filebuffer, save=False)
-        
-        super().save(*args, **kwargs)
+            self.asset_id = next_id('AST')
+
+        # post_save receivers move the maintained counters and rollups;
+        # they commit or roll back together with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+        # QR codes are rendered off the request path, and only when the
+        # payload changed, see apps.assets.services.PendingQRQueue
+        from .services import QRCodeService, get_qr_queue
+        if not QRCodeService.is_current(self):
+            pk = self.pk
+            transaction.on_commit(lambda: get_qr_queue().enqueue(pk))
+
+    @property
+    def qr_payload(self):
+        """Data encoded in the asset's QR code"""
+        return f'Asset ID: {self.asset_id}\nName: {self.name}'
 
     @property
     def current_value(self):
@@ -122,6 +109,8 @@ class Asset(AuditableModel):
         # Implement depreciation calculation logic
         return self.purchase_price
 
+register_id_prefix('AST', Asset, 'asset_id')
+
 class AssetMaintenance(AuditableModel):
     """Model for tracking asset maintenance records"""
     MAINTENANCE_TYPES = [
@@ -169,7 +158,7 @@ class AssetMaintenance(AuditableModel):
 
     def save(self, *args, **kwargs):
         if not self.maintenance_id:
-            self.maintenance_id = generate_unique_id(prefix='MNT')
+            self.maintenance_id = next_id('MNT')
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -179,10 +168,13 @@ class AssetMaintenance(AuditableModel):
         ordering = ['-maintenance_date']
         indexes = [
             models.Index(fields=['maintenance_date']),
+            models.Index(fields=['updated_at']),
             models.Index(fields=['maintenance_type']),
             models.Index(fields=['maintenance_id']),
         ]
 
+register_id_prefix('MNT', AssetMaintenance, 'maintenance_id')
+
 class AssetAssignment(AuditableModel):
     """
     Track asset assignments history
@@ -213,6 +205,10 @@ class AssetAssignment(AuditableModel):
 
     class Meta:
         ordering = ['-assigned_date']
+        indexes = [
+            models.Index(fields=['assigned_date']),
+            models.Index(fields=['updated_at']),
+        ]
 
 class AssetRequest(AuditableModel):
     """
@@ -0,0 +1,315 @@
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rapidfuzz import fuzz, process
+
+from .models import Asset
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = (
+    'name',
+    'asset_id',
+    'serial_number',
+    'manufacturer',
+    'model_number',
+    'location',
+)
+
+ASSET_SEARCH_DEFAULTS = {
+    'LIMIT': 200,
+    'SCORE_CUTOFF': 70,
+    'SYNC_INTERVAL': 1.0,
+}
+
+GENERATION_KEY = 'asset_search_generation'
+REBUILD_KEY = 'asset_search_rebuild'
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Re-read rows updated this long before the last sync, to catch writes
+# whose transaction committed after that sync had started
+SYNC_SLACK = timedelta(seconds=60)
+
+# Trigrams shared by more than this share of the vocabulary (e.g. the
+# "ast" of every asset_id) are too unselective to find candidates with
+STOP_GRAM_RATIO = 0.2
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def trigrams(token):
+    padded = f' {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AssetSearchIndex:
+    """
+    In-memory fuzzy search index over the asset fields in SEARCH_FIELDS.
+
+    Tokens are indexed by trigram. A query token first collects candidate
+    vocabulary tokens that share enough trigrams with it, then RapidFuzz
+    scores only those candidates, so a lookup stays in the low
+    milliseconds regardless of the number of assets. Like the icontains
+    filter this replaced, a token also matches every token it is part of,
+    e.g. the middle of a serial number.
+
+    Each process keeps its own copy. Writes update it through signals and
+    bump a generation in the cache; other processes notice the new
+    generation on their next search and pull changed rows.
+    """
+
+    def __init__(self, limit=200, score_cutoff=70, sync_interval=1.0):
+        self.limit = limit
+        self.score_cutoff = score_cutoff
+        self.sync_interval = sync_interval
+        self._lock = threading.RLock()
+        self._reset()
+
+    @classmethod
+    def from_settings(cls):
+        """Build an index from the ``ASSET_SEARCH`` setting"""
+        options = {
+            **ASSET_SEARCH_DEFAULTS,
+            **getattr(settings, 'ASSET_SEARCH', {}),
+        }
+        return cls(
+            limit=options['LIMIT'],
+            score_cutoff=options['SCORE_CUTOFF'],
+            sync_interval=options['SYNC_INTERVAL'],
+        )
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def __len__(self):
+        return len(self._documents)
+
+    def rebuild(self):
+        """Load every asset from the database"""
+        started = timezone.now()
+        rows = Asset.objects.order_by().values_list('pk', *SEARCH_FIELDS)
+        with self._lock:
+            self._reset()
+            for pk, *values in rows.iterator(chunk_size=2000):
+                self._add(pk, values)
+            self._loaded = True
+            self._synced_at = started
+            self._generation = cache.get(GENERATION_KEY)
+            self._rebuild_generation = cache.get(REBUILD_KEY)
+            self._checked_at = time.monotonic()
+        return len(self._documents)
+
+    def upsert(self, asset):
+        """Index an asset or refresh its entry"""
+        with self._lock:
+            if not self._loaded:
+                return
+            self._remove(asset.pk)
+            self._add(asset.pk, [getattr(asset, field) for field in SEARCH_FIELDS])
+
+    def remove(self, pk):
+        with self._lock:
+            if self._loaded:
+                self._remove(pk)
+
+    def search(self, query, limit=None, score_cutoff=None):
+        """
+        Return ``[(pk, score), ...]`` best first
+
+        Typos and fragments of tokens match; a document has to match
+        every query token and scores the mean of its best matches. At
+        most ``limit`` results are returned, every match for ``limit=0``.
+        """
+        limit = self.limit if limit is None else limit
+        score_cutoff = self.score_cutoff if score_cutoff is None else score_cutoff
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens:
+            return []
+
+        self.ensure_current()
+        with self._lock:
+            per_token = []
+            for token in query_tokens:
+                # Ascending, so a document keeps its best matching score
+                matches = sorted(
+                    self._match_token(token, score_cutoff),
+                    key=lambda match: match[1]
+                )
+                best = {}
+                for vocab_id, score in matches:
+                    best.update(dict.fromkeys(self._postings[vocab_id], score))
+                if not best:
+                    return []
+                per_token.append(best)
+
+        # Every query token has to match somewhere in the document
+        per_token.sort(key=len)
+        if len(per_token) == 1:
+            scored = per_token[0].items()
+        else:
+            found = set(per_token[0]).intersection(*per_token[1:])
+            scored = (
+                (pk, sum(best[pk] for best in per_token) / len(per_token))
+                for pk in found
+            )
+        key = lambda result: (result[1], -result[0])
+        if not limit:
+            return sorted(scored, key=key, reverse=True)
+        return heapq.nlargest(limit, scored, key=key)
+
+    def ensure_current(self):
+        """Load the index, or catch up with writes made by other processes"""
+        if not self._loaded:
+            self.rebuild()
+            return
+        if time.monotonic() - self._checked_at < self.sync_interval:
+            return
+
+        self._checked_at = time.monotonic()
+        if cache.get(REBUILD_KEY) != self._rebuild_generation:
+            self.rebuild()
+            return
+        generation = cache.get(GENERATION_KEY)
+        if generation != self._generation:
+            self.sync()
+            self._generation = generation
+
+    def sync(self):
+        """Pull assets changed since the last sync and drop deleted ones"""
+        started = timezone.now()
+        changed = Asset.objects.filter(
+            updated_at__gte=self._synced_at - SYNC_SLACK
+        ).order_by().values_list('pk', *SEARCH_FIELDS)
+        with self._lock:
+            for pk, *values in changed:
+                self._remove(pk)
+                self._add(pk, values)
+            if Asset.objects.count() != len(self._documents):
+                existing = set(Asset.objects.values_list('pk', flat=True))
+                for pk in set(self._documents) - existing:
+                    self._remove(pk)
+            self._synced_at = started
+
+    def _match_token(self, token, score_cutoff):
+        """Vocabulary tokens similar to ``token``, with their scores"""
+        grams = trigrams(token)
+        stop = max(1, int(len(self._vocabulary) * STOP_GRAM_RATIO))
+        postings = [self._grams[gram] for gram in grams if gram in self._grams]
+        selective = [ids for ids in postings if len(ids) <= stop] or postings
+
+        shared = Counter()
+        for ids in selective:
+            shared.update(ids)
+        needed = max(1, len(selective) // 3)
+        candidates = {
+            self._tokens[vocab_id]: vocab_id
+            for vocab_id, count in shared.items()
+            if count >= needed and self._postings[vocab_id]
+        }
+        matches = {
+            candidates[match]: score
+            for match, score, _ in process.extract(
+                token, list(candidates), scorer=fuzz.ratio,
+                limit=None, score_cutoff=score_cutoff
+            )
+        } if candidates else {}
+        # A token still being typed should match what it is a prefix of,
+        # and any fragment what it is part of, below the prefixes
+        for vocab_id in self._containing(token):
+            if not self._postings[vocab_id]:
+                continue
+            candidate = self._tokens[vocab_id]
+            base = 90 if candidate.startswith(token) else 80
+            fragment_score = base + 10 * len(token) / len(candidate)
+            matches[vocab_id] = max(matches.get(vocab_id, 0), fragment_score)
+        return matches.items()
+
+    def _containing(self, token):
+        """Ids of the vocabulary tokens that contain ``token``"""
+        # The vocabulary only grows until the next reset: append the new
+        # tokens to one newline separated string and search that
+        if self._text_size < len(self._tokens):
+            added = self._tokens[self._text_size:]
+            offset = len(self._text)
+            for vocab_token in added:
+                self._text_starts.append(offset)
+                offset += len(vocab_token) + 1
+            self._text += ''.join(f'{vocab_token}\n' for vocab_token in added)
+            self._text_size = len(self._tokens)
+
+        return {
+            bisect.bisect_right(self._text_starts, match.start()) - 1
+            for match in re.finditer(re.escape(token), self._text)
+        }
+
+    def _add(self, pk, values):
+        tokens = set()
+        for value in values:
+            tokens.update(tokenize(value))
+        vocab_ids = []
+        for token in tokens:
+            vocab_id = self._vocabulary.get(token)
+            if vocab_id is None:
+                vocab_id = len(self._tokens)
+                self._vocabulary[token] = vocab_id
+                self._tokens.append(token)
+                self._postings.append(set())
+                for gram in trigrams(token):
+                    self._grams[gram].append(vocab_id)
+            self._postings[vocab_id].add(pk)
+            vocab_ids.append(vocab_id)
+        self._documents[pk] = vocab_ids
+
+    def _remove(self, pk):
+        for vocab_id in self._documents.pop(pk, ()):
+            self._postings[vocab_id].discard(pk)
+
+    def _reset(self):
+        self._vocabulary = {}
+        self._tokens = []
+        self._postings = []
+        self._grams = defaultdict(list)
+        self._documents = {}
+        self._text = ''
+        self._text_starts = []
+        self._text_size = 0
+        self._loaded = False
+        self._synced_at = None
+        self._generation = None
+        self._rebuild_generation = None
+        self._checked_at = 0.0
+
+
+def bump_generation(key=GENERATION_KEY):
+    """Tell other processes their copy of the index is out of date"""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """Return the process-wide asset search index"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = AssetSearchIndex.from_settings()
+    return _index
@@ -1,9 +1,16 @@
+from django.urls import reverse
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from .models import Asset, AssetMaintenance, AssetAssignment, AssetRequest
 from apps.categories.serializers import CategorySerializer
 from apps.departments.serializers import DepartmentSerializer
 from apps.users.serializers import UserProfileSerializer
 from apps.tags.serializers import TagSerializer
+from core.serializers import ExpandableFieldsMixin
+
+# History records embedded in the asset detail representation; matches
+# the API page size so the "next" link points at page 2
+HISTORY_PAGE_SIZE = api_settings.PAGE_SIZE or 10
 
 class AssetMaintenanceSerializer(serializers.ModelSerializer):
     class Meta:
@@ -15,7 +22,55 @@ class AssetAssignmentSerializer(serializers.ModelSerializer):
         model = AssetAssignment
         fields = '__all__'
 
+class AssetListSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    """
+    Flat list representation: related objects as ids and names.
+
+    ``?expand=category,department,assigned_to,tags`` swaps in the nested
+    serializers for the requested relations.
+    """
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    department_name = serializers.CharField(
+        source='department.name',
+        read_only=True,
+        default=None
+    )
+    assigned_to_name = serializers.SerializerMethodField()
+    tags = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    expandable_fields = {
+        'category': (CategorySerializer, {}),
+        'department': (DepartmentSerializer, {}),
+        'assigned_to': (UserProfileSerializer, {}),
+        'tags': (TagSerializer, {'many': True}),
+    }
+
+    class Meta:
+        model = Asset
+        fields = (
+            'id', 'asset_id', 'name', 'asset_status',
+            'category', 'category_name',
+            'department', 'department_name',
+            'assigned_to', 'assigned_to_name',
+            'tags', 'purchase_date', 'purchase_price',
+            'manufacturer', 'model_number', 'serial_number', 'location',
+            'qr_code', 'created_at', 'updated_at'
+        )
+        read_only_fields = fields
+
+    def get_assigned_to_name(self, obj):
+        if not obj.assigned_to:
+            return None
+        user = obj.assigned_to.user
+        return f"{user.firstName} {user.lastName}".strip() or user.username
+
 class AssetSerializer(serializers.ModelSerializer):
+    """
+    Detail representation.
+
+    History collections only carry their first page, the rest is served
+    by the paginated ``maintenance-records`` and ``assignments`` actions.
+    """
     category = CategorySerializer(read_only=True)
     department = DepartmentSerializer(read_only=True)
     assigned_to = UserProfileSerializer(read_only=True)
@@ -25,20 +80,49 @@ class AssetSerializer(serializers.ModelSerializer):
         decimal_places=2, 
         read_only=True
     )
-    maintenance_records = AssetMaintenanceSerializer(
-        many=True, 
-        read_only=True
-    )
-    assignment_history = AssetAssignmentSerializer(
-        many=True, 
-        read_only=True
-    )
+    maintenance_records = serializers.SerializerMethodField()
+    assignment_history = serializers.SerializerMethodField()
 
     class Meta:
         model = Asset
         fields = '__all__'
         read_only_fields = ('asset_id', 'created_at', 'updated_at')
 
+    def get_maintenance_records(self, obj):
+        return self.history_page(
+            obj.maintenance_records.all(),
+            AssetMaintenanceSerializer,
+            'assets:asset-maintenance-records',
+            obj
+        )
+
+    def get_assignment_history(self, obj):
+        return self.history_page(
+            obj.assignment_history.all(),
+            AssetAssignmentSerializer,
+            'assets:asset-assignments',
+            obj
+        )
+
+    def history_page(self, queryset, serializer_class, url_name, obj):
+        """First page of a history collection, with a link to the next one"""
+        count = queryset.count()
+        next_url = None
+        if count > HISTORY_PAGE_SIZE:
+            next_url = reverse(url_name, args=[obj.pk]) + '?page=2'
+            request = self.context.get('request')
+            if request is not None:
+                next_url = request.build_absolute_uri(next_url)
+        return {
+            'count': count,
+            'next': next_url,
+            'results': serializer_class(
+                queryset[:HISTORY_PAGE_SIZE],
+                many=True,
+                context=self.context
+            ).data,
+        }
+
 class AssetCreateUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Asset
@@ -0,0 +1,148 @@
+import logging
+import threading
+
+from core.activity import BufferedWriter
+from core.qrcodes import get_qr_cache
+from .models import Asset
+
+logger = logging.getLogger(__name__)
+
+
+class QRCodeService:
+    """
+    Service class for asset QR codes.
+
+    Files come from the shared content-addressed cache (core.qrcodes), so an
+    asset's ``qr_code`` path changes exactly when its payload does.
+    """
+
+    @staticmethod
+    def path_for(asset):
+        """Storage path of the QR code matching the asset's current payload"""
+        return get_qr_cache().path_for(asset.qr_payload)
+
+    @staticmethod
+    def is_current(asset):
+        """Whether the stored QR code still matches the asset's payload"""
+        return bool(asset.qr_code) and \
+            asset.qr_code.name == QRCodeService.path_for(asset)
+
+    @staticmethod
+    def store(asset, path):
+        """Point the asset at a stored QR code"""
+        previous = asset.qr_code.name
+        asset.qr_code.name = path
+        # Only touch the qr_code column, this is not a user edit
+        Asset.objects.filter(pk=asset.pk).update(qr_code=path)
+        QRCodeService.release([previous])
+        return asset.qr_code
+
+    @staticmethod
+    def release(paths):
+        """
+        Delete files assets were moved away from that live outside the
+        cache, e.g. under the old per-asset ``asset_qr_codes/`` naming or
+        uploaded by hand, unless an asset still points at them. Cached
+        files are shared and stay.
+        """
+        cache = get_qr_cache()
+        paths = {path for path in paths if path and not cache.owns(path)}
+        if not paths:
+            return
+        paths -= set(Asset.objects.filter(qr_code__in=paths).values_list('qr_code', flat=True))
+        for path in paths:
+            cache.storage.delete(path)
+
+    @staticmethod
+    def generate(asset):
+        """Fetch or render the QR code for a single asset and store it"""
+        return QRCodeService.store(
+            asset, get_qr_cache().get_path(asset.qr_payload)
+        )
+
+    @staticmethod
+    def ensure(asset):
+        """Return the asset's QR code, generating it now if missing or stale"""
+        if QRCodeService.is_current(asset):
+            return asset.qr_code
+        get_qr_queue().discard(asset.pk)
+        return QRCodeService.generate(asset)
+
+
+class PendingQRQueue(BufferedWriter):
+    """
+    Pending-QR queue drained by a background worker thread.
+
+    Saving an asset whose QR code is missing or stale only records the
+    primary key here (after the transaction commits); the worker brings
+    the code up to date. Anything left
+    behind, e.g. after a restart or a bulk import, is picked up by the
+    ``generate_qr_codes`` management command.
+    """
+    thread_name = 'asset-qr-worker'
+
+    def __init__(self, flush_interval=5.0, max_size=10000):
+        super().__init__(flush_interval=flush_interval)
+        self.max_size = max_size
+        self._pending = set()
+
+    def enqueue(self, asset_pk):
+        """Queue an asset for QR generation"""
+        self._reset_after_fork()
+        with self._lock:
+            if len(self._pending) >= self.max_size:
+                # The management command will catch up on what we drop here
+                return False
+            self._pending.add(asset_pk)
+        self._ensure_flusher()
+        self._wakeup.set()
+        return True
+
+    def discard(self, asset_pk):
+        with self._lock:
+            self._pending.discard(asset_pk)
+
+    def pending(self):
+        with self._lock:
+            return set(self._pending)
+
+    def flush(self):
+        """Update every queued asset whose QR code is missing or stale"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, set()
+            if not pending:
+                return 0
+
+            generated = 0
+            assets = Asset.objects.filter(pk__in=pending).only(
+                'pk', 'asset_id', 'name', 'qr_code'
+            )
+            for asset in assets:
+                if QRCodeService.is_current(asset):
+                    continue
+                try:
+                    QRCodeService.generate(asset)
+                    generated += 1
+                except Exception:
+                    logger.exception(
+                        "Failed to generate QR code for asset %s", asset.pk
+                    )
+            return generated
+
+    def _clear(self):
+        self._pending.clear()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_qr_queue():
+    """Return the process-wide pending-QR queue"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = PendingQRQueue()
+    return _queue
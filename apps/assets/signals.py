@@ -0,0 +1,206 @@
+from collections import Counter as Tally, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from apps.categories.models import Category
+from apps.categories.tree import CategoryTree, to_cents
+from apps.departments.models import Department
+from apps.tags.models import Tag
+from core.counters import (
+    ASSET_STATUS, CATEGORY_ASSETS, CATEGORY_SUBTREE_ASSETS, CATEGORY_SUBTREE_VALUE,
+    DEPARTMENT_ASSETS, TAG_ASSETS, CounterService, register_counter,
+)
+from core.cache_tags import TaggedCache, instance_tag, model_tag, track_model
+from .models import Asset, AssetAssignment, AssetMaintenance
+from .search import bump_generation, get_search_index
+
+AssetTag = Asset.tags.through
+
+track_model(Asset, parents=('category', 'department', 'assigned_to'))
+track_model(Tag)
+track_model(AssetMaintenance, parents=('asset',))
+track_model(AssetAssignment, parents=('asset',))
+
+# Counter name -> Asset attribute it counts by
+ASSET_COUNTERS = {
+    CATEGORY_ASSETS: 'category_id',
+    DEPARTMENT_ASSETS: 'department_id',
+    ASSET_STATUS: 'asset_status',
+}
+
+
+def _recount(field):
+    def compute(apps):
+        return apps.get_model('assets', 'Asset').objects.order_by().values_list(
+            field
+        ).annotate(Count('pk'))
+    return compute
+
+
+for _name, _field in ASSET_COUNTERS.items():
+    register_counter(_name, _recount(_field))
+
+register_counter(
+    TAG_ASSETS,
+    lambda apps: apps.get_model('assets', 'Asset').tags.through.objects
+    .values_list('tag_id').annotate(Count('pk'))
+)
+
+register_counter(
+    CATEGORY_SUBTREE_ASSETS,
+    lambda apps: apps.get_model('categories', 'CategoryClosure').objects
+    .values_list('ancestor_id').annotate(Count('descendant__assets'))
+)
+
+
+def _recount_subtree_value(apps):
+    totals = apps.get_model('categories', 'CategoryClosure').objects.values_list(
+        'ancestor_id'
+    ).annotate(Sum('descendant__assets__purchase_price'))
+    return ((key, to_cents(total)) for key, total in totals)
+
+
+register_counter(CATEGORY_SUBTREE_VALUE, _recount_subtree_value)
+
+
+@receiver(pre_save, sender=Asset)
+def remember_counted_values(sender, instance, **kwargs):
+    """
+    Keep the stored values so post_save can move the counters
+    """
+    instance._counted_before = None
+    if instance.pk and not instance._state.adding:
+        instance._counted_before = Asset.objects.filter(pk=instance.pk).values(
+            *ASSET_COUNTERS.values(), 'purchase_price'
+        ).first()
+
+
+@receiver(post_save, sender=Asset)
+def update_asset_counters(sender, instance, created, **kwargs):
+    """
+    Move category, department and status counters
+    """
+    before = getattr(instance, '_counted_before', None)
+    for name, field in ASSET_COUNTERS.items():
+        old = before[field] if before else None
+        new = getattr(instance, field)
+        if old == new:
+            continue
+        CounterService.increment(name, old, -1)
+        CounterService.increment(name, new, 1)
+
+
+@receiver(post_save, sender=Asset)
+def update_category_rollups(sender, instance, created, **kwargs):
+    """
+    Move the asset's count and value in the subtree totals of its
+    category and every category above it
+    """
+    before = getattr(instance, '_counted_before', None)
+    deltas = defaultdict(lambda: [0, 0])
+    if before:
+        deltas[before['category_id']][0] -= 1
+        deltas[before['category_id']][1] -= to_cents(before['purchase_price'])
+    deltas[instance.category_id][0] += 1
+    deltas[instance.category_id][1] += to_cents(instance.purchase_price)
+    # Unchanged category and price cancel out to no update at all
+    CategoryTree.apply_assets({pk: tuple(delta) for pk, delta in deltas.items()})
+
+
+@receiver(pre_delete, sender=Asset)
+def remember_asset_tags(sender, instance, **kwargs):
+    """
+    Tag links are removed by the cascade without m2m_changed
+    """
+    instance._counted_tags = list(
+        AssetTag.objects.filter(asset_id=instance.pk).values_list(
+            'tag_id', flat=True
+        )
+    )
+
+
+@receiver(post_delete, sender=Asset)
+def release_asset_counters(sender, instance, **kwargs):
+    for name, field in ASSET_COUNTERS.items():
+        CounterService.increment(name, getattr(instance, field), -1)
+    tag_ids = getattr(instance, '_counted_tags', [])
+    for tag_id in tag_ids:
+        CounterService.increment(TAG_ASSETS, tag_id, -1)
+    TaggedCache.invalidate(model_tag(Tag), *(instance_tag(Tag, pk) for pk in tag_ids))
+    CategoryTree.apply_assets({
+        instance.category_id: (-1, -to_cents(instance.purchase_price))
+    })
+
+
+@receiver(m2m_changed, sender=AssetTag)
+def update_tag_counters(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep per-tag asset counts in step with Asset.tags changes
+
+    ``pk_set`` is already filtered to new links on add; removals and
+    clears are resolved against the table before they happen.
+    """
+    if action in ('pre_remove', 'pre_clear'):
+        links = AssetTag.objects.filter(
+            **{'tag_id' if reverse else 'asset_id': instance.pk}
+        )
+        if action == 'pre_remove':
+            links = links.filter(
+                **{'asset_id__in' if reverse else 'tag_id__in': pk_set}
+            )
+        instance._removed_tags = Tally(links.values_list('tag_id', flat=True))
+        return
+
+    if action == 'post_add':
+        if reverse:
+            CounterService.increment(TAG_ASSETS, instance.pk, len(pk_set))
+        else:
+            CounterService.apply(TAG_ASSETS, dict.fromkeys(pk_set, 1))
+    elif action in ('post_remove', 'post_clear'):
+        removed = getattr(instance, '_removed_tags', Tally())
+        CounterService.apply(TAG_ASSETS, {
+            tag_id: -count for tag_id, count in removed.items()
+        })
+        instance._removed_tags = Tally()
+
+
+@receiver(post_delete, sender=Tag)
+def discard_tag_counter(sender, instance, **kwargs):
+    CounterService.discard(TAG_ASSETS, instance.pk)
+
+
+@receiver(post_delete, sender=Category)
+def discard_category_counter(sender, instance, **kwargs):
+    CounterService.discard(CATEGORY_ASSETS, instance.pk)
+
+
+@receiver(post_delete, sender=Department)
+def discard_department_asset_counter(sender, instance, **kwargs):
+    # Assets are detached with SET_NULL, which sends no signals
+    CounterService.discard(DEPARTMENT_ASSETS, instance.pk)
+
+
+@receiver(post_save, sender=Asset)
+def index_asset(sender, instance, **kwargs):
+    """
+    Keep the fuzzy search index in step once the write is committed
+    """
+    def update():
+        get_search_index().upsert(instance)
+        bump_generation()
+    transaction.on_commit(update)
+
+
+@receiver(post_delete, sender=Asset)
+def unindex_asset(sender, instance, **kwargs):
+    pk = instance.pk
+
+    def update():
+        get_search_index().remove(pk)
+        bump_generation()
+    transaction.on_commit(update)
@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.categories.models import Category
+from .models import Asset
+
+User = get_user_model()
+
+
+class AssetConditionalRequestTests(TestCase):
+    def setUp(self):
+        self.holder = User.objects.create_user(
+            username='holder', email='holder@example.com', password='pass12345',
+            firstName='Asset', lastName='Holder'
+        )
+        self.asset = Asset.objects.create(
+            name='Laptop',
+            category=Category.objects.create(name='Laptops'),
+            assigned_to=self.holder.profile,
+            purchase_date=timezone.now().date(),
+            purchase_price=Decimal('100.00')
+        )
+        self.user = User.objects.create_user(
+            username='admin', email='admin@example.com', password='pass12345'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.list_url = reverse('assets:asset-list')
+        self.detail_url = reverse('assets:asset-detail', args=[self.asset.pk])
+
+    def revalidate(self, url, etag, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_list_ignores_unrelated_users(self):
+        etag = self.client.get(self.list_url)['ETag']
+        self.assertEqual(self.revalidate(self.list_url, etag), 304)
+
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='pass12345'
+        )
+        other.firstName = 'Renamed'
+        other.save()
+        other.profile.phone_number = '555'
+        other.profile.save()
+        update_last_login(None, self.holder)
+        self.assertEqual(self.revalidate(self.list_url, etag), 304)
+
+        # The assignee's name is embedded
+        self.holder.firstName = 'Renamed'
+        self.holder.save()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['assigned_to_name'], 'Renamed Holder')
+
+    def test_detail_follows_the_asset_and_its_assignee(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        self.assertEqual(self.revalidate(self.detail_url, etag), 304)
+
+        self.holder.lastName = 'Keeper'
+        self.holder.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['assigned_to']['user']['lastName'], 'Keeper')
+
+        etag = response['ETag']
+        response = self.client.patch(
+            self.detail_url, {'location': 'Store room'}, format='json', HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.patch(
+            self.detail_url, {'location': 'Lost update'}, format='json', HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 412)
@@ -0,0 +1,127 @@
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.categories.models import Category
+from apps.departments.models import Department
+from apps.reports.dashboard import DashboardService
+from apps.reports.metrics import AssetMetrics, MetricsRollupService
+from apps.reports.models import MetricsRollup
+from apps.tags.models import Tag
+from core.counters import (
+    ASSET_STATUS, CATEGORY_ASSETS, DEPARTMENT_ASSETS, TAG_ASSETS, CounterService,
+)
+from .imports import AssetImport
+from .models import Asset
+
+
+class AssetImportTests(TestCase):
+    HEADER = 'Name,Category,Department,Status,Purchase Date,Purchase Price,Tags,Colour\n'
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Laptops', code='LAP')
+        self.department = Department.objects.create(name='Finance', code='FIN')
+        self.tags = [Tag.objects.create(name=f'Tag {i}') for i in range(2)]
+
+    def run_import(self, rows, **kwargs):
+        data = (self.HEADER + rows).encode()
+        return AssetImport(**kwargs).run(BytesIO(data), name='assets.csv')
+
+    def test_import_creates_valid_rows_and_reports_the_rest(self):
+        report = self.run_import(
+            'ThinkPad,laptops,FIN,,2024-01-31,1200.50,Tag 0; tag 1,red\n'
+            'MacBook,LAP,,assigned,2024-02-01,"2,000",,\n'
+            ',Phones,Sales,LOST,31/01/2024,-1,Tag 9,\n'
+        )
+        self.assertEqual(
+            (report['total'], report['imported'], report['failed']), (3, 2, 1)
+        )
+        self.assertEqual(report['ignored_columns'], ['Colour'])
+        self.assertEqual(report['errors'][0]['row'], 4)
+        self.assertEqual(set(report['errors'][0]['errors']), {
+            'name', 'category', 'department', 'asset_status',
+            'purchase_date', 'purchase_price', 'tags',
+        })
+
+        thinkpad = Asset.objects.get(name='ThinkPad')
+        self.assertEqual(thinkpad.department, self.department)
+        self.assertEqual(thinkpad.purchase_price, Decimal('1200.50'))
+        self.assertEqual(set(thinkpad.tags.all()), set(self.tags))
+        self.assertTrue(thinkpad.asset_id.startswith('AST'))
+        self.assertEqual(Asset.objects.get(name='MacBook').asset_status, 'ASSIGNED')
+
+        self.assertEqual(CounterService.get(CATEGORY_ASSETS, self.category.pk), 2)
+        self.assertEqual(CounterService.get(DEPARTMENT_ASSETS, self.department.pk), 1)
+        self.assertEqual(CounterService.get(ASSET_STATUS, 'ASSIGNED'), 1)
+        self.assertEqual(CounterService.get(TAG_ASSETS, self.tags[0].pk), 1)
+
+    def test_import_updates_metrics_and_dashboard(self):
+        self.assertEqual(DashboardService.get_stats()['assets']['total'], 0)
+        self.run_import(
+            'ThinkPad,LAP,FIN,,2024-01-31,1200.50,,\n'
+            'MacBook,LAP,,assigned,2024-02-01,2000,,\n'
+        )
+        self.assertEqual(DashboardService.get_stats()['assets'], {
+            'total': 2, 'available': 1, 'assigned': 1, 'maintenance': 0, 'retired': 0,
+        })
+        self.assertEqual(AssetMetrics.get_asset_utilization_rate(), {
+            'total_assets': 2, 'assigned_assets': 1, 'utilization_rate': 50.0,
+        })
+        usage = {
+            row['department__name']: row['asset_count']
+            for row in AssetMetrics.get_department_usage_metrics()
+        }
+        self.assertEqual(usage, {'Finance': 1, None: 1})
+
+        # The same rollups as computed from scratch
+        fields = ('dimension', 'department', 'category', 'asset_count',
+                  'assigned_count', 'total_value')
+        ordering = ('dimension', 'department', 'category')
+        rollups = list(MetricsRollup.objects.order_by(*ordering).values(*fields))
+        MetricsRollupService.rebuild()
+        self.assertEqual(
+            rollups, list(MetricsRollup.objects.order_by(*ordering).values(*fields))
+        )
+
+    def test_dry_run_and_duplicate_asset_ids(self):
+        Asset.objects.create(
+            asset_id='AST1', name='Existing', category=self.category,
+            purchase_date=timezone.now().date(), purchase_price=Decimal('1')
+        )
+        self.HEADER = 'Asset ID,' + self.HEADER
+        rows = (
+            'AST1,Old,LAP,,,2024-01-01,1,,\n'
+            'AST2,New,LAP,,,2024-01-01,1,,\n'
+            'AST2,Again,LAP,,,2024-01-01,1,,\n'
+        )
+        report = self.run_import(rows, dry_run=True)
+        self.assertEqual((report['valid'], report['imported']), (1, 0))
+        self.assertEqual([e['row'] for e in report['errors']], [2, 4])
+        self.assertFalse(Asset.objects.filter(asset_id='AST2').exists())
+
+        self.assertEqual(self.run_import(rows)['imported'], 1)
+        self.assertTrue(Asset.objects.filter(asset_id='AST2', name='New').exists())
+
+    def test_queries_do_not_grow_with_rows(self):
+        def lookup_queries(rows):
+            with CaptureQueriesContext(connection) as queries:
+                self.run_import(''.join(
+                    f'Asset {n},LAP,FIN,,2024-01-01,10,Tag {n % 2},\n' for n in range(rows)
+                ))
+            # bulk_create splits INSERTs to stay under SQLite's parameter
+            # limit, and asset IDs come from blocks refilled once used up
+            return [
+                q['sql'] for q in queries
+                if not q['sql'].startswith(('INSERT', 'SAVEPOINT', 'RELEASE SAVEPOINT'))
+                and 'core_idsequence' not in q['sql']
+            ]
+
+        lookup_queries(2)  # Creates the counter rows
+        self.assertEqual(len(lookup_queries(10)), len(lookup_queries(200)))
+        self.assertEqual(Asset.objects.count(), 212)
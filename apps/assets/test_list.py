@@ -0,0 +1,87 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.categories.models import Category
+from apps.departments.models import Department
+from apps.tags.models import Tag
+from .models import Asset
+
+User = get_user_model()
+
+
+class AssetListQueryTests(TestCase):
+    """The asset list costs the same number of queries at any page size"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Laptops')
+        self.department = Department.objects.create(
+            name='Engineering', parent=Department.objects.create(name='Company')
+        )
+        self.tags = [Tag.objects.create(name=f'Tag {i}') for i in range(2)]
+        self.created = 0
+
+        user = User.objects.create_user(username='admin', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+        self.url = reverse('assets:asset-list')
+
+    def create_assets(self, count):
+        for _ in range(count):
+            self.created += 1
+            holder = User.objects.create_user(
+                username=f'holder{self.created}',
+                email=f'holder{self.created}@example.com',
+                password='pass12345',
+                firstName='Asset',
+                lastName='Holder'
+            )
+            asset = Asset.objects.create(
+                name=f'Laptop {self.created}',
+                category=self.category,
+                department=self.department,
+                assigned_to=holder.profile,
+                purchase_date=timezone.now().date(),
+                purchase_price=Decimal('100.00')
+            )
+            asset.tags.add(*self.tags)
+
+    def count_queries(self, params):
+        cache.clear()  # Counts the list afresh, as the first page would
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_queries_do_not_grow_with_the_page(self):
+        for params in (
+            {},
+            {'expand': 'category,department,assigned_to,tags'},
+        ):
+            with self.subTest(**params):
+                Asset.objects.all().delete()
+                self.create_assets(2)
+                expected, response = self.count_queries(params)
+                self.assertEqual(len(response.data['results']), 2)
+
+                self.create_assets(8)
+                cache.clear()
+                with self.assertNumQueries(expected):
+                    response = self.client.get(self.url, params)
+                self.assertEqual(len(response.data['results']), 10)
+
+    def test_expanded_rows(self):
+        self.create_assets(3)
+        _, response = self.count_queries({'expand': 'department,assigned_to,tags'})
+        row = response.data['results'][0]
+        self.assertEqual(row['department']['name'], 'Engineering')
+        self.assertEqual(row['assigned_to']['user']['username'], 'holder3')
+        self.assertEqual(len(row['tags']), 2)
+        self.assertEqual(row['category'], self.category.pk)
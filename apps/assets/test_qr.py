@@ -0,0 +1,141 @@
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.categories.models import Category
+from core.qrcodes import get_qr_cache, render_qr_png
+from .models import Asset
+from .services import PendingQRQueue, QRCodeService
+
+
+class PendingQRQueueTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        get_qr_cache().clear_memory()
+
+        # Drained by hand instead of by the worker thread
+        self.queue = PendingQRQueue()
+        for patcher in (
+            mock.patch('apps.assets.services.get_qr_queue', return_value=self.queue),
+            mock.patch.object(self.queue, '_ensure_flusher'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.category = Category.objects.create(name='Laptops')
+
+    def create_asset(self, name='Laptop'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Asset.objects.create(
+                name=name,
+                category=self.category,
+                purchase_date=timezone.now().date(),
+                purchase_price=Decimal('100.00')
+            )
+
+    def test_saves_enqueue_once_committed(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            asset = Asset.objects.create(
+                name='Laptop',
+                category=self.category,
+                purchase_date=timezone.now().date(),
+                purchase_price=Decimal('100.00')
+            )
+        self.assertEqual(self.queue.pending(), set())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.queue.pending(), {asset.pk})
+
+    def test_flush_renders_stale_codes_only(self):
+        asset = self.create_asset()
+        self.assertEqual(self.queue.flush(), 1)
+        self.assertEqual(self.queue.pending(), set())
+        asset.refresh_from_db()
+        self.assertTrue(QRCodeService.is_current(asset))
+        self.assertTrue(default_storage.exists(asset.qr_code.name))
+
+        # Saves that leave the payload alone queue nothing
+        asset.location = 'Store room'
+        with self.captureOnCommitCallbacks(execute=True):
+            asset.save()
+        self.assertEqual(self.queue.pending(), set())
+
+        old_path = asset.qr_code.name
+        asset.name = 'Renamed laptop'
+        with self.captureOnCommitCallbacks(execute=True):
+            asset.save()
+        self.assertEqual(self.queue.pending(), {asset.pk})
+        self.assertEqual(self.queue.flush(), 1)
+        asset.refresh_from_db()
+        self.assertNotEqual(asset.qr_code.name, old_path)
+
+    def test_ensure_renders_inline_and_dequeues(self):
+        asset = self.create_asset()
+        self.assertEqual(self.queue.pending(), {asset.pk})
+        self.assertEqual(QRCodeService.ensure(asset).name, QRCodeService.path_for(asset))
+        self.assertEqual(self.queue.pending(), set())
+        self.assertEqual(self.queue.flush(), 0)
+
+    def test_queue_is_bounded(self):
+        queue = PendingQRQueue(max_size=1)
+        with mock.patch.object(queue, '_ensure_flusher'):
+            self.assertTrue(queue.enqueue(1))
+            self.assertFalse(queue.enqueue(2))
+        self.assertEqual(queue.pending(), {1})
+
+    def test_command_catches_up_on_dropped_work(self):
+        assets = [self.create_asset(f'Laptop {i}') for i in range(3)]
+        self.queue._clear()
+        call_command('generate_qr_codes', workers=1, stdout=StringIO())
+        for asset in assets:
+            asset.refresh_from_db()
+            self.assertTrue(QRCodeService.is_current(asset))
+            self.assertTrue(default_storage.exists(asset.qr_code.name))
+
+    def test_legacy_files_are_moved_and_released(self):
+        asset = self.create_asset()
+        self.queue._clear()
+        legacy = default_storage.save('asset_qr_codes/asset_qr_1.png', ContentFile(b'old'))
+        Asset.objects.filter(pk=asset.pk).update(qr_code=legacy)
+
+        call_command('generate_qr_codes', workers=1, stdout=StringIO())
+        asset.refresh_from_db()
+        self.assertTrue(QRCodeService.is_current(asset))
+        self.assertFalse(default_storage.exists(legacy))
+
+        # Files moved away from at runtime go too, unless still in use
+        other = self.create_asset('Other laptop')
+        shared = default_storage.save('asset_qr_codes/shared.png', ContentFile(b'old'))
+        Asset.objects.filter(pk__in=[asset.pk, other.pk]).update(qr_code=shared)
+        asset.refresh_from_db()
+        QRCodeService.generate(asset)
+        self.assertTrue(default_storage.exists(shared))
+        other.refresh_from_db()
+        QRCodeService.generate(other)
+        self.assertFalse(default_storage.exists(shared))
+
+    def test_forced_rerender_replaces_files_in_place(self):
+        asset = self.create_asset()
+        self.queue.flush()
+        path = QRCodeService.path_for(asset)
+        with default_storage.open(path, 'wb') as f:
+            f.write(b'corrupt')
+        # Cached files may be shared, e.g. with core.utils.generate_qr_code
+        with mock.patch.object(FileSystemStorage, 'delete') as delete:
+            call_command('generate_qr_codes', workers=1, all=True, stdout=StringIO())
+        delete.assert_not_called()
+        with default_storage.open(path, 'rb') as f:
+            self.assertEqual(f.read(), render_qr_png(asset.qr_payload))
+        asset.refresh_from_db()
+        self.assertEqual(asset.qr_code.name, path)
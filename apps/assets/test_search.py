@@ -0,0 +1,136 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.categories.models import Category
+from .models import Asset
+from .search import AssetSearchIndex, tokenize
+
+
+class AssetSearchIndexTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Laptops')
+        self.laptop = self.create_asset(
+            'Dell Latitude Laptop', asset_id='AST-0012345', serial_number='SNX98765QZ'
+        )
+        self.printer = self.create_asset('HP LaserJet Printer', asset_id='AST-0067890')
+        self.index = AssetSearchIndex(limit=10)
+        self.index.rebuild()
+
+    def create_asset(self, name, **fields):
+        return Asset.objects.create(
+            name=name,
+            category=self.category,
+            purchase_date=timezone.now().date(),
+            purchase_price=Decimal('100.00'),
+            **fields
+        )
+
+    def search(self, query, **kwargs):
+        return [pk for pk, _ in self.index.search(query, **kwargs)]
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('AST-0012345 / Dell'), ['ast', '0012345', 'dell'])
+        self.assertEqual(tokenize(None), [])
+
+    def test_typos_and_prefixes_match(self):
+        self.assertEqual(self.search('lattitude'), [self.laptop.pk])
+        self.assertEqual(self.search('lap'), [self.laptop.pk])
+        self.assertEqual(self.search('laserjet'), [self.printer.pk])
+        self.assertEqual(self.search('scanner'), [])
+
+    def test_fragments_match_like_icontains(self):
+        self.assertEqual(self.search('12345'), [self.laptop.pk])
+        self.assertEqual(self.search('98765'), [self.laptop.pk])
+        self.assertEqual(self.search('aserje'), [self.printer.pk])
+        # Whole tokens rank above fragments of them
+        other = self.create_asset('Laptop 9', serial_number='98765')
+        self.index.upsert(other)
+        self.assertEqual(self.search('98765'), [other.pk, self.laptop.pk])
+
+    def test_every_query_token_has_to_match(self):
+        self.assertEqual(self.search('dell laptop'), [self.laptop.pk])
+        self.assertEqual(self.search('dell printer'), [])
+        self.assertEqual(self.search('ast'), [self.laptop.pk, self.printer.pk])
+
+    def test_upsert_and_remove(self):
+        self.laptop.name = 'ThinkPad'
+        self.index.upsert(self.laptop)
+        self.assertEqual(self.search('thinkpad'), [self.laptop.pk])
+        self.assertEqual(self.search('latitude'), [])
+        self.index.remove(self.printer.pk)
+        self.assertEqual(self.search('printer'), [])
+        self.assertEqual(len(self.index), 1)
+
+    def test_limit(self):
+        for i in range(3):
+            self.index.upsert(self.create_asset(f'Laptop {i}'))
+        self.assertEqual(len(self.search('laptop', limit=2)), 2)
+        self.assertEqual(len(self.search('laptop', limit=0)), 4)
+        self.assertEqual(len(AssetSearchIndex(limit=1).search('laptop')), 1)
+
+
+class AssetListSearchTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Laptops')
+        Asset.objects.bulk_create([
+            Asset(
+                asset_id=f'AST-{i:05d}',
+                name=f'Laptop {i}',
+                category=category,
+                asset_status='ASSIGNED' if i % 2 else 'AVAILABLE',
+                purchase_date=timezone.now().date(),
+                purchase_price=Decimal('100.00')
+            )
+            for i in range(250)
+        ])
+        index = AssetSearchIndex(limit=10)
+        patcher = mock.patch('apps.assets.views.get_search_index', return_value=index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        user = get_user_model().objects.create_user(username='admin', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+        self.url = reverse('assets:asset-list')
+
+    def test_search_is_not_capped(self):
+        response = self.client.get(self.url, {'search': 'laptop'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 250)
+
+        last_page = -(-250 // len(response.data['results']))
+        response = self.client.get(self.url, {'search': 'laptop', 'page': last_page})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['results'])
+
+    def test_search_ranks_within_other_filters(self):
+        response = self.client.get(self.url, {'search': 'laptop 17', 'status': 'ASSIGNED'})
+        self.assertEqual(response.data['results'][0]['asset_id'], 'AST-00017')
+        # 17, 117, 171, 173, 175, 177, 179 and 217
+        self.assertEqual(response.data['count'], 8)
+        self.assertTrue(all(
+            row['asset_status'] == 'ASSIGNED' for row in response.data['results']
+        ))
+
+        response = self.client.get(self.url, {'search': '00017'})
+        self.assertEqual(response.data['results'][0]['asset_id'], 'AST-00017')
+
+    def test_ranking_costs_at_most_one_query(self):
+        def count_queries(params):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        count_queries({'search': 'laptop'})  # Builds the index
+        plain = count_queries({'search': 'laptop'})
+        self.assertEqual(plain, count_queries({'search': 'laptop 1'}))
+        self.assertEqual(count_queries({'search': 'laptop', 'status': 'ASSIGNED'}), plain + 1)
@@ -1,60 +1,198 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Prefetch
 from django.core.exceptions import ValidationError
 from .models import Asset, AssetMaintenance, AssetAssignment, AssetRequest
 from .serializers import (
     AssetSerializer, 
+    AssetListSerializer,
     AssetCreateUpdateSerializer,
     AssetMaintenanceSerializer,
     AssetAssignmentSerializer,
     AssetRequestSerializer
 )
+from core.conditional import ConditionalRequestMixin
+from core.pagination import KeysetPagination
 from core.permissions import IsAdminUser, IsManagerUser
-from core.utils import generate_qr_code
+from .services import QRCodeService
+from .imports import AssetImport
+from .search import get_search_index
+from apps.categories.models import Category
+from apps.departments.models import Department
+from apps.tags.models import Tag
+from core.counters import (
+    CATEGORY_ASSETS, CATEGORY_SUBTREE_ASSETS, CATEGORY_SUBTREE_VALUE,
+    DEPARTMENT_ACTIVE_USERS, TAG_ASSETS, CounterService,
+)
+
+
+class AssetPagination(KeysetPagination):
+    # Search results come back ranked, not in keyset order
+    page_number_params = ('page', 'search')
+
 
-class AssetViewSet(viewsets.ModelViewSet):
+class AssetViewSet(ConditionalRequestMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing assets
     """
     queryset = Asset.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = AssetPagination
+    # Related objects are embedded, or expanded, with their own counters;
+    # assignees only by the instance tags of the profiles listed
+    etag_models = (Category, Department, Tag)
+    etag_parents = ('category', 'department', 'assigned_to')
     
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return AssetCreateUpdateSerializer
+        if self.action == 'list':
+            return AssetListSerializer
         return AssetSerializer
 
     def get_queryset(self):
-        queryset = Asset.objects.all()
+        if self.action == 'list':
+            queryset = self.list_queryset()
+        elif self.action == 'retrieve':
+            queryset = Asset.objects.select_related(
+                'category', 'department__parent', 'assigned_to__user'
+            ).prefetch_related('tags')
+        else:
+            queryset = Asset.objects.all()
         
         # Filter by status
         status = self.request.query_params.get('status', None)
         if status:
             queryset = queryset.filter(asset_status=status)
             
-        # Filter by category
+        # Filter by category and department, with ?subtree=true including
+        # everything below them through the closure tables
+        subtree = self.request.query_params.get('subtree') == 'true'
         category = self.request.query_params.get('category', None)
         if category:
-            queryset = queryset.filter(category_id=category)
+            if subtree:
+                queryset = queryset.filter(category__ancestor_links__ancestor_id=category)
+            else:
+                queryset = queryset.filter(category_id=category)
             
-        # Filter by department
         department = self.request.query_params.get('department', None)
         if department:
-            queryset = queryset.filter(department_id=department)
+            if subtree:
+                queryset = queryset.filter(department__ancestor_links__ancestor_id=department)
+            else:
+                queryset = queryset.filter(department_id=department)
             
-        # Search by name or asset_id
+        return queryset
+
+    # Query parameters that narrow the list down (see get_queryset)
+    filter_params = ('status', 'category', 'department')
+
+    def paginate_queryset(self, queryset):
+        """
+        Rank ?search= results with the in-memory search index
+
+        Every match is ranked; the page is cut from the ranking and only
+        its rows are loaded, so large result sets never end up in one
+        IN list or ORDER BY.
+        """
         search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | 
-                Q(asset_id__icontains=search)
+        if not search or self.action != 'list':
+            return super().paginate_queryset(queryset)
+
+        ranked = self.search_ranking(queryset, search)
+        page = super().paginate_queryset(ranked)
+        rows = queryset.in_bulk(page)
+        return [rows[pk] for pk in page if pk in rows]
+
+    def search_ranking(self, queryset, search):
+        """
+        Primary keys of the assets in ``queryset`` matching ``search``, best first
+
+        The index covers every asset, so without filters the ranking is
+        used as is. Filters are applied with one query for the primary keys
+        they keep, however many assets match the search.
+        """
+        ranked = [pk for pk, _ in get_search_index().search(search, limit=0)]
+        params = self.request.query_params
+        if not ranked or not any(params.get(name) for name in self.filter_params):
+            return ranked
+        kept = set(
+            queryset.order_by().prefetch_related(None).select_related(None)
+            .values_list('pk', flat=True).iterator()
+        )
+        return [pk for pk in ranked if pk in kept]
+
+    def list_queryset(self):
+        """
+        Joins and prefetches for AssetListSerializer
+
+        The number of queries depends on the requested expansions only,
+        not on the page size.
+        """
+        expand = AssetListSerializer.requested_expansions(
+            {'request': self.request}
+        )
+        queryset = Asset.objects.select_related('assigned_to__user')
+
+        if 'category' in expand:
+            queryset = queryset.prefetch_related(Prefetch(
+                'category',
+                queryset=Category.objects.annotate(
+                    counted_assets=CounterService.subquery(CATEGORY_ASSETS),
+                    counted_subtree_assets=CounterService.subquery(CATEGORY_SUBTREE_ASSETS),
+                    counted_subtree_value=CounterService.subquery(CATEGORY_SUBTREE_VALUE)
+                )
+            ))
+        else:
+            queryset = queryset.select_related('category')
+
+        if 'department' in expand:
+            queryset = queryset.prefetch_related(Prefetch(
+                'department',
+                queryset=Department.objects.select_related('parent').annotate(
+                    counted_members=CounterService.subquery(DEPARTMENT_ACTIVE_USERS)
+                )
+            ))
+        else:
+            queryset = queryset.select_related('department')
+
+        if 'tags' in expand:
+            tags = Tag.objects.annotate(
+                counted_assets=CounterService.subquery(TAG_ASSETS)
             )
-            
-        return queryset
+        else:
+            tags = Tag.objects.only('pk')
+        return queryset.prefetch_related(Prefetch('tags', queryset=tags))
+
+    @action(detail=True, methods=['get'], url_path='maintenance-records')
+    def maintenance_records(self, request, pk=None):
+        """Paginated maintenance history of an asset"""
+        asset = self.get_object()
+        return self.history_response(
+            asset.maintenance_records.all(), AssetMaintenanceSerializer
+        )
+
+    @action(detail=True, methods=['get'])
+    def assignments(self, request, pk=None):
+        """Paginated assignment history of an asset"""
+        asset = self.get_object()
+        return self.history_response(
+            asset.assignment_history.select_related(
+                'assigned_to', 'assigned_by'
+            ),
+            AssetAssignmentSerializer
+        )
+
+    def history_response(self, queryset, serializer_class):
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = serializer_class(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer_class(queryset, many=True).data)
 
     @action(detail=True, methods=['post'])
     def assign(self, request, pk=None):
@@ -149,27 +287,56 @@ class AssetViewSet(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='import',
+        parser_classes=[MultiPartParser, FormParser],
+        permission_classes=[IsAuthenticated, IsAdminUser|IsManagerUser]
+    )
+    def import_assets(self, request):
+        """
+        Import assets from an uploaded CSV or XLSX file
+
+        Invalid rows are skipped and listed in the response; with
+        ``dry_run`` the file is only validated.
+        """
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response(
+                {"error": "A CSV or XLSX file is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        try:
+            report = AssetImport(user=request.user, dry_run=dry_run).run(
+                upload, name=upload.name
+            )
+        except ValidationError as e:
+            return Response(
+                {"error": '; '.join(e.messages)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            report,
+            status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED
+        )
+
     @action(detail=True, methods=['get'])
     def qr_code(self, request, pk=None):
-        """Generate QR code for asset"""
+        """Return the asset's QR code, generating it now if still pending"""
         asset = self.get_object()
-        
-        if not asset.qr_code:
-            try:
-                qr_code = generate_qr_code(
-                    f'Asset ID: {asset.asset_id}\nName: {asset.name}'
-                )
-                asset.qr_code.save(
-                    f'asset_qr_{asset.asset_id}.png',
-                    qr_code,
-                    save=True
-                )
-            except Exception as e:
-                return Response(
-                    {"error": str(e)},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-                
+
+        try:
+            qr_code = QRCodeService.ensure(asset)
+        except Exception as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
         return Response({
-            "qr_code_url": request.build_absolute_uri(asset.qr_code.url)
+            "qr_code_url": request.build_absolute_uri(qr_code.url)
         })
\ No newline at end of file
@@ -1,7 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from core.models import BaseModel
-from core.utils import generate_unique_id
+from core.sequences import next_id, register_id_prefix
 from django.utils import timezone
 from core.constants import STATUS_ACTIVE, STATUS_CHOICES
 
@@ -34,7 +34,7 @@ class CustomUser(AbstractUser):
 
     def save(self, *args, **kwargs):
         if not self.username:
-            self.username = generate_unique_id(prefix='USR')
+            self.username = next_id('USR')
         super().save(*args, **kwargs)
 
     def update_last_login(self):
@@ -51,3 +51,5 @@ class CustomUser(AbstractUser):
 
     def __str__(self):
         return f"{self.firstName} {self.lastName} ({self.username})"
+
+register_id_prefix('USR', CustomUser, 'username')
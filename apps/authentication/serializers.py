@@ -5,7 +5,7 @@ from rest_framework import serializers
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.password_validation import validate_password
 from apps.authentication.models import CustomUser
-from django.core.cache import cache
+from core.cache_tags import TaggedCache, instance_tag
 from core.serializers import BaseModelSerializer
 from django.utils.translation import gettext_lazy as _
 
@@ -21,15 +21,13 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'firstName', 'lastName', 'date_joined']
 
     def to_representation(self, instance):
-        """Cache the representation"""
-        cache_key = f'user_repr_{instance.id}'
-        cached_data = cache.get(cache_key)
-        
-        if not cached_data:
-            cached_data = super().to_representation(instance)
-            cache.set(cache_key, cached_data, timeout=3600)
-        
-        return cached_data
+        """Cache the representation until the user changes"""
+        return TaggedCache.get_or_set(
+            f'user_repr_{instance.id}',
+            lambda: super(UserSerializer, self).to_representation(instance),
+            tags=[instance_tag(instance)],
+            timeout=3600
+        )
 
 # ========================== USER MANAGEMENT SERIALIZERS MODULES =============================
 
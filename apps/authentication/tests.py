@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
@@ -7,6 +10,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from django.core import mail
 from django.conf import settings
 from apps.authentication.models import CustomUser
+from core.cache_backend import CacheStore, SQLiteCache
 
 User = get_user_model()
 
@@ -193,3 +197,44 @@ class AuthenticationTests(APITestCase):
     def tearDown(self):
         """Clean up after tests"""
         CustomUser.objects.all().delete()
+
+
+class SQLiteCacheTests(TestCase):
+    """Cache backend shared by worker processes through one file"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def other_process(self):
+        """A second cache on the same file with its own L1, as in another worker"""
+        other = SQLiteCache(self.location, {})
+        other._store = CacheStore(self.location, {}, 300, 3)
+        return other
+
+    def test_writes_reach_other_processes(self):
+        other = self.other_process()
+        self.cache.set('greeting', 'hello', 60)
+        self.assertEqual(other.get('greeting'), 'hello')
+        self.cache.set('greeting', 'hi', 60)
+        self.assertEqual(other.get('greeting'), 'hi')
+
+        self.assertTrue(self.cache.add('attempts', 0, 60))
+        self.assertFalse(other.add('attempts', 5, 60))
+        self.assertEqual([other.incr('attempts'), self.cache.incr('attempts')], [1, 2])
+        with self.assertRaises(ValueError):
+            other.incr('missing')
+
+        self.cache.set('expired', 'soon', 0)
+        self.assertIsNone(other.get('expired'))
+
+    def test_delete_pattern(self):
+        other = self.other_process()
+        self.cache.set_many({'department_tree_1': 1, 'department_tree_2': 2, 'tag_1': 3})
+        self.assertEqual(other.get_many(['department_tree_1', 'tag_1']), {
+            'department_tree_1': 1, 'tag_1': 3
+        })
+        self.assertEqual(self.cache.delete_pattern('department_*'), 2)
+        self.assertEqual(other.get_many(['department_tree_1', 'tag_1']), {'tag_1': 3})
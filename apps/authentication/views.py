@@ -10,8 +10,6 @@ from rest_framework.views import APIView
 from rest_framework import status, views
 from rest_framework_simplejwt.tokens import RefreshToken, TokenError
 from django.core.cache import cache
-from django.views.decorators.cache import cache_page
-from django.utils.decorators import method_decorator
 from django.db import transaction
 from django.core.exceptions import ValidationError
 from rest_framework.parsers import JSONParser
@@ -25,6 +23,7 @@ from apps.authentication.serializers import (
      RegisterSerializer, PasswordChangeSerializer,
      LoginSerializer
 )
+from core.cache_tags import TaggedCache, instance_tag
 from core.monitoring import AuthenticationMonitor
 
 # Configure logger
@@ -102,34 +101,33 @@ class LoginView(APIView):
         }
         
         for key in metrics.values():
-            if cache.get(key) is None:
-                cache.set(key, 0, timeout=86400)  # 24 hours timeout
+            # add() leaves counters other workers already started untouched
+            cache.add(key, 0, timeout=86400)  # 24 hours timeout
 
     def get_cached_tokens(self, user):
         """Get cached tokens or generate new ones"""
-        cache_key = f'user_tokens_{user.id}'
-        tokens = cache.get(cache_key)
-        
-        if not tokens:
+        def generate():
             refresh = RefreshToken.for_user(user)
-            tokens = {
+            return {
                 'refresh': str(refresh),
                 'access': str(refresh.access_token)
             }
-            cache.set(cache_key, tokens, timeout=300)
-        
-        return tokens
+        # Dropped as soon as the user changes or logs out
+        return TaggedCache.get_or_set(
+            f'user_tokens_{user.id}', generate, tags=[instance_tag(user)], timeout=300
+        )
 
     def check_login_attempts(self, request):
         """Check and manage login attempts"""
         key = f"login_attempts_{request.META.get('REMOTE_ADDR')}"
-        attempts = cache.get(key, 0)
+        # Counted atomically, so concurrent workers share one budget
+        cache.add(key, 0, timeout=300)  # 5 minutes window
+        attempts = cache.incr(key)
         
-        if attempts >= 5:  # Max 5 attempts
+        if attempts > 5:  # Max 5 attempts
             logger.warning(f"Too many login attempts from IP: {request.META.get('REMOTE_ADDR')}")
             return False
             
-        cache.set(key, attempts + 1, timeout=300)  # 5 minutes timeout
         return True
 
     @transaction.atomic
@@ -156,8 +154,6 @@ class LoginView(APIView):
             user = serializer.validated_data['user']
             tokens = self.get_cached_tokens(user)
 
-            # Cache user data
-            cache_key = f'user_data_{user.id}'
             user_data = {
                 "username": user.username,
                 "email": user.email,
@@ -165,7 +161,6 @@ class LoginView(APIView):
                 "lastName": user.lastName,
                 "role": user.profile.role if hasattr(user, 'profile') else None
             }
-            cache.set(cache_key, user_data, timeout=3600)
 
             # Update metrics safely
             try:
@@ -222,9 +217,8 @@ class LogoutView(APIView):
                     "detail": str(e)
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # Clear user's cached data
-            cache_key = f'user_data_{request.user.id}'
-            cache.delete(cache_key)
+            # Clear user's cached data and tokens
+            TaggedCache.invalidate(instance_tag(request.user))
 
             return Response({
                 "message": "Logout successful",
@@ -351,16 +345,15 @@ class ProfileView(APIView):
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication]
 
-    @method_decorator(cache_page(60 * 15))  # Cache for 15 minutes
     def get(self, request):
-        cache_key = f'user_data_{request.user.id}'
-        user_data = cache.get(cache_key)
-        
-        if not user_data:
-            user_data = {
-                "username": request.user.username,
-                "email": request.user.email
-            }
-            cache.set(cache_key, user_data, timeout=3600)
-        
+        user = request.user
+        user_data = TaggedCache.get_or_set(
+            f'user_data_{user.id}',
+            lambda: {
+                "username": user.username,
+                "email": user.email
+            },
+            tags=[instance_tag(user)],
+            timeout=3600
+        )
         return Response(user_data)
\ No newline at end of file
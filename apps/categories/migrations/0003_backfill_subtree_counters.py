@@ -0,0 +1,44 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def backfill_subtree_counters(apps, schema_editor):
+    """
+    Count the assets, and their value in cents, in every category and the
+    categories below it
+    """
+    CategoryClosure = apps.get_model('categories', 'CategoryClosure')
+    Counter = apps.get_model('core', 'Counter')
+
+    counters = []
+    totals = CategoryClosure.objects.order_by().values_list('ancestor_id').annotate(
+        Count('descendant__assets'), Sum('descendant__assets__purchase_price')
+    )
+    for category_id, count, value in totals:
+        cents = int((Decimal(str(value or 0)) * 100).to_integral_value())
+        counters.extend(
+            Counter(name=name, key=str(category_id), value=total)
+            for name, total in (
+                ('category_subtree_assets', count), ('category_subtree_value', cents)
+            )
+            if total
+        )
+    Counter.objects.filter(
+        name__in=['category_subtree_assets', 'category_subtree_value']
+    ).delete()
+    Counter.objects.bulk_create(counters, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0002_categoryclosure'),
+        ('core', '0003_backfill_counters'),
+        ('assets', '0004_asset_assets_asse_updated_16bcc3_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_subtree_counters, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,11 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
 from core.models import AuditableModel
-from core.utils import generate_unique_id
+from core.sequences import next_id, register_id_prefix
+from core.counters import (
+    CATEGORY_ASSETS, CATEGORY_SUBTREE_ASSETS, CATEGORY_SUBTREE_VALUE, CounterService,
+)
 
 class Category(AuditableModel):
     """
@@ -28,12 +33,105 @@ class Category(AuditableModel):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Parent as stored, so save() can tell a move from other updates
+        if 'parent_id' in instance.__dict__:
+            instance._stored_parent_id = instance.parent_id
+        return instance
+
     def save(self, *args, **kwargs):
+        from .tree import CategoryTree
+
         if not self.code:
-            self.code = generate_unique_id(prefix='CAT')
-        super().save(*args, **kwargs)
+            self.code = next_id('CAT')
+        adding = self._state.adding
+        if adding:
+            stored_parent_id = None
+        elif hasattr(self, '_stored_parent_id'):
+            stored_parent_id = self._stored_parent_id
+        else:
+            stored_parent_id = Category.objects.filter(pk=self.pk).values_list(
+                'parent_id', flat=True
+            ).first()
+
+        update_fields = kwargs.get('update_fields')
+        writes_parent = update_fields is None or bool({'parent', 'parent_id'} & set(update_fields))
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                CategoryTree.insert(self)
+            elif writes_parent and self.parent_id != stored_parent_id:
+                CategoryTree.move(self)
+        if adding or writes_parent:
+            self._stored_parent_id = self.parent_id
 
     @property
     def asset_count(self):
         """Get total number of assets in this category"""
-        return self.assets.count()
+        if hasattr(self, 'counted_assets'):
+            return self.counted_assets
+        return CounterService.get(CATEGORY_ASSETS, self.pk)
+
+    @property
+    def subtree_asset_count(self):
+        """Get number of assets in this category and all categories below it"""
+        if hasattr(self, 'counted_subtree_assets'):
+            return self.counted_subtree_assets
+        return CounterService.get(CATEGORY_SUBTREE_ASSETS, self.pk)
+
+    @property
+    def subtree_asset_value(self):
+        """Get purchase value of the assets counted by subtree_asset_count"""
+        if hasattr(self, 'counted_subtree_value'):
+            cents = self.counted_subtree_value
+        else:
+            cents = CounterService.get(CATEGORY_SUBTREE_VALUE, self.pk)
+        return Decimal(cents) / 100
+
+    def get_ancestors(self, include_self=False):
+        """Categories above this one, nearest first"""
+        return Category.objects.filter(
+            descendant_links__descendant=self,
+            descendant_links__depth__gte=0 if include_self else 1
+        ).order_by('descendant_links__depth')
+
+    def get_descendants(self, include_self=False):
+        """All categories below this one, at any depth"""
+        return Category.objects.filter(
+            ancestor_links__ancestor=self,
+            ancestor_links__depth__gte=0 if include_self else 1
+        )
+
+register_id_prefix('CAT', Category, 'code')
+
+
+class CategoryClosure(models.Model):
+    """
+    One row per category and each category above it, plus the category
+    itself at depth 0.
+
+    Kept in step with ``Category.parent`` by CategoryTree, so a whole
+    subtree is one indexed filter and asset totals can be rolled up to
+    every ancestor as assets change.
+    """
+    ancestor = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='descendant_links'
+    )
+    descendant = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='ancestor_links'
+    )
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ['ancestor', 'descendant']
+        indexes = [
+            models.Index(fields=['descendant', 'depth']),
+        ]
+
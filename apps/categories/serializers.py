@@ -3,15 +3,26 @@ from .models import Category
 
 class CategorySerializer(serializers.ModelSerializer):
     asset_count = serializers.IntegerField(read_only=True)
+    subtree_asset_count = serializers.IntegerField(read_only=True)
+    subtree_asset_value = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
     
     class Meta:
         model = Category
         fields = '__all__'
         read_only_fields = ('code',)
 
+    def validate_parent(self, value):
+        """Reject parents that would put the category inside its own subtree"""
+        category = self.instance
+        if value and category and value.ancestor_links.filter(ancestor=category).exists():
+            raise serializers.ValidationError("Circular dependency detected")
+        return value
+
 class CategoryDetailSerializer(serializers.ModelSerializer):
     subcategories = serializers.SerializerMethodField()
     asset_count = serializers.IntegerField(read_only=True)
+    subtree_asset_count = serializers.IntegerField(read_only=True)
+    subtree_asset_value = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
     
     class Meta:
         model = Category
@@ -0,0 +1,14 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from core.cache_tags import track_model
+from .models import Category
+from .tree import CategoryTree
+
+track_model(Category, parents=('parent',))
+
+
+@receiver(pre_delete, sender=Category)
+def detach_category_subtree(sender, instance, **kwargs):
+    """Children outlive the category as roots (parent is SET_NULL)"""
+    CategoryTree.remove(instance)
@@ -1,3 +1,170 @@
+from decimal import Decimal
+from importlib import import_module
+
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.assets.models import Asset
+from core.counters import CATEGORY_SUBTREE_ASSETS, CATEGORY_SUBTREE_VALUE, CounterService
+from core.models import Counter
+from .models import Category
+from .tree import CategoryTree
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        self.hardware = Category.objects.create(name='Hardware')
+        self.computers = Category.objects.create(name='Computers', parent=self.hardware)
+        self.laptops = Category.objects.create(name='Laptops', parent=self.computers)
+        self.furniture = Category.objects.create(name='Furniture')
+
+    def create_asset(self, category, price):
+        return Asset.objects.create(
+            name='Asset',
+            category=category,
+            purchase_date=timezone.now().date(),
+            purchase_price=Decimal(price)
+        )
+
+    def totals(self, category):
+        category = Category.objects.get(pk=category.pk)
+        return category.subtree_asset_count, category.subtree_asset_value
+
+    def test_rollups_follow_assets_and_moves(self):
+        asset = self.create_asset(self.laptops, '1000.50')
+        self.create_asset(self.computers, '200.00')
+        self.assertEqual(self.totals(self.hardware), (2, Decimal('1200.50')))
+        self.assertEqual(self.totals(self.laptops), (1, Decimal('1000.50')))
+
+        asset.purchase_price = Decimal('900.50')
+        asset.category = self.furniture
+        asset.save()
+        self.assertEqual(self.totals(self.hardware), (1, Decimal('200.00')))
+        self.assertEqual(self.totals(self.furniture), (1, Decimal('900.50')))
+
+        # Moving a category carries its totals to the new ancestors
+        self.computers.parent = self.furniture
+        self.computers.save()
+        self.assertEqual(self.totals(self.hardware), (0, Decimal('0')))
+        self.assertEqual(self.totals(self.furniture), (2, Decimal('1100.50')))
+        self.assertEqual(
+            set(self.furniture.get_descendants()), {self.computers, self.laptops}
+        )
+
+        self.furniture.parent = self.laptops
+        with self.assertRaises(ValidationError):
+            self.furniture.save()
+
+        asset.delete()
+        self.assertEqual(self.totals(self.furniture), (1, Decimal('200.00')))
+        for name in (CATEGORY_SUBTREE_ASSETS, CATEGORY_SUBTREE_VALUE):
+            self.assertEqual(CounterService.reconcile(name), {})
+
+    def test_migration_backfills_subtree_counters(self):
+        self.create_asset(self.laptops, '10.00')
+        self.create_asset(self.computers, '5.00')
+        Counter.objects.filter(
+            name__in=[CATEGORY_SUBTREE_ASSETS, CATEGORY_SUBTREE_VALUE]
+        ).delete()
+        migration = import_module('apps.categories.migrations.0003_backfill_subtree_counters')
+        migration.backfill_subtree_counters(django_apps, None)
+        self.assertEqual(self.totals(self.hardware), (2, Decimal('15.00')))
+        self.assertEqual(self.totals(self.laptops), (1, Decimal('10.00')))
+        for name in (CATEGORY_SUBTREE_ASSETS, CATEGORY_SUBTREE_VALUE):
+            self.assertEqual(CounterService.reconcile(name, repair=False), {})
+
+    def test_subtree_browsing(self):
+        self.create_asset(self.laptops, '10.00')
+        self.create_asset(self.furniture, '5.00')
+        with self.assertNumQueries(3):
+            tree = CategoryTree.fetch()
+        self.assertEqual([node['name'] for node in tree], ['Furniture', 'Hardware'])
+        self.assertEqual(tree[1]['subtree_asset_count'], 1)
+        self.assertEqual(tree[1]['children'][0]['children'][0]['id'], self.laptops.pk)
+
+        user = get_user_model().objects.create_user(username='admin', password='pass12345')
+        user.profile.role = 'ADMIN'
+        user.profile.save()
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.get(
+            reverse('assets:asset-list'), {'category': self.hardware.pk, 'subtree': 'true'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        response = client.get(
+            reverse('categories:category-subcategories', args=[self.hardware.pk]),
+            {'recursive': 'true'}
+        )
+        self.assertEqual(
+            {row['name'] for row in response.data}, {'Computers', 'Laptops'}
+        )
+        self.assertEqual(
+            {row['subtree_asset_value'] for row in response.data}, {'10.00'}
+        )
+
+
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        self.hardware = Category.objects.create(name='Hardware')
+        self.laptops = Category.objects.create(name='Laptops', parent=self.hardware)
+        user = get_user_model().objects.create_user(
+            username='admin', email='admin@example.com', password='pass12345'
+        )
+        user.profile.role = 'ADMIN'
+        user.profile.save()
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+        self.detail_url = reverse('categories:category-detail', args=[self.hardware.pk])
+
+    def test_reads_revalidate_against_etags(self):
+        response = self.client.get(self.detail_url)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        # A rollup from below changes the representation, not updated_at
+        Asset.objects.create(
+            name='Laptop', category=self.laptops,
+            purchase_date=timezone.now().date(), purchase_price=Decimal('10.00')
+        )
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['subtree_asset_count'], 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+        list_url = reverse('categories:category-list')
+        etag = self.client.get(list_url)['ETag']
+        self.assertEqual(self.client.get(list_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(
+            self.client.get(list_url, {'root': 'true'}, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+        Category.objects.create(name='Furniture')
+        self.assertEqual(self.client.get(list_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_writes_require_a_matching_etag(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        response = self.client.patch(
+            self.detail_url, {'description': 'Computing'}, format='json', HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # The first write made the client's copy stale
+        response = self.client.patch(
+            self.detail_url, {'description': 'Lost update'}, format='json', HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.client.delete(self.detail_url, HTTP_IF_MATCH=etag).status_code, 412)
+        self.hardware.refresh_from_db()
+        self.assertEqual(self.hardware.description, 'Computing')
 
-# Create your tests here.
+        fresh = self.client.get(self.detail_url)['ETag']
+        self.assertEqual(self.client.delete(self.detail_url, HTTP_IF_MATCH=fresh).status_code, 204)
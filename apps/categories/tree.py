@@ -0,0 +1,129 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from core.cache_tags import TaggedCache, instance_tag
+from core.closure import ClosureTable
+from core.counters import CATEGORY_SUBTREE_ASSETS, CATEGORY_SUBTREE_VALUE, CounterService
+from .models import Category, CategoryClosure
+
+closure = ClosureTable(CategoryClosure)
+
+
+def to_cents(value):
+    """Whole cents of a price, as stored by the subtree value counter"""
+    if value is None:
+        return 0
+    return int((Decimal(str(value)) * 100).to_integral_value())
+
+
+class CategoryTree:
+    """
+    Maintains the category closure table and the subtree rollups on it.
+
+    Every category has two counters covering itself and everything below
+    it: CATEGORY_SUBTREE_ASSETS and CATEGORY_SUBTREE_VALUE (in cents).
+    Asset changes are added to all ancestors of the asset's category by
+    ``apply_assets``; moving a category shifts its totals from the old
+    ancestors to the new ones.
+    """
+
+    @staticmethod
+    def insert(category):
+        """Link a new category to itself and to every ancestor of its parent"""
+        closure.insert(category)
+
+    @staticmethod
+    def move(category):
+        """Re-link the subtree of ``category`` below its new parent"""
+        old_ancestors = closure.ancestor_ids(category.pk)
+        new_ancestors = closure.move(category)
+        totals = CategoryTree.totals(category.pk)
+        CategoryTree.shift(old_ancestors, totals, -1)
+        CategoryTree.shift(new_ancestors, totals, 1)
+
+    @staticmethod
+    def remove(category):
+        """
+        Turn the children of a category being deleted into roots, taking
+        their totals off the categories above
+        """
+        # Categories with assets are protected, so these are the children's
+        CategoryTree.shift(
+            closure.ancestor_ids(category.pk), CategoryTree.totals(category.pk), -1
+        )
+        closure.remove(category)
+        CounterService.discard(CATEGORY_SUBTREE_ASSETS, category.pk)
+        CounterService.discard(CATEGORY_SUBTREE_VALUE, category.pk)
+
+    @staticmethod
+    def totals(category_id):
+        """``(assets, cents)`` rolled up on a category"""
+        counters = CounterService.get_for(category_id, [
+            CATEGORY_SUBTREE_ASSETS, CATEGORY_SUBTREE_VALUE
+        ])
+        return counters[CATEGORY_SUBTREE_ASSETS], counters[CATEGORY_SUBTREE_VALUE]
+
+    @staticmethod
+    def shift(ancestor_ids, totals, sign):
+        count, cents = totals
+        for ancestor_id in ancestor_ids:
+            CounterService.increment(CATEGORY_SUBTREE_ASSETS, ancestor_id, sign * count)
+            CounterService.increment(CATEGORY_SUBTREE_VALUE, ancestor_id, sign * cents)
+        CategoryTree.totals_changed(ancestor_ids)
+
+    @staticmethod
+    def apply_assets(deltas):
+        """
+        Roll ``{category_id: (assets, cents)}`` changes up to each category
+        and all of its ancestors
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if pk is not None and any(delta)}
+        if not deltas:
+            return
+        counts, values = defaultdict(int), defaultdict(int)
+        for ancestor_id, descendant_id in CategoryClosure.objects.filter(
+            descendant_id__in=list(deltas)
+        ).values_list('ancestor_id', 'descendant_id'):
+            count, cents = deltas[descendant_id]
+            counts[ancestor_id] += count
+            values[ancestor_id] += cents
+        CounterService.apply(CATEGORY_SUBTREE_ASSETS, counts)
+        CounterService.apply(CATEGORY_SUBTREE_VALUE, values)
+        CategoryTree.totals_changed(counts)
+
+    @staticmethod
+    def totals_changed(category_ids):
+        """
+        Invalidate the cache tags of categories whose rollups changed;
+        ancestors further up are not otherwise touched by the change
+        """
+        TaggedCache.invalidate(*(instance_tag(Category, pk) for pk in category_ids))
+
+    @staticmethod
+    def fetch(root=None):
+        """
+        Return the whole tree, or the subtree under ``root``, as nested
+        dicts sorted by name, with the subtree totals of every node
+        """
+        categories = Category.objects.all()
+        if root is not None:
+            categories = categories.filter(ancestor_links__ancestor=root)
+        rows = list(categories.order_by('name').values('id', 'name', 'code', 'parent_id'))
+        ids = [row['id'] for row in rows]
+        counts = CounterService.get_many(CATEGORY_SUBTREE_ASSETS, ids)
+        values = CounterService.get_many(CATEGORY_SUBTREE_VALUE, ids)
+
+        nodes = {}
+        for row in rows:
+            key = str(row['id'])
+            nodes[row['id']] = {
+                **row,
+                'subtree_asset_count': counts.get(key, 0),
+                'subtree_asset_value': Decimal(values.get(key, 0)) / 100,
+                'children': [],
+            }
+        roots = []
+        for node in nodes.values():
+            parent = nodes.get(node['parent_id'])
+            (parent['children'] if parent else roots).append(node)
+        return roots
@@ -1,21 +1,29 @@
 from django.shortcuts import render
-from rest_framework import viewsets
+from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated
+from apps.assets.models import Asset
 from .models import Category
+from .tree import CategoryTree
 from .serializers import CategorySerializer, CategoryDetailSerializer
+from core.conditional import ConditionalRequestMixin
 from core.permissions import IsAdminUser, IsManagerUser
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from core.counters import (
+    CATEGORY_ASSETS, CATEGORY_SUBTREE_ASSETS, CATEGORY_SUBTREE_VALUE, CounterService,
+)
 
 # Create your views here.
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalRequestMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing categories
     """
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated, IsAdminUser|IsManagerUser]
+    # Asset counts and subtree totals are part of every category
+    etag_models = (Asset,)
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -23,7 +31,11 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return CategorySerializer
 
     def get_queryset(self):
-        queryset = Category.objects.all()
+        queryset = Category.objects.annotate(
+            counted_assets=CounterService.subquery(CATEGORY_ASSETS),
+            counted_subtree_assets=CounterService.subquery(CATEGORY_SUBTREE_ASSETS),
+            counted_subtree_value=CounterService.subquery(CATEGORY_SUBTREE_VALUE)
+        )
         # Filter root categories (no parent)
         if self.action == 'list' and self.request.query_params.get('root', False):
             queryset = queryset.filter(parent=None)
@@ -31,8 +43,27 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
     @action(detail=True)
     def subcategories(self, request, pk=None):
-        """Get all subcategories of a category"""
+        """
+        Get the direct subcategories of a category, or with ?recursive=true
+        every category below it
+        """
         category = self.get_object()
-        subcategories = category.subcategories.all()
+        if request.query_params.get('recursive') == 'true':
+            subcategories = self.get_queryset().filter(
+                ancestor_links__ancestor=category, ancestor_links__depth__gt=0
+            )
+        else:
+            subcategories = self.get_queryset().filter(parent=category)
         serializer = self.get_serializer(subcategories, many=True)
         return Response(serializer.data)
+
+    @action(detail=False)
+    def tree(self, request):
+        """
+        Get the category tree as nested nodes with subtree asset totals,
+        or with ?root=<id> the subtree under one category
+        """
+        root = request.query_params.get('root')
+        if root is not None and not (root.isdigit() and Category.objects.filter(pk=root).exists()):
+            return Response({'error': 'Category not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(CategoryTree.fetch(root))
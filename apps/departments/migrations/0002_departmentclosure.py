@@ -0,0 +1,45 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_closure(apps, schema_editor):
+    Department = apps.get_model('departments', 'Department')
+    DepartmentClosure = apps.get_model('departments', 'DepartmentClosure')
+    parents = dict(Department.objects.values_list('id', 'parent_id'))
+    links = []
+    for department_id in parents:
+        ancestor_id, depth, seen = department_id, 0, set()
+        # Stops at a root, or at a cycle left by the old unchecked saves
+        while ancestor_id is not None and ancestor_id not in seen:
+            seen.add(ancestor_id)
+            links.append(DepartmentClosure(
+                ancestor_id=ancestor_id, descendant_id=department_id, depth=depth
+            ))
+            ancestor_id, depth = parents.get(ancestor_id), depth + 1
+    DepartmentClosure.objects.bulk_create(links, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('departments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='departments.department')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='departments.department')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='departments_descend_11b46a_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
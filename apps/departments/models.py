@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from core.models import AuditableModel
-from core.utils import generate_unique_id
+from core.sequences import next_id, register_id_prefix
+from core.counters import DEPARTMENT_ACTIVE_USERS, CounterService
 from django.core.exceptions import ValidationError
 
 class Department(AuditableModel):
@@ -15,14 +16,46 @@ class Department(AuditableModel):
         related_name='sub_departments'
     )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Parent as stored, so save() can tell a move from other updates
+        if 'parent_id' in instance.__dict__:
+            instance._stored_parent_id = instance.parent_id
+        return instance
+
     def save(self, *args, **kwargs):
+        from .tree import DepartmentTree
+
         if not self.code:
-            self.code = generate_unique_id(prefix='DEPT')
-        super().save(*args, **kwargs)
+            self.code = next_id('DEPT')
+        adding = self._state.adding
+        if adding:
+            stored_parent_id = None
+        elif hasattr(self, '_stored_parent_id'):
+            stored_parent_id = self._stored_parent_id
+        else:
+            stored_parent_id = Department.objects.filter(pk=self.pk).values_list(
+                'parent_id', flat=True
+            ).first()
+
+        update_fields = kwargs.get('update_fields')
+        writes_parent = update_fields is None or bool({'parent', 'parent_id'} & set(update_fields))
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                DepartmentTree.insert(self)
+            elif writes_parent and self.parent_id != stored_parent_id:
+                DepartmentTree.move(self)
+        if adding or writes_parent:
+            self._stored_parent_id = self.parent_id
 
     @property
     def member_count(self):
-        return self.department_users.filter(is_active=True).count()
+        if hasattr(self, 'counted_members'):
+            return self.counted_members
+        return CounterService.get(DEPARTMENT_ACTIVE_USERS, self.pk)
 
     def clean(self):
         if self.parent and self.parent == self:
@@ -31,11 +64,24 @@ class Department(AuditableModel):
             raise ValidationError("Circular dependency detected")
 
     def is_ancestor(self, department):
-        if not department.parent:
-            return False
-        if department.parent == self:
-            return True
-        return self.is_ancestor(department.parent)
+        """Whether this department is above ``department`` in the tree"""
+        return DepartmentClosure.objects.filter(
+            ancestor_id=self.pk, descendant_id=department.pk, depth__gt=0
+        ).exists()
+
+    def get_ancestors(self, include_self=False):
+        """Departments above this one, nearest first"""
+        return Department.objects.filter(
+            descendant_links__descendant=self,
+            descendant_links__depth__gte=0 if include_self else 1
+        ).order_by('descendant_links__depth')
+
+    def get_descendants(self, include_self=False):
+        """All departments below this one, at any depth"""
+        return Department.objects.filter(
+            ancestor_links__ancestor=self,
+            ancestor_links__depth__gte=0 if include_self else 1
+        )
 
     def cache_tree(self):
         """Cache this department's tree structure"""
@@ -49,3 +95,34 @@ class Department(AuditableModel):
             models.Index(fields=['parent']),
             models.Index(fields=['created_at', 'status']),
         ]
+
+register_id_prefix('DEPT', Department, 'code')
+
+
+class DepartmentClosure(models.Model):
+    """
+    One row per department and each department above it, plus the
+    department itself at depth 0.
+
+    Kept in step with ``Department.parent`` by DepartmentTree, so ancestor
+    checks and whole-subtree filters are a single indexed lookup instead
+    of a walk up or down the parent chain.
+    """
+    ancestor = models.ForeignKey(
+        Department,
+        on_delete=models.CASCADE,
+        related_name='descendant_links'
+    )
+    descendant = models.ForeignKey(
+        Department,
+        on_delete=models.CASCADE,
+        related_name='ancestor_links'
+    )
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ['ancestor', 'descendant']
+        indexes = [
+            models.Index(fields=['descendant', 'depth']),
+        ]
+
@@ -12,6 +12,15 @@ class DepartmentSerializer(AuditableModelSerializer):
                  'member_count', 'is_active', 'created_at', 'updated_at')
         read_only_fields = ('created_at', 'updated_at')
 
+    def validate_parent(self, value):
+        """
+        Reject parents that would put the department inside its own subtree.
+        """
+        department = self.instance
+        if value and department and (value == department or department.is_ancestor(value)):
+            raise serializers.ValidationError("Circular dependency detected")
+        return value
+
     def validate_code(self, value):
         """
         Validate department code format.
@@ -0,0 +1,17 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from core.cache_tags import track_model
+from core.cache_utils import invalidate_department_cache
+from .models import Department
+from .tree import DepartmentTree
+
+track_model(Department, parents=('parent',))
+
+
+@receiver(pre_delete, sender=Department)
+def detach_department_subtree(sender, instance, **kwargs):
+    """Children outlive the department as roots (parent is SET_NULL)"""
+    # Children lose their parent by SQL, without signals of their own
+    invalidate_department_cache(instance.pk)
+    DepartmentTree.remove(instance)
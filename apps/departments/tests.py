@@ -3,7 +3,10 @@ from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from .models import Department
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from .models import Department, DepartmentClosure
+from .tree import DepartmentTree
 from apps.users.models import UserProfile
 
 User = get_user_model()
@@ -101,3 +104,137 @@ class DepartmentTests(APITestCase):
     def test_department_user_reassignment(self):
         """Test user reassignment when department is deactivated"""
         pass
+
+
+class DepartmentTreeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.company = Department.objects.create(name='Company')
+        self.division = Department.objects.create(name='Division', parent=self.company)
+        self.team = Department.objects.create(name='Team', parent=self.division)
+        self.other = Department.objects.create(name='Other')
+
+    def test_closure_follows_moves_and_deletes(self):
+        """Test ancestor checks and subtrees through moves and deletes"""
+        with self.assertNumQueries(1):
+            self.assertTrue(self.company.is_ancestor(self.team))
+        self.assertFalse(self.team.is_ancestor(self.company))
+        self.assertEqual(
+            list(self.team.get_ancestors()), [self.division, self.company]
+        )
+
+        self.division.parent = self.other
+        self.division.save()
+        self.assertEqual(set(self.other.get_descendants()), {self.division, self.team})
+        self.assertFalse(self.company.get_descendants().exists())
+        self.assertEqual(
+            DepartmentClosure.objects.get(ancestor=self.other, descendant=self.team).depth, 2
+        )
+
+        self.other.parent = self.team
+        with self.assertRaises(ValidationError):
+            self.other.save()
+        self.other.refresh_from_db()
+        self.assertIsNone(self.other.parent_id)
+
+        self.division.delete()
+        self.assertFalse(self.other.is_ancestor(Department.objects.get(pk=self.team.pk)))
+        self.assertEqual(list(self.team.get_ancestors(include_self=True)), [self.team])
+
+    def test_partial_saves_keep_the_closure(self):
+        """Test saves that leave the parent column alone do not re-link"""
+        self.division.parent = self.other
+        self.division.name = 'Renamed division'
+        self.division.save(update_fields=['name'])
+        self.assertTrue(self.company.is_ancestor(self.team))
+        self.assertFalse(self.other.get_descendants().exists())
+
+        self.division.save(update_fields=['parent'])
+        self.assertEqual(set(self.other.get_descendants()), {self.division, self.team})
+
+    def test_fetch_tree_and_cache(self):
+        """Test the nested tree fetch and the cached tree nodes"""
+        with self.assertNumQueries(1):
+            tree = DepartmentTree.fetch()
+        self.assertEqual([node['name'] for node in tree], ['Company', 'Other'])
+        self.assertEqual(tree[0]['children'][0]['children'][0]['id'], self.team.pk)
+        self.assertEqual(DepartmentTree.fetch(self.division)[0]['name'], 'Division')
+
+        from core.cache_utils import cache_department_tree
+        # Departments, their children and their member counters
+        with self.assertNumQueries(3):
+            cache_department_tree(Department.objects.all())
+        self.assertEqual(cache_department_tree(Department.objects.all()), {})
+
+        self.team.parent = self.company
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.save()
+        refreshed = cache_department_tree(Department.objects.all())
+        self.assertEqual(set(refreshed), {self.company.pk, self.division.pk, self.team.pk})
+        self.assertEqual(
+            set(refreshed[self.company.pk]['children']), {self.division.pk, self.team.pk}
+        )
+        self.assertEqual(refreshed[self.division.pk]['children'], [])
+
+    def test_stats_follow_member_moves(self):
+        """Test cached stats are dropped when a member joins the department"""
+        admin = User.objects.create_user(username='boss', email='boss@example.com', password='pass12345')
+        admin.profile.role = 'ADMIN'
+        admin.profile.save()
+        self.client.force_login(admin)
+        url = reverse('departments:department-stats', args=[self.team.pk])
+        self.assertEqual(self.client.get(url).json()['total_users'], 0)
+
+        member = User.objects.create_user(username='member', email='member@example.com', password='pass12345')
+        member.profile.department = self.team
+        with self.captureOnCommitCallbacks(execute=True):
+            member.profile.save()
+        self.assertEqual(self.client.get(url).json()['total_users'], 1)
+
+
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        self.company = Department.objects.create(name='Company')
+        self.team = Department.objects.create(name='Team', parent=self.company)
+        user = User.objects.create_user(
+            username='admin', email='admin@example.com', password='pass12345'
+        )
+        user.profile.role = 'ADMIN'
+        user.profile.save()
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+        self.list_url = reverse('departments:department-list')
+        self.detail_url = reverse('departments:department-detail', args=[self.team.pk])
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_reads_revalidate_against_etags(self):
+        """Test 304s until the department, its parent or the list changes"""
+        etag = self.client.get(self.detail_url)['ETag']
+        self.assertEqual(self.revalidate(self.detail_url, etag), 304)
+
+        # The parent is embedded
+        self.company.name = 'Holding'
+        self.company.save()
+        self.assertEqual(self.revalidate(self.detail_url, etag), 200)
+
+        list_etag = self.client.get(self.list_url)['ETag']
+        self.assertEqual(self.revalidate(self.list_url, list_etag), 304)
+        Department.objects.create(name='Other')
+        self.assertEqual(self.revalidate(self.list_url, list_etag), 200)
+
+    def test_writes_require_a_matching_etag(self):
+        """Test If-Match guards updates and deletes against lost updates"""
+        etag = self.client.get(self.detail_url)['ETag']
+        response = self.client.patch(
+            self.detail_url, {'description': 'Builders'}, format='json', HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.patch(
+            self.detail_url, {'description': 'Lost update'}, format='json', HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.client.delete(self.detail_url, HTTP_IF_MATCH=etag).status_code, 412)
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.description, 'Builders')
@@ -0,0 +1,48 @@
+from core.closure import ClosureTable
+from .models import Department, DepartmentClosure
+
+closure = ClosureTable(DepartmentClosure)
+
+
+class DepartmentTree:
+    """
+    Maintains the department closure table and reads the tree from it.
+
+    ``insert`` and ``move`` are called by Department.save and ``remove``
+    by the pre_delete signal, so the table follows every change to
+    ``parent`` made through the ORM.
+    """
+
+    @staticmethod
+    def insert(department):
+        """Link a new department to itself and to every ancestor of its parent"""
+        closure.insert(department)
+
+    @staticmethod
+    def move(department):
+        """Re-link the subtree of ``department`` below its new parent"""
+        closure.move(department)
+
+    @staticmethod
+    def remove(department):
+        """Turn the children of a department being deleted into roots"""
+        closure.remove(department)
+
+    @staticmethod
+    def fetch(root=None):
+        """
+        Return the whole tree, or the subtree under ``root``, as nested
+        dicts sorted by name, with one query
+        """
+        departments = Department.objects.all()
+        if root is not None:
+            departments = departments.filter(ancestor_links__ancestor=root)
+        nodes = {
+            row['id']: {**row, 'children': []}
+            for row in departments.order_by('name').values('id', 'name', 'code', 'parent_id')
+        }
+        roots = []
+        for node in nodes.values():
+            parent = nodes.get(node['parent_id'])
+            (parent['children'] if parent else roots).append(node)
+        return roots
@@ -3,59 +3,64 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Count
 from .models import Department
+from .tree import DepartmentTree
 from .serializers import DepartmentSerializer
 from core.permissions import IsAdminUser, IsManagerUser
+from core.cache_tags import TaggedCache, instance_tag
+from core.conditional import ConditionalRequestMixin
 from core.cache_utils import cache_department_tree
-from django.core.cache import cache
 from django.utils import timezone
 from django.db.models import Prefetch
 from apps.users.models import UserProfile
+from core.counters import (
+    DEPARTMENT_ASSETS, DEPARTMENT_USERS, DEPARTMENT_ACTIVE_USERS, CounterService,
+)
 
 # Create your views here.
 
-class DepartmentViewSet(viewsets.ModelViewSet):
+class DepartmentViewSet(ConditionalRequestMixin, viewsets.ModelViewSet):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
     permission_classes = [IsAdminUser|IsManagerUser]
+    # Member counts follow profiles; the parent's name is embedded
+    etag_models = (UserProfile,)
+    etag_parents = ('parent',)
 
     def get_queryset(self):
-        """Optimized queryset with select_related and prefetch_related"""
-        queryset = Department.objects.select_related('parent')\
+        """Departments with their maintained member and asset counters"""
+        return Department.objects.select_related('parent')\
             .prefetch_related(
                 Prefetch('sub_departments', queryset=Department.objects.select_related('parent')),
-                Prefetch('department_users', queryset=UserProfile.objects.select_related('user')),
-                'asset_set'
             ).annotate(
-                user_count=Count('department_users', distinct=True),
-                asset_count=Count('asset_set', distinct=True)
+                counted_members=CounterService.subquery(DEPARTMENT_ACTIVE_USERS),
+                user_count=CounterService.subquery(DEPARTMENT_USERS),
+                asset_count=CounterService.subquery(DEPARTMENT_ASSETS)
             )
-        
-        # Add pagination
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['get'])
     def stats(self, request, pk=None):
-        """Optimized stats retrieval"""
-        cache_key = f'department_stats_{pk}'
-        stats = cache.get(cache_key)
-        
-        if not stats:
+        """
+        Optimized stats retrieval, cached until the department or one of
+        its members or assets changes
+        """
+        def compute():
             department = self.get_object()
-            stats = {
-                'total_users': department.department_users.count(),
-                'total_assets': department.asset_set.count(),
-                'active_users': department.department_users.filter(
-                    is_active=True
-                ).count(),
+            counters = CounterService.get_for(department.pk, [
+                DEPARTMENT_USERS, DEPARTMENT_ASSETS, DEPARTMENT_ACTIVE_USERS
+            ])
+            return {
+                'total_users': counters[DEPARTMENT_USERS],
+                'total_assets': counters[DEPARTMENT_ASSETS],
+                'active_users': counters[DEPARTMENT_ACTIVE_USERS],
                 'last_updated': timezone.now().isoformat()
             }
-            cache.set(cache_key, stats, timeout=300)  # Cache for 5 minutes
-        
+
+        stats = TaggedCache.get_or_set(
+            f'department_stats_{pk}', compute,
+            tags=[instance_tag(Department, pk)],
+            timeout=300  # Cache for 5 minutes
+        )
         return Response(stats)
 
     @action(detail=True, methods=['get'])
@@ -72,15 +77,36 @@ class DepartmentViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def assets(self, request, pk=None):
         """
-        Get assets in department.
+        Get assets in department, or with ?subtree=true in the department
+        and every department below it.
         """
         department = self.get_object()
-        assets = department.asset_set.all()
+        if request.query_params.get('subtree') == 'true':
+            from apps.assets.models import Asset
+            assets = Asset.objects.filter(department__ancestor_links__ancestor=department)
+        else:
+            assets = department.asset_set.all()
         from apps.assets.serializers import AssetSerializer
         serializer = AssetSerializer(assets, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
+        """
+        Get the department tree as nested nodes, or with ?root=<id> the
+        subtree under one department.
+        """
+        root = request.query_params.get('root')
+        if root is not None and not (root.isdigit() and Department.objects.filter(pk=root).exists()):
+            return Response({'error': 'Department not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(DepartmentTree.fetch(root))
+
     def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.list_etag(), None, self.list_departments, request, *args, **kwargs
+        )
+
+    def list_departments(self, request, *args, **kwargs):
         queryset = self.get_queryset()
         # Cache department tree when listing
         cache_department_tree(queryset)
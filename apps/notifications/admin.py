@@ -0,0 +1,19 @@
+from django.contrib import admin
+from .models import Notification, OutboxMessage
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipient', 'notification_type', 'created_at', 'read_at')
+    list_filter = ('notification_type', 'created_at')
+    search_fields = ('subject', 'recipient__username')
+    readonly_fields = ('created_at',)
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = (
+        'notification_type', 'channel', 'recipient', 'status',
+        'attempts', 'run_at', 'sent_at'
+    )
+    list_filter = ('status', 'channel', 'notification_type')
+    search_fields = ('recipient__username', 'dedup_key')
+    readonly_fields = ('created_at', 'sent_at', 'locked_by', 'locked_at')
@@ -0,0 +1,219 @@
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from core.constants import (
+    JOB_STATUS_CANCELLED, JOB_STATUS_COMPLETED, JOB_STATUS_FAILED,
+    JOB_STATUS_QUEUED, JOB_STATUS_RUNNING,
+)
+from core.utils import worker_name
+from .models import CHANNEL_EMAIL, CHANNEL_IN_APP, Notification, OutboxMessage
+from .services import NotificationService, notification_settings
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    """
+    Delivers outbox messages in batches.
+
+    A round claims up to ``BATCH_SIZE`` due messages, drops those already
+    delivered within ``DEDUP_WINDOW`` and hands the rest to their channel
+    in one go: in-app notifications are one bulk INSERT, emails go over a
+    single connection, and a recipient with ``DIGEST_THRESHOLD`` or more
+    emails in the batch gets one digest instead. A failed channel is
+    retried with exponential backoff. Delivery is at least once.
+    """
+
+    @staticmethod
+    def claim(worker, limit):
+        """Claim up to ``limit`` due messages for ``worker``"""
+        now = timezone.now()
+        due = list(OutboxMessage.objects.filter(
+            status=JOB_STATUS_QUEUED, run_at__lte=now
+        ).order_by('run_at', 'pk').values_list('pk', flat=True)[:limit])
+        if not due:
+            return []
+        # Rows another worker took in the meantime are left out
+        OutboxMessage.objects.filter(pk__in=due, status=JOB_STATUS_QUEUED).update(
+            status=JOB_STATUS_RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        return list(OutboxMessage.objects.select_related('recipient').filter(
+            pk__in=due, status=JOB_STATUS_RUNNING, locked_by=worker, locked_at=now
+        ))
+
+    @staticmethod
+    def requeue_stale(lease_timeout=None):
+        """Queue again messages whose dispatcher died while delivering them"""
+        lease_timeout = lease_timeout or notification_settings()['LEASE_TIMEOUT']
+        return OutboxMessage.objects.filter(
+            status=JOB_STATUS_RUNNING,
+            locked_at__lt=timezone.now() - timedelta(seconds=lease_timeout)
+        ).update(status=JOB_STATUS_QUEUED, locked_by='', locked_at=None)
+
+    @staticmethod
+    def dispatch(worker=None, limit=None):
+        """
+        Deliver one batch; returns a Counter of sent, skipped and failed
+        messages, empty when nothing was due
+        """
+        options = notification_settings()
+        messages = NotificationDispatcher.claim(
+            worker or worker_name(), limit or options['BATCH_SIZE']
+        )
+        outcome = Counter()
+        if not messages:
+            return outcome
+
+        unique = NotificationDispatcher.drop_duplicates(
+            messages, options['DEDUP_WINDOW']
+        )
+        outcome['skipped'] = len(messages) - len(unique)
+        messages = unique
+        no_address = [
+            message for message in messages
+            if message.channel == CHANNEL_EMAIL and not message.recipient.email
+        ]
+        NotificationDispatcher.skip(no_address, 'Recipient has no email address')
+        outcome['skipped'] += len(no_address)
+
+        skipped = {message.pk for message in no_address}
+        by_channel = defaultdict(list)
+        for message in messages:
+            if message.pk not in skipped:
+                by_channel[message.channel].append(message)
+        for channel, batch in by_channel.items():
+            try:
+                DELIVERY[channel](batch)
+            except Exception as e:
+                logger.exception("Delivering %s %s notifications failed", len(batch), channel)
+                NotificationDispatcher.fail(batch, e)
+                outcome['failed'] += len(batch)
+            else:
+                NotificationDispatcher.complete(batch)
+                outcome['sent'] += len(batch)
+        return outcome
+
+    @staticmethod
+    def drop_duplicates(messages, window):
+        """Skip messages delivered within ``window`` seconds or repeated in the batch"""
+        seen = set(OutboxMessage.objects.filter(
+            dedup_key__in={message.dedup_key for message in messages},
+            status=JOB_STATUS_COMPLETED,
+            sent_at__gte=timezone.now() - timedelta(seconds=window)
+        ).values_list('dedup_key', flat=True))
+        unique, duplicates = [], []
+        for message in messages:
+            if message.dedup_key in seen:
+                duplicates.append(message)
+            else:
+                seen.add(message.dedup_key)
+                unique.append(message)
+        NotificationDispatcher.skip(duplicates, 'Duplicate notification')
+        return unique
+
+    @staticmethod
+    def deliver_email(messages):
+        threshold = notification_settings()['DIGEST_THRESHOLD']
+        by_recipient = defaultdict(list)
+        for message in messages:
+            by_recipient[message.recipient_id].append(message)
+
+        emails = []
+        for group in by_recipient.values():
+            to = [group[0].recipient.email]
+            rendered = [
+                NotificationService.render(message.notification_type, message.context)
+                for message in group
+            ]
+            if threshold and len(rendered) >= threshold:
+                emails.append(EmailMessage(
+                    f"You have {len(rendered)} new notifications",
+                    '\n\n'.join(f"{subject}\n{body}".strip() for subject, body in rendered),
+                    to=to
+                ))
+            else:
+                emails.extend(
+                    EmailMessage(subject, body, to=to) for subject, body in rendered
+                )
+        get_connection().send_messages(emails)
+
+    @staticmethod
+    def deliver_in_app(messages):
+        notifications = []
+        for message in messages:
+            subject, body = NotificationService.render(
+                message.notification_type, message.context
+            )
+            notifications.append(Notification(
+                recipient_id=message.recipient_id,
+                notification_type=message.notification_type,
+                subject=subject[:200],
+                message=body,
+                data=message.context,
+            ))
+        Notification.objects.bulk_create(notifications)
+
+    @staticmethod
+    def complete(messages):
+        OutboxMessage.objects.filter(pk__in=[m.pk for m in messages]).update(
+            status=JOB_STATUS_COMPLETED,
+            sent_at=timezone.now(),
+            locked_by='',
+            locked_at=None,
+            error='',
+        )
+
+    @staticmethod
+    def skip(messages, reason):
+        if messages:
+            OutboxMessage.objects.filter(pk__in=[m.pk for m in messages]).update(
+                status=JOB_STATUS_CANCELLED,
+                locked_by='',
+                locked_at=None,
+                error=reason,
+            )
+
+    @staticmethod
+    def fail(messages, error):
+        """Retry with exponential backoff, or give up after max_attempts"""
+        now = timezone.now()
+        delay = notification_settings()['RETRY_DELAY']
+        by_attempts = defaultdict(list)
+        for message in messages:
+            exhausted = message.attempts >= message.max_attempts
+            by_attempts[(message.attempts, exhausted)].append(message.pk)
+        for (attempts, exhausted), pks in by_attempts.items():
+            if exhausted:
+                fields = {'status': JOB_STATUS_FAILED}
+            else:
+                fields = {
+                    'status': JOB_STATUS_QUEUED,
+                    'run_at': now + timedelta(seconds=delay * 2 ** (attempts - 1)),
+                }
+            OutboxMessage.objects.filter(pk__in=pks).update(
+                locked_by='', locked_at=None, error=str(error), **fields
+            )
+
+    @staticmethod
+    def purge(max_age=None):
+        """Delete finished messages older than ``max_age`` seconds"""
+        max_age = max_age or notification_settings()['KEEP_DELIVERED']
+        deleted, _ = OutboxMessage.objects.filter(
+            status__in=[JOB_STATUS_COMPLETED, JOB_STATUS_CANCELLED, JOB_STATUS_FAILED],
+            created_at__lt=timezone.now() - timedelta(seconds=max_age)
+        ).delete()
+        return deleted
+
+
+DELIVERY = {
+    CHANNEL_EMAIL: NotificationDispatcher.deliver_email,
+    CHANNEL_IN_APP: NotificationDispatcher.deliver_in_app,
+}
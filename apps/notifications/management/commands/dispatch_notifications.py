@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.notifications.dispatcher import NotificationDispatcher
+from apps.notifications.services import notification_settings
+from core.utils import worker_name
+
+# Seconds between purges of delivered messages
+PURGE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued notifications from the outbox'
+
+    def add_arguments(self, parser):
+        defaults = notification_settings()
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=defaults['BATCH_SIZE'],
+            help='Messages delivered per round'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=defaults['POLL_INTERVAL'],
+            help='Seconds to wait when no message is due'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no message is due'
+        )
+
+    def handle(self, *args, **options):
+        name = worker_name()
+        self.stdout.write(f"Dispatcher {name} delivering notifications")
+        next_purge = 0
+        try:
+            while True:
+                NotificationDispatcher.requeue_stale()
+                outcome = NotificationDispatcher.dispatch(name, options['batch_size'])
+                if outcome:
+                    self.stdout.write(
+                        f"Sent {outcome['sent']}, skipped {outcome['skipped']}, "
+                        f"failed {outcome['failed']}"
+                    )
+                    continue
+
+                if time.monotonic() >= next_purge:
+                    purged = NotificationDispatcher.purge()
+                    if purged:
+                        self.stdout.write(f"Purged {purged} delivered messages")
+                    next_purge = time.monotonic() + PURGE_INTERVAL
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping')
+        self.stdout.write(self.style.SUCCESS('Dispatcher stopped'))
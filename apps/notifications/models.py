@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from core.constants import JOB_STATUS_CHOICES, JOB_STATUS_QUEUED
+
+CHANNEL_EMAIL = 'email'
+CHANNEL_IN_APP = 'in_app'
+
+CHANNEL_CHOICES = [
+    (CHANNEL_EMAIL, 'Email'),
+    (CHANNEL_IN_APP, 'In-app'),
+]
+
+
+class Notification(models.Model):
+    """
+    In-app notification shown to a user
+    """
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='notifications'
+    )
+    notification_type = models.CharField(max_length=50)
+    subject = models.CharField(max_length=200)
+    message = models.TextField(blank=True)
+    data = models.JSONField(default=dict, blank=True)
+    read_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'read_at']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient} - {self.subject}"
+
+
+class OutboxMessage(models.Model):
+    """
+    A notification waiting to be delivered on one channel.
+
+    Rows are written in the transaction of the change they report, so a
+    notification exists exactly when the change was committed, and the
+    request never waits on delivery. Dispatchers claim rows with a
+    conditional UPDATE, like report jobs, and retry failed deliveries
+    with exponential backoff.
+    """
+    notification_type = models.CharField(max_length=50)
+    channel = models.CharField(max_length=20, choices=CHANNEL_CHOICES)
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='outbox_messages'
+    )
+    context = models.JSONField(default=dict)
+    # Identical notifications share a key, see NotificationService.dedup_key
+    dedup_key = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=20,
+        choices=JOB_STATUS_CHOICES,
+        default=JOB_STATUS_QUEUED
+    )
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+            models.Index(fields=['dedup_key', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.notification_type} to {self.recipient_id} by {self.channel} - {self.status}"
@@ -0,0 +1,159 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import models
+from django.template import Context, Template
+
+from .models import CHANNEL_EMAIL, CHANNEL_IN_APP, OutboxMessage
+
+NOTIFICATIONS_DEFAULTS = {
+    'CHANNELS': [CHANNEL_EMAIL, CHANNEL_IN_APP],
+    'BATCH_SIZE': 100,
+    'POLL_INTERVAL': 2.0,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 30,
+    'LEASE_TIMEOUT': 300,
+    'DEDUP_WINDOW': 60 * 60,
+    'DIGEST_THRESHOLD': 5,
+    'KEEP_DELIVERED': 60 * 60 * 24 * 7,
+}
+
+
+def notification_settings():
+    return {**NOTIFICATIONS_DEFAULTS, **getattr(settings, 'NOTIFICATIONS', {})}
+
+
+# Notification type -> subject and body templates, rendered with the stored
+# context by the dispatcher. Model instances are stored as
+# {'id', 'model', 'label'} (see serialize_context). A type may also name
+# its 'channels'.
+NOTIFICATION_TYPES = {
+    'request_created': {
+        'subject': 'Request {{ request.label }} submitted',
+        'body': 'Your request {{ request.label }} was submitted.',
+    },
+    'new_request_for_approval': {
+        'subject': 'Request {{ request.label }} awaits approval',
+        'body': 'A request from your department, {{ request.label }}, awaits approval.',
+    },
+    'request_approved': {
+        'subject': (
+            '{% if requests %}{{ requests|length }} requests approved'
+            '{% else %}Request {{ request.label }} approved{% endif %}'
+        ),
+        'body': (
+            '{% if requests %}These requests were approved:'
+            '{% for item in requests %}\n- {{ item.label }}{% endfor %}'
+            '{% else %}Your request {{ request.label }} was approved.{% endif %}'
+            '{% if comments %}\n\n{{ comments }}{% endif %}'
+        ),
+    },
+    'request_rejected': {
+        'subject': (
+            '{% if requests %}{{ requests|length }} requests rejected'
+            '{% else %}Request {{ request.label }} rejected{% endif %}'
+        ),
+        'body': (
+            '{% if requests %}These requests were rejected:'
+            '{% for item in requests %}\n- {{ item.label }}{% endfor %}'
+            '{% else %}Your request {{ request.label }} was rejected.{% endif %}'
+            '{% if comments %}\n\n{{ comments }}{% endif %}'
+        ),
+    },
+    'request_cancelled': {
+        'subject': 'Request {{ request.label }} cancelled',
+        'body': 'Request {{ request.label }} was cancelled.',
+    },
+}
+
+_templates = {}
+
+
+def serialize_context(value):
+    """
+    Make a notification context JSON-safe
+
+    Model instances become ``{'id', 'model', 'label'}`` so the outbox keeps
+    what the message needs without pickling objects.
+    """
+    if isinstance(value, models.Model):
+        return {'id': value.pk, 'model': value._meta.label_lower, 'label': str(value)}
+    if isinstance(value, dict):
+        return {str(key): serialize_context(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set, models.QuerySet)):
+        return [serialize_context(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class NotificationService:
+    """
+    Service class for sending notifications.
+
+    Notifying only writes outbox rows, in the caller's transaction; the
+    dispatch_notifications worker delivers them (see
+    apps.notifications.dispatcher).
+    """
+
+    @staticmethod
+    def notify(notification_type, recipients, context=None):
+        """
+        Queue a notification for one user or many; returns the outbox rows
+
+        Recipients may be users or user ids.
+        """
+        if isinstance(recipients, (models.Model, int)):
+            recipients = [recipients]
+        return NotificationService.notify_each(
+            notification_type, [(recipient, context) for recipient in recipients]
+        )
+
+    @staticmethod
+    def notify_each(notification_type, items):
+        """Queue one notification per ``(recipient, context)`` pair in one query"""
+        options = notification_settings()
+        channels = NOTIFICATION_TYPES.get(notification_type, {}).get(
+            'channels', options['CHANNELS']
+        )
+        messages = []
+        for recipient, context in items:
+            recipient_id = getattr(recipient, 'pk', recipient)
+            if recipient_id is None:
+                continue
+            data = serialize_context(context or {})
+            for channel in channels:
+                messages.append(OutboxMessage(
+                    notification_type=notification_type,
+                    channel=channel,
+                    recipient_id=recipient_id,
+                    context=data,
+                    dedup_key=NotificationService.dedup_key(
+                        notification_type, channel, recipient_id, data
+                    ),
+                    max_attempts=options['MAX_ATTEMPTS'],
+                ))
+        return OutboxMessage.objects.bulk_create(messages)
+
+    @staticmethod
+    def dedup_key(notification_type, channel, recipient_id, context):
+        payload = json.dumps(
+            [notification_type, channel, recipient_id, context], sort_keys=True
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def render(notification_type, context):
+        """Return the ``(subject, body)`` of a stored notification"""
+        if notification_type not in _templates:
+            spec = NOTIFICATION_TYPES.get(notification_type, {})
+            _templates[notification_type] = (
+                Template(spec.get(
+                    'subject', notification_type.replace('_', ' ').capitalize()
+                )),
+                Template(spec.get('body', '')),
+            )
+        subject, body = _templates[notification_type]
+        context = Context(context, autoescape=False)
+        return subject.render(context).strip(), body.render(context).strip()
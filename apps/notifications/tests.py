@@ -0,0 +1,123 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.requests.models import RequestType
+from apps.requests.services import RequestService
+from core.constants import JOB_STATUS_COMPLETED, JOB_STATUS_QUEUED
+from .dispatcher import NotificationDispatcher
+from .models import CHANNEL_EMAIL, CHANNEL_IN_APP, Notification, OutboxMessage
+from .services import NotificationService
+
+User = get_user_model()
+
+CONTEXT = {'request': {'label': 'REQ1'}}
+
+
+class NotificationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='alice', email='alice@example.com', password='pass12345'
+        )
+
+    def test_outbox_rows_follow_the_transaction(self):
+        try:
+            with transaction.atomic():
+                NotificationService.notify('request_cancelled', self.user, CONTEXT)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_request_creation_queues_notification(self):
+        request_type = RequestType.objects.create(name='Loan', approval_levels=1)
+        request = RequestService.create_request(
+            {'request_type': request_type, 'title': 'Laptop', 'description': 'Needed'},
+            self.user
+        )
+        message = OutboxMessage.objects.get(channel=CHANNEL_IN_APP)
+        self.assertEqual(message.notification_type, 'request_created')
+        self.assertEqual(message.context['request']['id'], request.pk)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_dispatch_delivers_each_channel(self):
+        NotificationService.notify('request_cancelled', self.user, CONTEXT)
+        outcome = NotificationDispatcher.dispatch('worker-1')
+        self.assertEqual(outcome['sent'], 2)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Request REQ1 cancelled')
+        self.assertEqual(mail.outbox[0].to, ['alice@example.com'])
+        notification = Notification.objects.get(recipient=self.user)
+        self.assertEqual(notification.subject, 'Request REQ1 cancelled')
+        self.assertFalse(
+            OutboxMessage.objects.exclude(status=JOB_STATUS_COMPLETED).exists()
+        )
+        self.assertFalse(NotificationDispatcher.dispatch('worker-1'))
+
+    def test_duplicates_delivered_once(self):
+        for _ in range(2):
+            NotificationService.notify('request_cancelled', self.user, CONTEXT)
+        outcome = NotificationDispatcher.dispatch('worker-1')
+        self.assertEqual((outcome['sent'], outcome['skipped']), (2, 2))
+
+        NotificationService.notify('request_cancelled', self.user, CONTEXT)
+        outcome = NotificationDispatcher.dispatch('worker-1')
+        self.assertEqual((outcome['sent'], outcome['skipped']), (0, 2))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_emails_digested_per_recipient(self):
+        NotificationService.notify_each('request_cancelled', [
+            (self.user, {'request': {'label': f'REQ{n}'}}) for n in range(6)
+        ])
+        NotificationDispatcher.dispatch('worker-1')
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'You have 6 new notifications')
+        self.assertIn('Request REQ5 cancelled', mail.outbox[0].body)
+        self.assertEqual(Notification.objects.filter(recipient=self.user).count(), 6)
+
+    def test_failed_channel_retried_with_backoff(self):
+        NotificationService.notify('request_cancelled', self.user, CONTEXT)
+        with mock.patch(
+            'apps.notifications.dispatcher.get_connection',
+            side_effect=OSError('SMTP unavailable')
+        ):
+            outcome = NotificationDispatcher.dispatch('worker-1')
+        self.assertEqual((outcome['sent'], outcome['failed']), (1, 1))
+
+        email = OutboxMessage.objects.get(channel=CHANNEL_EMAIL)
+        self.assertEqual(email.status, JOB_STATUS_QUEUED)
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('SMTP unavailable', email.error)
+        self.assertGreater(email.run_at, timezone.now() + timedelta(seconds=20))
+        # Not due yet
+        self.assertFalse(NotificationDispatcher.dispatch('worker-1'))
+
+        OutboxMessage.objects.update(run_at=timezone.now())
+        self.assertEqual(NotificationDispatcher.dispatch('worker-1')['sent'], 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_list_and_read_notifications(self):
+        other = User.objects.create_user(
+            username='bob', email='bob@example.com', password='pass12345'
+        )
+        NotificationService.notify('request_cancelled', [self.user, other], CONTEXT)
+        NotificationDispatcher.dispatch('worker-1')
+
+        self.client.force_authenticate(user=self.user)
+        url = reverse('notifications:notification-list')
+        response = self.client.get(url, {'unread': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+        response = self.client.post(reverse('notifications:notification-read-all'))
+        self.assertEqual(response.data['updated'], 1)
+        response = self.client.get(url, {'unread': 'true'})
+        self.assertEqual(len(response.data['results']), 0)
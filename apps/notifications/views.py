@@ -0,0 +1,52 @@
+from django.utils import timezone
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from core.pagination import KeysetPagination
+from .models import Notification
+from .serializers import NotificationSerializer
+
+
+class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    In-app notifications of the current user
+
+    list:
+    Return the user's notifications, newest first; ?unread=true for unread only.
+
+    read:
+    Mark a notification as read.
+
+    read_all:
+    Mark all of the user's notifications as read.
+    """
+    serializer_class = NotificationSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):  # for swagger schema generation
+            return Notification.objects.none()
+        queryset = Notification.objects.filter(recipient=self.request.user)
+        if self.request.query_params.get('unread') == 'true':
+            queryset = queryset.filter(read_at__isnull=True)
+        return queryset
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        """Mark a notification as read"""
+        notification = self.get_object()
+        if notification.read_at is None:
+            notification.read_at = timezone.now()
+            notification.save(update_fields=['read_at'])
+        return Response(self.get_serializer(notification).data)
+
+    @action(detail=False, methods=['post'], url_path='read-all')
+    def read_all(self, request):
+        """Mark all notifications as read"""
+        updated = Notification.objects.filter(
+            recipient=request.user, read_at__isnull=True
+        ).update(read_at=timezone.now())
+        return Response({'updated': updated})
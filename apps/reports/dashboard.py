@@ -0,0 +1,106 @@
+from django.core.cache import cache
+from django.db.models import CharField, Count, Q, Value
+from django.utils import timezone
+
+from apps.assets.models import Asset, AssetMaintenance, AssetAssignment
+from core.constants import ASSET_STATUS_CHOICES, CACHE_TIMEOUT
+
+DASHBOARD_CACHE_KEY = 'reports_dashboard'
+
+
+def month_range(now=None):
+    """Return the [start, end) datetimes of the month containing ``now``"""
+    now = timezone.localtime(now or timezone.now())
+    start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start, end
+
+
+class DashboardService:
+    """
+    Aggregates the statistics behind ``ReportViewSet.dashboard``.
+
+    Asset counts come from one conditional aggregation, this month's
+    maintenance and assignment counts from one UNION ALL of two range
+    counts. The result is cached per month and dropped whenever an asset,
+    maintenance record or assignment is written (see ``signals``).
+    """
+
+    @staticmethod
+    def cache_key(now=None):
+        start, _ = month_range(now)
+        return f'{DASHBOARD_CACHE_KEY}_{start:%Y_%m}'
+
+    @staticmethod
+    def get_stats(now=None):
+        """Return dashboard statistics, from the cache when possible"""
+        key = DashboardService.cache_key(now)
+        stats = cache.get(key)
+        if stats is None:
+            stats = DashboardService.compute_stats(now)
+            cache.set(key, stats, CACHE_TIMEOUT)
+        return stats
+
+    @staticmethod
+    def compute_stats(now=None):
+        """Compute dashboard statistics in two queries"""
+        by_status = DashboardService.asset_counts()
+        this_month = DashboardService.month_counts(now)
+        return {
+            'assets': {
+                'total': by_status.pop('total'),
+                **{status.lower(): count for status, count in by_status.items()},
+            },
+            'maintenance': {
+                'this_month': this_month['maintenance'],
+            },
+            'assignments': {
+                'this_month': this_month['assignments'],
+            }
+        }
+
+    @staticmethod
+    def asset_counts():
+        """Total and per-status asset counts in a single pass"""
+        return Asset.objects.aggregate(
+            total=Count('pk'),
+            **{
+                status: Count('pk', filter=Q(asset_status=status))
+                for status, _ in ASSET_STATUS_CHOICES
+            }
+        )
+
+    @staticmethod
+    def month_counts(now=None):
+        """Maintenance and assignment counts for the current month"""
+        start, end = month_range(now)
+        maintenance = AssetMaintenance.objects.filter(
+            maintenance_date__gte=start,
+            maintenance_date__lt=end,
+        )
+        assignments = AssetAssignment.objects.filter(
+            assigned_date__gte=start,
+            assigned_date__lt=end,
+        )
+        counts = {'maintenance': 0, 'assignments': 0}
+        counts.update(
+            DashboardService._labelled_count(maintenance, 'maintenance').union(
+                DashboardService._labelled_count(assignments, 'assignments'),
+                all=True
+            )
+        )
+        return counts
+
+    @staticmethod
+    def invalidate():
+        """Drop the cached statistics for the current month"""
+        cache.delete(DashboardService.cache_key())
+
+    @staticmethod
+    def _labelled_count(queryset, label):
+        return queryset.order_by().annotate(
+            kind=Value(label, output_field=CharField())
+        ).values('kind').annotate(count=Count('pk')).values_list('kind', 'count')
@@ -0,0 +1,314 @@
+import csv
+import io
+import tempfile
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from apps.assets.models import Asset, AssetAssignment, AssetMaintenance
+from apps.categories.models import Category
+from apps.departments.models import Department
+from apps.users.models import UserProfile
+
+# Rows fetched from the database per round trip, and CSV rows per
+# streamed chunk
+EXPORT_CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'CSV': 'text/csv',
+    'EXCEL': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+EXTENSIONS = {
+    'CSV': 'csv',
+    'EXCEL': 'xlsx',
+}
+
+
+class ReportExport:
+    """
+    Streams the rows of one report type.
+
+    Rows come from ``values_list()`` in chunks, so no model instances are
+    built and only one chunk is held in memory at a time, whether the
+    report has a thousand rows or a million. Writers consume the rows as
+    they arrive.
+    """
+    model = None
+    # Name of the rows in a template context
+    context_name = 'rows'
+    # (header, lookup) pairs
+    columns = ()
+    # Request parameter -> lookup it filters on
+    filters = {}
+    # Field filtered by the start_date/end_date parameters
+    date_field = None
+    # Summary name -> aggregate
+    aggregates = {'total_count': Count('pk')}
+    # Tables the rows are read from, for the result cache's data version
+    related_models = ()
+
+    def __init__(self, parameters=None, chunk_size=EXPORT_CHUNK_SIZE):
+        self.parameters = parameters or {}
+        self.chunk_size = chunk_size
+
+    @property
+    def headers(self):
+        return [header for header, _ in self.columns]
+
+    @property
+    def source_models(self):
+        return (self.model,) + tuple(self.related_models)
+
+    def get_queryset(self):
+        queryset = self.model.objects.all()
+        for parameter, lookup in self.filters.items():
+            if self.parameters.get(parameter):
+                queryset = queryset.filter(**{lookup: self.parameters[parameter]})
+        start_date = self.parameters.get('start_date')
+        end_date = self.parameters.get('end_date')
+        if self.date_field and start_date and end_date:
+            queryset = queryset.filter(
+                **{f'{self.date_field}__date__range': [start_date, end_date]}
+            )
+        return queryset
+
+    def rows(self):
+        """
+        Yield one tuple per row, in ``columns`` order
+
+        Rows are read in primary key order, one ``chunk_size`` query at a
+        time. Unlike a single ``iterator()`` cursor this holds no read
+        lock between chunks, which on SQLite would keep every writer
+        waiting (progress updates included) until the export finished.
+        """
+        lookups = [lookup for _, lookup in self.columns]
+        queryset = self.get_queryset().values_list('pk', *lookups).order_by('pk')
+        last_pk = None
+        while True:
+            chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            batch = list(chunk[:self.chunk_size])
+            for row in batch:
+                yield row[1:]
+            if len(batch) < self.chunk_size:
+                return
+            last_pk = batch[-1][0]
+
+    def records(self):
+        """
+        Yield one dict per row keyed by field name, for templates
+
+        Lookups across relations nest, so templates written against model
+        instances, e.g. ``{{ asset.name }}`` or ``{{ asset.category.name }}``,
+        render unchanged. A relation whose fields are all empty is None.
+        """
+        paths = [lookup.split('__') for _, lookup in self.columns]
+        for row in self.rows():
+            record = {}
+            for path, value in zip(paths, row):
+                target = record
+                for name in path[:-1]:
+                    target = target.setdefault(name, {})
+                target[path[-1]] = value
+            yield {name: empty_to_none(value) for name, value in record.items()}
+
+    def summary(self):
+        return self.get_queryset().order_by().aggregate(**self.aggregates)
+
+    def context(self):
+        """Template context for PDF rendering"""
+        return {
+            self.context_name: self.records(),
+            'headers': self.headers,
+            **self.summary(),
+        }
+
+    def tracked_rows(self, on_progress):
+        """
+        ``rows()`` calling ``on_progress(done, total)`` once per chunk
+        """
+        total = self.summary()['total_count']
+        done = 0
+        for done, row in enumerate(self.rows(), 1):
+            yield row
+            if done % self.chunk_size == 0:
+                on_progress(done, total)
+        on_progress(done, total)
+
+    def write(self, report_format, fileobj, on_progress=None):
+        rows = self.tracked_rows(on_progress) if on_progress else self.rows()
+        if report_format == 'CSV':
+            write_csv(self.headers, rows, fileobj)
+        elif report_format == 'EXCEL':
+            write_excel(self.headers, rows, fileobj)
+        else:
+            raise ValueError(f"Unsupported export format: {report_format}")
+
+    def to_file(self, report_format, name=None, on_progress=None):
+        """
+        Write the export to a temporary file, for saving into a FileField
+        """
+        output = tempfile.TemporaryFile()
+        self.write(report_format, output, on_progress)
+        output.seek(0)
+        name = name or f'{self.context_name}_{timezone.now():%Y%m%d%H%M%S}'
+        return File(output, name=f'{name}.{EXTENSIONS[report_format]}')
+
+    def stream_csv(self):
+        """Yield the CSV in chunks, for a StreamingHttpResponse"""
+        return stream_csv(self.headers, self.rows(), self.chunk_size)
+
+
+class AssetExport(ReportExport):
+    model = Asset
+    context_name = 'assets'
+    columns = (
+        ('Asset ID', 'asset_id'),
+        ('Name', 'name'),
+        ('Category', 'category__name'),
+        ('Department', 'department__name'),
+        ('Status', 'asset_status'),
+        ('Assigned To', 'assigned_to__user__username'),
+        ('Purchase Date', 'purchase_date'),
+        ('Purchase Price', 'purchase_price'),
+        ('Manufacturer', 'manufacturer'),
+        ('Model Number', 'model_number'),
+        ('Serial Number', 'serial_number'),
+        ('Location', 'location'),
+    )
+    filters = {
+        'status': 'asset_status',
+        'category': 'category_id',
+        'department': 'department_id',
+    }
+    aggregates = {
+        'total_count': Count('pk'),
+        'total_value': Sum('purchase_price'),
+    }
+    related_models = (Category, Department, UserProfile, get_user_model())
+
+
+class MaintenanceExport(ReportExport):
+    model = AssetMaintenance
+    context_name = 'maintenance_records'
+    columns = (
+        ('Maintenance ID', 'maintenance_id'),
+        ('Asset ID', 'asset__asset_id'),
+        ('Asset', 'asset__name'),
+        ('Type', 'maintenance_type'),
+        ('Date', 'maintenance_date'),
+        ('Cost', 'cost'),
+        ('Performed By', 'performed_by__user__username'),
+        ('Next Maintenance', 'next_maintenance_date'),
+        ('Description', 'description'),
+    )
+    filters = {
+        'asset': 'asset_id',
+        'maintenance_type': 'maintenance_type',
+        'department': 'asset__department_id',
+    }
+    date_field = 'maintenance_date'
+    aggregates = {
+        'total_count': Count('pk'),
+        'total_cost': Sum('cost'),
+    }
+    related_models = (Asset, UserProfile, get_user_model())
+
+
+class AssignmentExport(ReportExport):
+    model = AssetAssignment
+    context_name = 'assignments'
+    columns = (
+        ('Asset ID', 'asset__asset_id'),
+        ('Asset', 'asset__name'),
+        ('Assigned To', 'assigned_to__user__username'),
+        ('Assigned By', 'assigned_by__user__username'),
+        ('Assigned Date', 'assigned_date'),
+        ('Expected Return', 'expected_return_date'),
+        ('Returned', 'return_date'),
+        ('Notes', 'assignment_notes'),
+    )
+    filters = {
+        'asset': 'asset_id',
+        'assigned_to': 'assigned_to_id',
+        'department': 'asset__department_id',
+    }
+    date_field = 'assigned_date'
+    related_models = (Asset, UserProfile, get_user_model())
+
+
+EXPORTS = {
+    'ASSET': AssetExport,
+    'MAINTENANCE': MaintenanceExport,
+    'ASSIGNMENT': AssignmentExport,
+}
+
+
+def get_export(template_type, parameters=None):
+    """Return the export for a template type, or None if there is none"""
+    export_class = EXPORTS.get(template_type)
+    if export_class is None:
+        return None
+    return export_class(parameters)
+
+
+def empty_to_none(value):
+    """Replace nested dicts holding nothing but None with None"""
+    if not isinstance(value, dict):
+        return value
+    value = {name: empty_to_none(item) for name, item in value.items()}
+    return value if any(item is not None for item in value.values()) else None
+
+
+def stream_csv(headers, rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield encoded CSV, ``chunk_size`` rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % chunk_size == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def write_csv(headers, rows, fileobj):
+    """Write CSV rows to a binary file as they arrive"""
+    text = io.TextIOWrapper(fileobj, encoding='utf-8', newline='')
+    writer = csv.writer(text)
+    writer.writerow(headers)
+    writer.writerows(rows)
+    text.flush()
+    # Hand the binary file back to the caller open
+    text.detach()
+    return fileobj
+
+
+def write_excel(headers, rows, fileobj):
+    """
+    Write rows with openpyxl's write-only workbook
+
+    Write-only worksheets stream rows to disk instead of keeping a cell
+    object per value.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(headers)
+    for row in rows:
+        sheet.append([excel_value(value) for value in row])
+    workbook.save(fileobj)
+    return fileobj
+
+
+def excel_value(value):
+    # Excel has no notion of time zones
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.make_naive(value)
+    return value
@@ -0,0 +1,266 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+
+from core.constants import (
+    JOB_STATUS_CANCELLED, JOB_STATUS_COMPLETED, JOB_STATUS_FAILED,
+    JOB_STATUS_QUEUED, JOB_STATUS_RUNNING,
+)
+from core.utils import generate_pdf, worker_name
+from .exports import get_export
+from .models import Report, ReportJob
+from .results import ReportResultCache
+
+logger = logging.getLogger(__name__)
+
+REPORT_FORMATS = ('PDF', 'EXCEL', 'CSV')
+
+REPORT_JOBS_DEFAULTS = {
+    'WORKERS': 2,
+    'USE_PROCESSES': False,
+    'POLL_INTERVAL': 2.0,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 30,
+    'LEASE_TIMEOUT': 600,
+}
+
+
+def job_settings():
+    return {**REPORT_JOBS_DEFAULTS, **getattr(settings, 'REPORT_JOBS', {})}
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once it has been cancelled"""
+
+
+class ReportJobService:
+    """
+    Service class for queued report generation
+    """
+
+    @staticmethod
+    def enqueue(template, report_format, parameters=None, user=None,
+                run_at=None, max_attempts=None):
+        """
+        Queue a report; invalid template types and formats fail here
+        rather than in the worker
+        """
+        parameters = parameters or {}
+        if report_format not in REPORT_FORMATS:
+            raise ValueError("Invalid format")
+        export = get_export(template.template_type, parameters)
+        if export is None:
+            raise ValueError("Invalid template type")
+
+        job = ReportJob(
+            template=template,
+            format=report_format,
+            parameters=parameters,
+            requested_by=user,
+            run_at=run_at or timezone.now(),
+            max_attempts=max_attempts or job_settings()['MAX_ATTEMPTS'],
+        )
+        if run_at is None:
+            # An identical report of the current data is served as is
+            cached = ReportResultCache.lookup(ReportResultCache.fingerprint(
+                template, report_format, parameters, export
+            ))
+            if cached is not None:
+                now = timezone.now()
+                job.status = JOB_STATUS_COMPLETED
+                job.progress = 100
+                job.report = cached
+                job.started_at = job.finished_at = now
+        job.save()
+        return job
+
+    @staticmethod
+    def claim(worker, limit=1):
+        """
+        Claim up to ``limit`` due jobs for ``worker``; returns their ids
+
+        Each claim is a conditional UPDATE, so a job raced for by two
+        workers goes to exactly one of them.
+        """
+        now = timezone.now()
+        due = ReportJob.objects.filter(
+            status=JOB_STATUS_QUEUED, run_at__lte=now
+        ).order_by('run_at', 'pk').values_list('pk', flat=True)
+
+        claimed = []
+        for pk in due[:limit * 2]:
+            if len(claimed) == limit:
+                break
+            won = ReportJob.objects.filter(
+                pk=pk, status=JOB_STATUS_QUEUED
+            ).update(
+                status=JOB_STATUS_RUNNING,
+                locked_by=worker,
+                locked_at=now,
+                started_at=now,
+                attempts=F('attempts') + 1,
+                progress=0,
+            )
+            if won:
+                claimed.append(pk)
+        return claimed
+
+    @staticmethod
+    def requeue_stale(lease_timeout=None):
+        """
+        Recover jobs whose worker stopped refreshing the lease
+
+        Returns the number of jobs queued again or failed.
+        """
+        lease_timeout = lease_timeout or job_settings()['LEASE_TIMEOUT']
+        now = timezone.now()
+        stale = ReportJob.objects.filter(
+            status=JOB_STATUS_RUNNING,
+            locked_at__lt=now - timedelta(seconds=lease_timeout)
+        )
+        requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+            status=JOB_STATUS_QUEUED,
+            locked_by='',
+            locked_at=None,
+            error='Worker stopped responding',
+        )
+        failed = stale.update(
+            status=JOB_STATUS_FAILED,
+            finished_at=now,
+            error='Worker stopped responding',
+        )
+        if requeued or failed:
+            logger.warning(
+                "Recovered %s stale report jobs (%s failed)",
+                requeued + failed, failed
+            )
+        return requeued + failed
+
+    @staticmethod
+    def run(job_id):
+        """Generate the report of a claimed job and record the outcome"""
+        job = ReportJob.objects.select_related('template').get(pk=job_id)
+        if job.status != JOB_STATUS_RUNNING:
+            return job
+
+        try:
+            report = ReportJobService.generate(job)
+        except JobCancelled:
+            logger.info("Report job %s cancelled", job.pk)
+        except Exception as e:
+            logger.exception("Report job %s failed", job.pk)
+            ReportJobService.fail(job, e)
+        else:
+            ReportJob.objects.filter(pk=job.pk, status=JOB_STATUS_RUNNING).update(
+                status=JOB_STATUS_COMPLETED,
+                progress=100,
+                report=report,
+                finished_at=timezone.now(),
+                locked_by='',
+                locked_at=None,
+                error='',
+            )
+        job.refresh_from_db()
+        return job
+
+    @staticmethod
+    def generate(job):
+        """Write the report file and its Report record"""
+        export = get_export(job.template.template_type, job.parameters)
+        if export is None:
+            raise ValueError("Invalid template type")
+
+        # Taken before reading, so later writes make it stale, never the
+        # other way round
+        fingerprint = ReportResultCache.fingerprint(
+            job.template, job.format, job.parameters, export
+        )
+        cached = ReportResultCache.lookup(fingerprint)
+        if cached is not None:
+            return cached
+
+        def on_progress(done, total):
+            percent = min(99, done * 100 // total) if total else 99
+            # Also renews the lease; a cancelled job stops here
+            updated = ReportJob.objects.filter(
+                pk=job.pk, status=JOB_STATUS_RUNNING
+            ).update(progress=percent, locked_at=timezone.now())
+            if not updated:
+                raise JobCancelled(job.pk)
+
+        if job.format == 'PDF':
+            report_file = generate_pdf(job.template.template_file, export.context())
+        elif job.format in ('EXCEL', 'CSV'):
+            report_file = export.to_file(job.format, on_progress=on_progress)
+        else:
+            raise ValueError("Invalid format")
+
+        try:
+            report = Report.objects.create(
+                name=f"{job.template.name} {timezone.now():%Y-%m-%d %H:%M}",
+                template=job.template,
+                format=job.format,
+                parameters=job.parameters,
+                generated_by=job.requested_by,
+                generated_file=report_file
+            )
+        finally:
+            if report_file is not None:
+                report_file.close()
+        ReportResultCache.store(report, fingerprint)
+        return report
+
+    @staticmethod
+    def fail(job, error):
+        """Retry with exponential backoff, or give up after max_attempts"""
+        now = timezone.now()
+        running = ReportJob.objects.filter(pk=job.pk, status=JOB_STATUS_RUNNING)
+        if job.attempts < job.max_attempts:
+            delay = job_settings()['RETRY_DELAY'] * 2 ** (job.attempts - 1)
+            running.update(
+                status=JOB_STATUS_QUEUED,
+                run_at=now + timedelta(seconds=delay),
+                locked_by='',
+                locked_at=None,
+                error=str(error),
+            )
+        else:
+            running.update(
+                status=JOB_STATUS_FAILED,
+                finished_at=now,
+                locked_by='',
+                locked_at=None,
+                error=str(error),
+            )
+
+    @staticmethod
+    def cancel(job_id):
+        """Cancel a queued or running job; returns whether it was cancelled"""
+        return bool(ReportJob.objects.filter(
+            pk=job_id,
+            status__in=[JOB_STATUS_QUEUED, JOB_STATUS_RUNNING]
+        ).update(status=JOB_STATUS_CANCELLED, finished_at=timezone.now()))
+
+    @staticmethod
+    def run_due(worker=None, limit=100):
+        """Claim and run due jobs one after another in this process"""
+        worker = worker or worker_name()
+        return [
+            ReportJobService.run(job_id)
+            for job_id in ReportJobService.claim(worker, limit)
+        ]
+
+
+def run_job(job_id):
+    """
+    Pool entry point: run one job on this thread's own connection
+    """
+    close_old_connections()
+    try:
+        return ReportJobService.run(job_id).status
+    finally:
+        connection.close()
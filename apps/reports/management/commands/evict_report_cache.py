@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from apps.reports.results import ReportResultCache
+
+
+class Command(BaseCommand):
+    help = 'Stop reusing expired reports and trim the cache to its size limit'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age',
+            type=int,
+            help='Seconds a generated report may be reused (defaults to REPORT_CACHE)'
+        )
+        parser.add_argument(
+            '--max-size',
+            type=int,
+            help='Bytes of report files kept for reuse (defaults to REPORT_CACHE)'
+        )
+
+    def handle(self, *args, **options):
+        evicted = ReportResultCache.evict(
+            max_age=options['max_age'],
+            max_size=options['max_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Evicted {evicted} cached reports'))
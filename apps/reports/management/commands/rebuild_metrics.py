@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.reports.metrics import MetricsRollupService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized asset metrics from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Assets read and written per batch'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding asset metrics...')
+        rebuilt = MetricsRollupService.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt metrics for {rebuilt} assets')
+        )
@@ -0,0 +1,87 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.reports.jobs import ReportJobService, job_settings, run_job, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Run queued report jobs on a pool of worker threads or processes'
+
+    def add_arguments(self, parser):
+        defaults = job_settings()
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=defaults['WORKERS'],
+            help='Jobs run concurrently'
+        )
+        parser.add_argument(
+            '--processes',
+            action='store_true',
+            default=defaults['USE_PROCESSES'],
+            help='Use worker processes instead of threads'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=defaults['POLL_INTERVAL'],
+            help='Seconds to wait when no job is due'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no job is due or running'
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        use_processes = options['processes']
+        name = worker_name()
+
+        if use_processes:
+            # Children set Django up themselves when not forked
+            executor = ProcessPoolExecutor(workers, initializer=django.setup)
+        else:
+            executor = ThreadPoolExecutor(workers, thread_name_prefix='report-job')
+
+        self.stdout.write(
+            f"Worker {name} running report jobs on {workers} "
+            f"{'processes' if use_processes else 'threads'}"
+        )
+        running = {}
+        try:
+            while True:
+                for future in [f for f in running if f.done()]:
+                    job_id = running.pop(future)
+                    self.report(job_id, future)
+
+                ReportJobService.requeue_stale()
+                claimed = ReportJobService.claim(name, workers - len(running))
+                if claimed and use_processes:
+                    # Never share an open database connection with a child
+                    connections.close_all()
+                for job_id in claimed:
+                    running[executor.submit(run_job, job_id)] = job_id
+
+                if options['once'] and not running:
+                    break
+                if not claimed:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping, waiting for running jobs...')
+        finally:
+            executor.shutdown(wait=True)
+            for future, job_id in running.items():
+                self.report(job_id, future)
+
+    def report(self, job_id, future):
+        try:
+            status = future.result()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Job {job_id} crashed: {e}'))
+        else:
+            self.stdout.write(f'Job {job_id}: {status}')
@@ -1,36 +1,109 @@
-from django.db.models import Count, Avg, Sum, F, ExpressionWrapper, DurationField, Q
+from collections import defaultdict
+from decimal import Decimal
+from django.apps import apps as django_apps
+from django.db import transaction
+from django.db.models import Count, Sum, F, ExpressionWrapper, DurationField, FloatField, Q
 from django.utils import timezone
 from datetime import timedelta
-from apps.assets.models import Asset, AssetAssignment
+from apps.assets.models import Asset, AssetAssignment, AssetMaintenance
 from apps.requests.models import AssetRequest
-from django.db.models.functions import TruncMonth, TruncWeek, ExtractYear
+from core.constants import (
+    ASSET_STATUS_ASSIGNED, ASSET_STATUS_MAINTENANCE,
+    REQUEST_STATUS_PENDING, REQUEST_STATUS_APPROVED, REQUEST_STATUS_REJECTED,
+)
+from django.db.models.functions import TruncWeek
+from .models import AssetMetricsRollup, MetricsRollup
+
+GLOBAL = MetricsRollup.DIMENSION_GLOBAL
+DEPARTMENT = MetricsRollup.DIMENSION_DEPARTMENT
+CATEGORY = MetricsRollup.DIMENSION_CATEGORY
+
+# Counters every rollup row carries, summed over the assets in its group
+ASSET_COUNTERS = (
+    'asset_count',
+    'assigned_count',
+    'maintenance_asset_count',
+    'total_value',
+    'purchase_ordinal_sum',
+    'assignment_count',
+    'maintenance_count',
+    'maintenance_cost',
+    'in_maintenance_record_count',
+    'in_maintenance_record_cost',
+)
+
+ASSET_SNAPSHOT_FIELDS = (
+    'asset_code',
+    'name',
+    'department_pk',
+    'category_pk',
+    'asset_status',
+    'purchase_price',
+    'purchase_date',
+    'assignment_count',
+    'usage_seconds',
+    'maintenance_count',
+    'maintenance_cost',
+)
+
+# Asset fields a snapshot is taken from
+SOURCE_FIELDS = (
+    'asset_id',
+    'name',
+    'department_id',
+    'category_id',
+    'asset_status',
+    'purchase_price',
+    'purchase_date',
+)
+
+# Request status -> global row counter tracking it
+REQUEST_COUNTERS = {
+    REQUEST_STATUS_PENDING: 'request_pending',
+    REQUEST_STATUS_APPROVED: 'request_approved',
+    REQUEST_STATUS_REJECTED: 'request_rejected',
+}
+
+USAGE = ExpressionWrapper(
+    F('return_date') - F('assigned_date'),
+    output_field=DurationField()
+)
+
 
 class AssetMetrics:
     """
     Class for calculating various asset-related metrics
+
+    Reads come from the materialized rollups maintained by
+    MetricsRollupService, so their cost does not grow with the asset count.
     """
-    
+
     @staticmethod
     def get_most_used_assets(limit=10):
         """Get assets with the most assignments/usage"""
-        return Asset.objects.annotate(
-            assignment_count=Count('asset_assignments'),
-            total_usage_days=Sum(
-                ExpressionWrapper(
-                    F('asset_assignments__end_date') - F('asset_assignments__start_date'),
-                    output_field=DurationField()
-                )
-            )
-        ).order_by('-assignment_count')[:limit]
+        return [
+            {
+                'id': row['asset_pk'],
+                'asset_id': row['asset_code'],
+                'name': row['name'],
+                'assignment_count': row['assignment_count'],
+                'total_usage_days': round(row['usage_seconds'] / 86400, 2),
+            }
+            for row in AssetMetricsRollup.objects.order_by(
+                '-assignment_count', 'asset_pk'
+            ).values(
+                'asset_pk', 'asset_code', 'name',
+                'assignment_count', 'usage_seconds'
+            )[:limit]
+        ]
 
     @staticmethod
     def get_asset_utilization_rate():
         """Calculate asset utilization rate"""
-        total_assets = Asset.objects.count()
-        assigned_assets = Asset.objects.filter(
-            asset_status='ASSIGNED'
-        ).count()
-        
+        rollup = MetricsRollupService.get_global()
+        total_assets = rollup['asset_count']
+        assigned_assets = rollup['assigned_count']
+
         return {
             'total_assets': total_assets,
             'assigned_assets': assigned_assets,
@@ -40,56 +113,69 @@ class AssetMetrics:
     @staticmethod
     def get_asset_request_metrics():
         """Get metrics about asset requests"""
-        total_requests = AssetRequest.objects.count()
-        pending_requests = AssetRequest.objects.filter(status='PENDING').count()
-        approved_requests = AssetRequest.objects.filter(status='APPROVED').count()
-        rejected_requests = AssetRequest.objects.filter(status='REJECTED').count()
-        
+        rollup = MetricsRollupService.get_global()
+        total_requests = rollup['request_total']
+        approved_requests = rollup['request_approved']
+
         return {
             'total_requests': total_requests,
-            'pending_requests': pending_requests,
+            'pending_requests': rollup['request_pending'],
             'approved_requests': approved_requests,
-            'rejected_requests': rejected_requests,
+            'rejected_requests': rollup['request_rejected'],
             'approval_rate': (approved_requests / total_requests * 100) if total_requests > 0 else 0
         }
 
     @staticmethod
     def get_asset_maintenance_metrics():
         """Get metrics about asset maintenance"""
-        return Asset.objects.filter(
-            asset_status='MAINTENANCE'
-        ).aggregate(
-            total_in_maintenance=Count('id'),
-            avg_maintenance_cost=Avg('maintenance_records__cost'),
-            total_maintenance_cost=Sum('maintenance_records__cost')
-        )
+        rollup = MetricsRollupService.get_global()
+        records = rollup['in_maintenance_record_count']
+        cost = rollup['in_maintenance_record_cost']
+        return {
+            'total_in_maintenance': rollup['maintenance_asset_count'],
+            'avg_maintenance_cost': cost / records if records else None,
+            'total_maintenance_cost': cost if records else None,
+        }
 
     @staticmethod
     def get_asset_lifecycle_metrics():
         """Get metrics about asset lifecycle"""
-        current_date = timezone.now()
-        return Asset.objects.aggregate(
-            avg_age=Avg(current_date - F('purchase_date')),
-            total_value=Sum('purchase_price'),
-            depreciated_value=Sum('current_value')
-        )
+        rollup = MetricsRollupService.get_global()
+        count = rollup['asset_count']
+        if not count:
+            return {'avg_age': None, 'total_value': None, 'depreciated_value': None}
+
+        today = timezone.now().date().toordinal()
+        return {
+            'avg_age': timedelta(days=today - rollup['purchase_ordinal_sum'] / count),
+            'total_value': rollup['total_value'],
+            # Asset.current_value does not depreciate yet
+            'depreciated_value': rollup['total_value'],
+        }
 
     @staticmethod
     def get_department_usage_metrics():
         """Get metrics about asset usage by department"""
-        return Asset.objects.values(
-            'department__name'
+        return MetricsRollup.objects.filter(
+            dimension=DEPARTMENT,
+            asset_count__gt=0
         ).annotate(
-            asset_count=Count('id'),
-            total_value=Sum('purchase_price'),
-            utilization_rate=Count('id', filter=Q(asset_status='ASSIGNED')) * 100.0 / Count('id')
+            utilization_rate=ExpressionWrapper(
+                F('assigned_count') * 100.0 / F('asset_count'),
+                output_field=FloatField()
+            )
+        ).values(
+            'department__name',
+            'asset_count',
+            'total_value',
+            'utilization_rate'
         ).order_by('-asset_count')
 
     @staticmethod
     def get_trending_metrics(days=30):
         """Get trending metrics over time"""
         start_date = timezone.now() - timedelta(days=days)
-        
+
         # Asset requests over time
         requests_trend = AssetRequest.objects.filter(
             created_at__gte=start_date
@@ -98,16 +184,16 @@ class AssetMetrics:
         ).values('week').annotate(
             count=Count('id')
         ).order_by('week')
-        
+
         # Asset assignments over time
         assignments_trend = AssetAssignment.objects.filter(
-            start_date__gte=start_date
+            assigned_date__gte=start_date
         ).annotate(
-            week=TruncWeek('start_date')
+            week=TruncWeek('assigned_date')
         ).values('week').annotate(
             count=Count('id')
         ).order_by('week')
-        
+
         return {
             'requests_trend': list(requests_trend),
             'assignments_trend': list(assignments_trend)
@@ -116,17 +202,331 @@ class AssetMetrics:
     @staticmethod
     def get_category_metrics():
         """Get metrics by asset category"""
-        return Asset.objects.values(
-            'category__name'
+        return MetricsRollup.objects.filter(
+            dimension=CATEGORY,
+            asset_count__gt=0
         ).annotate(
-            asset_count=Count('id'),
-            total_value=Sum('purchase_price'),
-            maintenance_count=Count('maintenance_records'),
-            avg_utilization=Avg(
-                Case(
-                    When(asset_status='ASSIGNED', then=1),
-                    default=0,
-                    output_field=FloatField(),
+            avg_utilization=ExpressionWrapper(
+                F('assigned_count') * 100.0 / F('asset_count'),
+                output_field=FloatField()
+            )
+        ).values(
+            'category__name',
+            'asset_count',
+            'total_value',
+            'maintenance_count',
+            'avg_utilization'
+        ).order_by('-asset_count')
+
+
+class MetricsRollupService:
+    """
+    Service class maintaining the metrics rollups.
+
+    Every write to an asset, its assignments or its maintenance records
+    refreshes that asset's AssetMetricsRollup and applies the difference to
+    the global, department and category rows; request status changes are
+    applied to the global row as deltas. ``rebuild()`` (the
+    ``rebuild_metrics`` command) recomputes everything from scratch.
+    """
+
+    @staticmethod
+    def get_global():
+        """Return the global rollup counters"""
+        rollup = MetricsRollup.objects.filter(
+            dimension=GLOBAL, department=None, category=None
+        ).values().first()
+        if rollup is None:
+            rollup = {field: 0 for field in ASSET_COUNTERS}
+            rollup.update(request_total=0, request_pending=0,
+                          request_approved=0, request_rejected=0)
+        return rollup
+
+    @staticmethod
+    def snapshot_asset(asset_pk):
+        """Compute the per-asset snapshot, or None if the asset is gone"""
+        asset = Asset.objects.filter(pk=asset_pk).values(*SOURCE_FIELDS).first()
+        if asset is None:
+            return None
+
+        assignments = AssetAssignment.objects.filter(
+            asset_id=asset_pk
+        ).aggregate(
+            count=Count('pk'),
+            usage=Sum(USAGE, filter=Q(return_date__isnull=False))
+        )
+        maintenance = AssetMaintenance.objects.filter(
+            asset_id=asset_pk
+        ).aggregate(count=Count('pk'), cost=Sum('cost'))
+        return MetricsRollupService.build_snapshot(asset, assignments, maintenance)
+
+    @staticmethod
+    def build_snapshot(asset, assignments, maintenance):
+        """
+        Snapshot of an asset's ``SOURCE_FIELDS`` values and its assignment
+        (``count``, ``usage``) and maintenance (``count``, ``cost``) totals
+        """
+        return {
+            'asset_code': asset['asset_id'],
+            'name': asset['name'],
+            'department_pk': asset['department_id'],
+            'category_pk': asset['category_id'],
+            'asset_status': asset['asset_status'],
+            'purchase_price': asset['purchase_price'],
+            'purchase_date': asset['purchase_date'],
+            'assignment_count': assignments.get('count') or 0,
+            'usage_seconds': int(
+                (assignments.get('usage') or timedelta()).total_seconds()
+            ),
+            'maintenance_count': maintenance.get('count') or 0,
+            'maintenance_cost': maintenance.get('cost') or Decimal('0'),
+        }
+
+    @staticmethod
+    def contributions(snapshot):
+        """Map each rollup group to what ``snapshot`` adds to it"""
+        if snapshot is None:
+            return {}
+        in_maintenance = snapshot['asset_status'] == ASSET_STATUS_MAINTENANCE
+        counters = {
+            'asset_count': 1,
+            'assigned_count': int(snapshot['asset_status'] == ASSET_STATUS_ASSIGNED),
+            'maintenance_asset_count': int(in_maintenance),
+            'total_value': snapshot['purchase_price'],
+            'purchase_ordinal_sum': snapshot['purchase_date'].toordinal(),
+            'assignment_count': snapshot['assignment_count'],
+            'maintenance_count': snapshot['maintenance_count'],
+            'maintenance_cost': snapshot['maintenance_cost'],
+            'in_maintenance_record_count':
+                snapshot['maintenance_count'] if in_maintenance else 0,
+            'in_maintenance_record_cost':
+                snapshot['maintenance_cost'] if in_maintenance else Decimal('0'),
+        }
+        return {
+            (GLOBAL, None): counters,
+            (DEPARTMENT, snapshot['department_pk']): counters,
+            (CATEGORY, snapshot['category_pk']): counters,
+        }
+
+    @staticmethod
+    def refresh_asset(asset_pk):
+        """Bring the rollups up to date with one asset's current state"""
+        with transaction.atomic():
+            current = AssetMetricsRollup.objects.select_for_update().filter(
+                asset_pk=asset_pk
+            ).values(*ASSET_SNAPSHOT_FIELDS).first()
+            snapshot = MetricsRollupService.snapshot_asset(asset_pk)
+            if snapshot == current:
+                return
+
+            deltas = defaultdict(lambda: defaultdict(int))
+            for group, counters in MetricsRollupService.contributions(snapshot).items():
+                for field, value in counters.items():
+                    deltas[group][field] += value
+            for group, counters in MetricsRollupService.contributions(current).items():
+                for field, value in counters.items():
+                    deltas[group][field] -= value
+            for group, counters in deltas.items():
+                MetricsRollupService.apply_delta(group, counters)
+
+            if snapshot is None:
+                AssetMetricsRollup.objects.filter(asset_pk=asset_pk).delete()
+            else:
+                AssetMetricsRollup.objects.update_or_create(
+                    asset_pk=asset_pk, defaults=snapshot
                 )
-            ) * 100
-        ).order_by('-asset_count') 
\ No newline at end of file
+
+    @staticmethod
+    def add_assets(asset_pks):
+        """
+        Count assets inserted without signals, e.g. by a bulk import
+
+        Costs the same few queries for any number of assets: one per
+        rollup group they belong to.
+        """
+        with transaction.atomic():
+            assets = Asset.objects.filter(pk__in=asset_pks).values('pk', *SOURCE_FIELDS)
+            # New assets have no assignment or maintenance history yet
+            snapshots = {
+                asset['pk']: MetricsRollupService.build_snapshot(asset, {}, {})
+                for asset in assets
+            }
+            deltas = defaultdict(lambda: defaultdict(int))
+            for snapshot in snapshots.values():
+                for group, counters in MetricsRollupService.contributions(snapshot).items():
+                    for field, value in counters.items():
+                        deltas[group][field] += value
+            for group, counters in deltas.items():
+                MetricsRollupService.apply_delta(group, counters)
+            AssetMetricsRollup.objects.bulk_create([
+                AssetMetricsRollup(asset_pk=pk, **snapshot)
+                for pk, snapshot in snapshots.items()
+            ])
+
+    @staticmethod
+    def move_assets(asset_pks, status):
+        """
+        Bring the rollups up to date with assets bulk updated to ``status``
+
+        Costs the same few queries for any number of assets: one per
+        rollup group they belong to.
+        """
+        with transaction.atomic():
+            moving = list(AssetMetricsRollup.objects.select_for_update().filter(
+                asset_pk__in=asset_pks
+            ).exclude(asset_status=status).values('asset_pk', *ASSET_SNAPSHOT_FIELDS))
+            if not moving:
+                return
+
+            deltas = defaultdict(lambda: defaultdict(int))
+            for snapshot in moving:
+                moved = {**snapshot, 'asset_status': status}
+                for group, counters in MetricsRollupService.contributions(moved).items():
+                    for field, value in counters.items():
+                        deltas[group][field] += value
+                for group, counters in MetricsRollupService.contributions(snapshot).items():
+                    for field, value in counters.items():
+                        deltas[group][field] -= value
+            for group, counters in deltas.items():
+                MetricsRollupService.apply_delta(group, counters)
+
+            AssetMetricsRollup.objects.filter(
+                asset_pk__in=[snapshot['asset_pk'] for snapshot in moving]
+            ).update(asset_status=status)
+
+    @staticmethod
+    def apply_delta(group, counters):
+        """Add ``counters`` to a rollup row with a single UPDATE"""
+        counters = {field: value for field, value in counters.items() if value}
+        if not counters:
+            return
+        rollup = MetricsRollupService._group_row(group)
+        MetricsRollup.objects.filter(pk=rollup.pk).update(**{
+            field: F(field) + value for field, value in counters.items()
+        })
+
+    @staticmethod
+    def apply_request_transitions(transitions):
+        """
+        Apply ``{(old status, new status): count}`` to the request counters
+        of the global row, None standing for a request created or deleted
+        """
+        counters = defaultdict(int)
+        for (old, new), count in transitions.items():
+            if old == new:
+                continue
+            if old is None:
+                counters['request_total'] += count
+            if new is None:
+                counters['request_total'] -= count
+            if old in REQUEST_COUNTERS:
+                counters[REQUEST_COUNTERS[old]] -= count
+            if new in REQUEST_COUNTERS:
+                counters[REQUEST_COUNTERS[new]] += count
+        MetricsRollupService.apply_delta((GLOBAL, None), counters)
+
+    @staticmethod
+    def request_counts(requests):
+        """Request counters of the global row, counted over ``requests``"""
+        return requests.aggregate(
+            request_total=Count('pk'),
+            **{
+                field: Count('pk', filter=Q(status=status))
+                for status, field in REQUEST_COUNTERS.items()
+            }
+        )
+
+    @staticmethod
+    def detach_department(department_pk):
+        """Move a department's assets to the "no department" group"""
+        with transaction.atomic():
+            rollup = MetricsRollup.objects.filter(
+                dimension=DEPARTMENT, department_id=department_pk
+            ).values(*ASSET_COUNTERS).first()
+            if rollup:
+                MetricsRollupService.apply_delta((DEPARTMENT, None), rollup)
+                MetricsRollup.objects.filter(
+                    dimension=DEPARTMENT, department_id=department_pk
+                ).delete()
+            AssetMetricsRollup.objects.filter(
+                department_pk=department_pk
+            ).update(department_pk=None)
+
+    @staticmethod
+    def rebuild(chunk_size=2000, apps=None):
+        """
+        Recompute every rollup from the source tables
+
+        Models come from ``apps``, so data migrations can pass their
+        historical registry.
+        """
+        apps = apps or django_apps
+        Asset = apps.get_model('assets', 'Asset')
+        AssetAssignment = apps.get_model('assets', 'AssetAssignment')
+        AssetMaintenance = apps.get_model('assets', 'AssetMaintenance')
+        AssetRequest = apps.get_model('requests', 'AssetRequest')
+        AssetMetricsRollup = apps.get_model('reports', 'AssetMetricsRollup')
+        MetricsRollup = apps.get_model('reports', 'MetricsRollup')
+
+        assignments = {
+            row['asset_id']: row
+            for row in AssetAssignment.objects.order_by().values('asset_id').annotate(
+                count=Count('pk'),
+                usage=Sum(USAGE, filter=Q(return_date__isnull=False))
+            )
+        }
+        maintenance = {
+            row['asset_id']: row
+            for row in AssetMaintenance.objects.order_by().values('asset_id').annotate(
+                count=Count('pk'), cost=Sum('cost')
+            )
+        }
+
+        totals = defaultdict(lambda: defaultdict(int))
+        rebuilt = 0
+        with transaction.atomic():
+            AssetMetricsRollup.objects.all().delete()
+            MetricsRollup.objects.all().delete()
+
+            batch = []
+            assets = Asset.objects.order_by().values('pk', *SOURCE_FIELDS)
+            for asset in assets.iterator(chunk_size=chunk_size):
+                snapshot = MetricsRollupService.build_snapshot(
+                    asset,
+                    assignments.get(asset['pk'], {}),
+                    maintenance.get(asset['pk'], {})
+                )
+                for group, counters in MetricsRollupService.contributions(snapshot).items():
+                    for field, value in counters.items():
+                        totals[group][field] += value
+                batch.append(AssetMetricsRollup(asset_pk=asset['pk'], **snapshot))
+                rebuilt += 1
+                if len(batch) >= chunk_size:
+                    AssetMetricsRollup.objects.bulk_create(batch)
+                    batch = []
+            AssetMetricsRollup.objects.bulk_create(batch)
+
+            totals[GLOBAL, None].update(
+                MetricsRollupService.request_counts(AssetRequest.objects.all())
+            )
+            MetricsRollup.objects.bulk_create([
+                MetricsRollup(
+                    dimension=dimension,
+                    department_id=key if dimension == DEPARTMENT else None,
+                    category_id=key if dimension == CATEGORY else None,
+                    **counters
+                )
+                for (dimension, key), counters in totals.items()
+            ])
+        return rebuilt
+
+    @staticmethod
+    def _group_row(group):
+        dimension, key = group
+        # Unique per group, so of two racing creators one gets the other's row
+        rollup, _ = MetricsRollup.objects.get_or_create(
+            dimension=dimension,
+            department_id=key if dimension == DEPARTMENT else None,
+            category_id=key if dimension == CATEGORY else None,
+        )
+        return rollup
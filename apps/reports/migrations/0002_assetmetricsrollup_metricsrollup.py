@@ -0,0 +1,65 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0001_initial'),
+        ('departments', '0001_initial'),
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetMetricsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asset_pk', models.BigIntegerField(unique=True)),
+                ('asset_code', models.CharField(max_length=20)),
+                ('name', models.CharField(max_length=255)),
+                ('department_pk', models.BigIntegerField(null=True)),
+                ('category_pk', models.BigIntegerField(null=True)),
+                ('asset_status', models.CharField(max_length=20)),
+                ('purchase_price', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('purchase_date', models.DateField()),
+                ('assignment_count', models.IntegerField(default=0)),
+                ('usage_seconds', models.BigIntegerField(default=0)),
+                ('maintenance_count', models.IntegerField(default=0)),
+                ('maintenance_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-assignment_count'], name='reports_ass_assignm_288d45_idx'), models.Index(fields=['department_pk'], name='reports_ass_departm_c0c1ba_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MetricsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('GLOBAL', 'Global'), ('DEPARTMENT', 'Department'), ('CATEGORY', 'Category')], max_length=20)),
+                ('asset_count', models.IntegerField(default=0)),
+                ('assigned_count', models.IntegerField(default=0)),
+                ('maintenance_asset_count', models.IntegerField(default=0)),
+                ('total_value', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('purchase_ordinal_sum', models.BigIntegerField(default=0)),
+                ('assignment_count', models.IntegerField(default=0)),
+                ('maintenance_count', models.IntegerField(default=0)),
+                ('maintenance_cost', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('in_maintenance_record_count', models.IntegerField(default=0)),
+                ('in_maintenance_record_cost', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('request_total', models.IntegerField(default=0)),
+                ('request_pending', models.IntegerField(default=0)),
+                ('request_approved', models.IntegerField(default=0)),
+                ('request_rejected', models.IntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='categories.category')),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='departments.department')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dimension', 'department'], name='reports_met_dimensi_1cfcab_idx'), models.Index(fields=['dimension', 'category'], name='reports_met_dimensi_1aac3a_idx')],
+            },
+        ),
+    ]
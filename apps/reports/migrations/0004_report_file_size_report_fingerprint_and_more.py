@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='file_size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='last_used_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
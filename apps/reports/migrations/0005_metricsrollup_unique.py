@@ -0,0 +1,135 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:54
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+
+
+def rebuild_rollups(apps, schema_editor):
+    """
+    Recount every rollup from the source tables as they stand at this
+    migration; also merges duplicate group rows left by racing creators
+    """
+    Asset = apps.get_model('assets', 'Asset')
+    AssetAssignment = apps.get_model('assets', 'AssetAssignment')
+    AssetMaintenance = apps.get_model('assets', 'AssetMaintenance')
+    AssetRequest = apps.get_model('requests', 'AssetRequest')
+    AssetMetricsRollup = apps.get_model('reports', 'AssetMetricsRollup')
+    MetricsRollup = apps.get_model('reports', 'MetricsRollup')
+
+    usage = ExpressionWrapper(
+        F('return_date') - F('assigned_date'), output_field=DurationField()
+    )
+    assignments = {
+        row['asset_id']: row
+        for row in AssetAssignment.objects.order_by().values('asset_id').annotate(
+            count=Count('pk'), usage=Sum(usage, filter=Q(return_date__isnull=False))
+        )
+    }
+    maintenance = {
+        row['asset_id']: row
+        for row in AssetMaintenance.objects.order_by().values('asset_id').annotate(
+            count=Count('pk'), cost=Sum('cost')
+        )
+    }
+
+    AssetMetricsRollup.objects.all().delete()
+    MetricsRollup.objects.all().delete()
+
+    totals = defaultdict(lambda: defaultdict(int))
+    batch = []
+    assets = Asset.objects.order_by().values(
+        'pk', 'asset_id', 'name', 'department_id', 'category_id',
+        'asset_status', 'purchase_price', 'purchase_date'
+    )
+    for asset in assets.iterator(chunk_size=2000):
+        assigned = assignments.get(asset['pk'], {})
+        maintained = maintenance.get(asset['pk'], {})
+        maintenance_count = maintained.get('count') or 0
+        maintenance_cost = maintained.get('cost') or Decimal('0')
+        batch.append(AssetMetricsRollup(
+            asset_pk=asset['pk'],
+            asset_code=asset['asset_id'],
+            name=asset['name'],
+            department_pk=asset['department_id'],
+            category_pk=asset['category_id'],
+            asset_status=asset['asset_status'],
+            purchase_price=asset['purchase_price'],
+            purchase_date=asset['purchase_date'],
+            assignment_count=assigned.get('count') or 0,
+            usage_seconds=int((assigned.get('usage') or timedelta()).total_seconds()),
+            maintenance_count=maintenance_count,
+            maintenance_cost=maintenance_cost,
+        ))
+
+        in_maintenance = asset['asset_status'] == 'MAINTENANCE'
+        counters = {
+            'asset_count': 1,
+            'assigned_count': int(asset['asset_status'] == 'ASSIGNED'),
+            'maintenance_asset_count': int(in_maintenance),
+            'total_value': asset['purchase_price'],
+            'purchase_ordinal_sum': asset['purchase_date'].toordinal(),
+            'assignment_count': assigned.get('count') or 0,
+            'maintenance_count': maintenance_count,
+            'maintenance_cost': maintenance_cost,
+            'in_maintenance_record_count': maintenance_count if in_maintenance else 0,
+            'in_maintenance_record_cost':
+                maintenance_cost if in_maintenance else Decimal('0'),
+        }
+        for group in (
+            ('GLOBAL', None),
+            ('DEPARTMENT', asset['department_id']),
+            ('CATEGORY', asset['category_id']),
+        ):
+            for field, value in counters.items():
+                totals[group][field] += value
+        if len(batch) >= 2000:
+            AssetMetricsRollup.objects.bulk_create(batch)
+            batch = []
+    AssetMetricsRollup.objects.bulk_create(batch)
+
+    totals['GLOBAL', None].update(AssetRequest.objects.aggregate(
+        request_total=Count('pk'),
+        request_pending=Count('pk', filter=Q(status='PENDING')),
+        request_approved=Count('pk', filter=Q(status='APPROVED')),
+        request_rejected=Count('pk', filter=Q(status='REJECTED')),
+    ))
+    MetricsRollup.objects.bulk_create([
+        MetricsRollup(
+            dimension=dimension,
+            department_id=key if dimension == 'DEPARTMENT' else None,
+            category_id=key if dimension == 'CATEGORY' else None,
+            **counters
+        )
+        for (dimension, key), counters in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0004_asset_assets_asse_updated_16bcc3_idx_and_more'),
+        ('categories', '0002_categoryclosure'),
+        ('departments', '0002_departmentclosure'),
+        ('reports', '0004_report_file_size_report_fingerprint_and_more'),
+        ('requests', '0003_alter_requestapproval_approver'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_rollups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='metricsrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('department__isnull', False)), fields=('dimension', 'department'), name='unique_metrics_rollup_department'),
+        ),
+        migrations.AddConstraint(
+            model_name='metricsrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', False)), fields=('dimension', 'category'), name='unique_metrics_rollup_category'),
+        ),
+        migrations.AddConstraint(
+            model_name='metricsrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True), ('department__isnull', True)), fields=('dimension',), name='unique_metrics_rollup_keyless'),
+        ),
+    ]
@@ -4,6 +4,7 @@ from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 from core.models import AuditableModel
+from core.constants import JOB_STATUS_CHOICES, JOB_STATUS_QUEUED
 
 class ReportTemplate(AuditableModel):
     """
@@ -40,6 +41,10 @@ class Report(AuditableModel):
         null=True
     )
     scheduled = models.BooleanField(default=False)
+    # Result cache bookkeeping (see apps.reports.results)
+    fingerprint = models.CharField(max_length=64, blank=True, db_index=True)
+    file_size = models.BigIntegerField(default=0)
+    last_used_at = models.DateTimeField(null=True, blank=True)
     
     # Generic relation to allow reports on any model
     content_type = models.ForeignKey(
@@ -59,4 +64,173 @@ class Report(AuditableModel):
         ]
 
     def __str__(self):
-        return f"{self.name} - {self.generation_time}"
\ No newline at end of file
+        return f"{self.name} - {self.generation_time}"
+
+class AssetMetricsRollup(models.Model):
+    """
+    Per-asset metrics snapshot used to refresh MetricsRollup incrementally.
+
+    Keys are plain integers rather than foreign keys so a row outlives the
+    asset it describes long enough to subtract it from the rollups.
+    """
+    asset_pk = models.BigIntegerField(unique=True)
+    asset_code = models.CharField(max_length=20)
+    name = models.CharField(max_length=255)
+    department_pk = models.BigIntegerField(null=True)
+    category_pk = models.BigIntegerField(null=True)
+    asset_status = models.CharField(max_length=20)
+    purchase_price = models.DecimalField(max_digits=14, decimal_places=2)
+    purchase_date = models.DateField()
+    assignment_count = models.IntegerField(default=0)
+    usage_seconds = models.BigIntegerField(default=0)
+    maintenance_count = models.IntegerField(default=0)
+    maintenance_cost = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0
+    )
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-assignment_count']),
+            models.Index(fields=['department_pk']),
+        ]
+
+    def __str__(self):
+        return f"{self.asset_code} metrics"
+
+class MetricsRollup(models.Model):
+    """
+    Materialized asset metrics, one row per dimension value.
+
+    The GLOBAL row also carries the request counters.
+    """
+    DIMENSION_GLOBAL = 'GLOBAL'
+    DIMENSION_DEPARTMENT = 'DEPARTMENT'
+    DIMENSION_CATEGORY = 'CATEGORY'
+    DIMENSION_CHOICES = [
+        (DIMENSION_GLOBAL, 'Global'),
+        (DIMENSION_DEPARTMENT, 'Department'),
+        (DIMENSION_CATEGORY, 'Category'),
+    ]
+
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    department = models.ForeignKey(
+        'departments.Department',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    category = models.ForeignKey(
+        'categories.Category',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    asset_count = models.IntegerField(default=0)
+    assigned_count = models.IntegerField(default=0)
+    maintenance_asset_count = models.IntegerField(default=0)
+    total_value = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    purchase_ordinal_sum = models.BigIntegerField(default=0)
+    assignment_count = models.IntegerField(default=0)
+    maintenance_count = models.IntegerField(default=0)
+    maintenance_cost = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    # Maintenance records of assets currently under maintenance
+    in_maintenance_record_count = models.IntegerField(default=0)
+    in_maintenance_record_cost = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0
+    )
+    request_total = models.IntegerField(default=0)
+    request_pending = models.IntegerField(default=0)
+    request_approved = models.IntegerField(default=0)
+    request_rejected = models.IntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['dimension', 'department']),
+            models.Index(fields=['dimension', 'category']),
+        ]
+        # One row per group. NULL keys never compare equal in a plain
+        # unique index and NULLS NOT DISTINCT is not portable, so the
+        # keyless rows (global, no department) get a partial index of
+        # their own.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dimension', 'department'],
+                condition=models.Q(department__isnull=False),
+                name='unique_metrics_rollup_department'
+            ),
+            models.UniqueConstraint(
+                fields=['dimension', 'category'],
+                condition=models.Q(category__isnull=False),
+                name='unique_metrics_rollup_category'
+            ),
+            models.UniqueConstraint(
+                fields=['dimension'],
+                condition=models.Q(department__isnull=True, category__isnull=True),
+                name='unique_metrics_rollup_keyless'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension} metrics"
+
+
+class ReportJob(models.Model):
+    """
+    A report generation queued for a background worker.
+
+    Workers claim jobs with a conditional UPDATE, so several workers can
+    share the table without a broker. A running job refreshes
+    ``locked_at`` as it reports progress; a job whose lease expired is
+    assumed orphaned by a dead worker and is queued again.
+    """
+    template = models.ForeignKey(ReportTemplate, on_delete=models.PROTECT)
+    format = models.CharField(max_length=20)
+    parameters = models.JSONField(default=dict)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='report_jobs'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=JOB_STATUS_CHOICES,
+        default=JOB_STATUS_QUEUED
+    )
+    progress = models.PositiveSmallIntegerField(default=0)  # Percent
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    report = models.ForeignKey(
+        Report,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.template} ({self.format}) - {self.status}"
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from core.cache_tags import TaggedCache, model_tag
+from .models import Report
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_DEFAULTS = {
+    'ENABLED': True,
+    'MAX_AGE': 60 * 60 * 24,
+    'MAX_SIZE': 512 * 1024 * 1024,
+}
+
+
+def cache_settings():
+    return {**REPORT_CACHE_DEFAULTS, **getattr(settings, 'REPORT_CACHE', {})}
+
+
+class ReportResultCache:
+    """
+    Reuses generated report files for identical requests.
+
+    A result is identified by a fingerprint of the template (including
+    its ``template_config``), the format, the parameters and a data
+    version: the cache tag versions (see core.cache_tags) of every model
+    the report reads. Any write to those models, deletions included,
+    gives them new versions, so a stale file is never served, and working
+    out the version costs no query.
+
+    Entries are the ``Report`` rows carrying a fingerprint. They expire
+    after ``MAX_AGE`` seconds and the least recently used ones are evicted
+    once their files exceed ``MAX_SIZE`` bytes. Evicting only stops a
+    report from being reused: the report and its file stay in the history.
+    """
+
+    @staticmethod
+    def data_version(export):
+        versions = TaggedCache.versions(map(model_tag, export.source_models))
+        return sorted(versions.items())
+
+    @staticmethod
+    def fingerprint(template, report_format, parameters, export):
+        payload = json.dumps([
+            template.pk,
+            template.template_file.name,
+            template.template_config,
+            template.updated_at.isoformat(),
+            report_format,
+            parameters,
+            ReportResultCache.data_version(export),
+        ], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def lookup(fingerprint):
+        """Return a live Report generated for ``fingerprint``, or None"""
+        options = cache_settings()
+        if not options['ENABLED']:
+            return None
+        oldest = timezone.now() - timedelta(seconds=options['MAX_AGE'])
+        report = Report.objects.filter(
+            fingerprint=fingerprint,
+            generation_time__gte=oldest
+        ).exclude(generated_file='').order_by('-generation_time').first()
+        if report is None:
+            return None
+        if not report.generated_file.storage.exists(report.generated_file.name):
+            # Removed behind our back; forget it
+            Report.objects.filter(pk=report.pk).update(fingerprint='')
+            return None
+        Report.objects.filter(pk=report.pk).update(last_used_at=timezone.now())
+        return report
+
+    @staticmethod
+    def store(report, fingerprint):
+        """Register a freshly generated report under ``fingerprint``"""
+        if not cache_settings()['ENABLED']:
+            return
+        size = 0
+        if report.generated_file:
+            size = report.generated_file.size
+        Report.objects.filter(pk=report.pk).update(
+            fingerprint=fingerprint,
+            file_size=size,
+            last_used_at=timezone.now()
+        )
+        ReportResultCache.evict()
+
+    @staticmethod
+    def evict(max_age=None, max_size=None):
+        """
+        Evict expired entries, then the least recently used ones until
+        the cached files fit in ``max_size``; returns the number evicted
+        """
+        options = cache_settings()
+        max_age = options['MAX_AGE'] if max_age is None else max_age
+        max_size = options['MAX_SIZE'] if max_size is None else max_size
+        entries = Report.objects.exclude(fingerprint='')
+
+        evicted = ReportResultCache._forget(entries.filter(
+            generation_time__lt=timezone.now() - timedelta(seconds=max_age)
+        ))
+
+        total = entries.aggregate(total=Sum('file_size'))['total'] or 0
+        if total > max_size:
+            victims = []
+            by_last_use = entries.order_by('last_used_at', 'pk')
+            for pk, size in by_last_use.values_list('pk', 'file_size'):
+                if total <= max_size:
+                    break
+                victims.append(pk)
+                total -= size
+            evicted += ReportResultCache._forget(entries.filter(pk__in=victims))
+
+        if evicted:
+            logger.info("Evicted %s cached reports", evicted)
+        return evicted
+
+    @staticmethod
+    def _forget(reports):
+        """Take ``reports`` out of the cache, leaving the reports themselves"""
+        return reports.update(fingerprint='', last_used_at=None)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import ReportTemplate, Report
+from .models import ReportTemplate, Report, ReportJob
 
 class ReportTemplateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -15,4 +15,28 @@ class ReportSerializer(serializers.ModelSerializer):
     class Meta:
         model = Report
         fields = '__all__'
-        read_only_fields = ('generated_file',) 
\ No newline at end of file
+        read_only_fields = ('generated_file',) 
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    template_name = serializers.CharField(
+        source='template.name',
+        read_only=True
+    )
+    result_file = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = (
+            'id', 'template', 'template_name', 'format', 'parameters',
+            'status', 'progress', 'attempts', 'max_attempts', 'run_at',
+            'started_at', 'finished_at', 'error', 'report', 'result_file',
+            'created_at',
+        )
+        read_only_fields = fields
+
+    def get_result_file(self, obj):
+        if obj.report_id is None or not obj.report.generated_file:
+            return None
+        url = obj.report.generated_file.url
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
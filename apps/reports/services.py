@@ -1,10 +1,12 @@
 import os
 from django.template.loader import render_to_string
 from django.conf import settings
-from weasyprint import HTML
 from openpyxl import Workbook
 import csv
 from datetime import datetime
+from core.pdf import get_pdf_pool
+from .exports import excel_value
+from .jobs import ReportJobService
 
 class ReportGenerator:
     """
@@ -13,26 +15,25 @@ class ReportGenerator:
     
     @staticmethod
     def generate_pdf(template_name, context, output_file):
-        """Generate PDF report using WeasyPrint"""
+        """Generate PDF report on the WeasyPrint rendering pool"""
         html_string = render_to_string(template_name, context)
-        html = HTML(string=html_string)
-        html.write_pdf(output_file)
+        pdf, timings = get_pdf_pool().render(html_string)
+        if isinstance(output_file, (str, os.PathLike)):
+            with open(output_file, 'wb') as f:
+                f.write(pdf)
+        else:
+            output_file.write(pdf)
         return output_file
 
     @staticmethod
     def generate_excel(data, headers, output_file):
-        """Generate Excel report"""
-        wb = Workbook()
-        ws = wb.active
+        """Generate Excel report, streaming rows through a write-only workbook"""
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(headers)
         
-        # Add headers
-        for col, header in enumerate(headers, 1):
-            ws.cell(row=1, column=col, value=header)
-        
-        # Add data
-        for row, item in enumerate(data, 2):
-            for col, key in enumerate(headers, 1):
-                ws.cell(row=row, column=col, value=item.get(key, ''))
+        for item in data:
+            ws.append([excel_value(item.get(key, '')) for key in headers])
         
         wb.save(output_file)
         return output_file
@@ -52,12 +53,18 @@ class ReportScheduler:
     """
     
     @staticmethod
-    def schedule_report(report_template, parameters, schedule_time):
-        """Schedule a report for generation"""
-        # Implementation depends on chosen task queue (Celery, Django-Q, etc.)
-        pass
+    def schedule_report(report_template, parameters, schedule_time,
+                        report_format='PDF', user=None):
+        """Schedule a report for generation; returns the queued ReportJob"""
+        return ReportJobService.enqueue(
+            report_template,
+            report_format,
+            parameters,
+            user=user,
+            run_at=schedule_time
+        )
 
     @staticmethod
     def cancel_scheduled_report(report_id):
-        """Cancel a scheduled report"""
-        pass
+        """Cancel a scheduled report job"""
+        return ReportJobService.cancel(report_id)
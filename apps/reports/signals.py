@@ -0,0 +1,69 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from apps.assets.models import Asset, AssetMaintenance, AssetAssignment
+from apps.departments.models import Department
+from apps.requests.models import AssetRequest
+from apps.requests.signals import requests_moved
+from .dashboard import DashboardService
+from .metrics import MetricsRollupService
+
+
+@receiver([post_save, post_delete], sender=Asset)
+@receiver([post_save, post_delete], sender=AssetMaintenance)
+@receiver([post_save, post_delete], sender=AssetAssignment)
+def invalidate_dashboard_stats(sender, **kwargs):
+    """
+    Drop cached dashboard statistics when the data behind them changes
+    """
+    DashboardService.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Asset)
+def refresh_asset_metrics(sender, instance, **kwargs):
+    """
+    Keep the metrics rollups in step with asset writes
+    """
+    MetricsRollupService.refresh_asset(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=AssetMaintenance)
+@receiver([post_save, post_delete], sender=AssetAssignment)
+def refresh_asset_history_metrics(sender, instance, **kwargs):
+    """
+    Maintenance and assignment records count towards their asset's metrics
+    """
+    MetricsRollupService.refresh_asset(instance.asset_id)
+
+
+@receiver(pre_save, sender=AssetRequest)
+def remember_request_status(sender, instance, **kwargs):
+    instance._counted_status = None
+    if instance.pk and not instance._state.adding:
+        instance._counted_status = AssetRequest.objects.filter(
+            pk=instance.pk
+        ).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=AssetRequest)
+def count_saved_request(sender, instance, **kwargs):
+    MetricsRollupService.apply_request_transitions({
+        (getattr(instance, '_counted_status', None), instance.status): 1
+    })
+
+
+@receiver(post_delete, sender=AssetRequest)
+def count_deleted_request(sender, instance, **kwargs):
+    MetricsRollupService.apply_request_transitions({(instance.status, None): 1})
+
+
+@receiver(requests_moved)
+def count_moved_requests(sender, transitions, **kwargs):
+    MetricsRollupService.apply_request_transitions(transitions)
+
+
+@receiver(pre_delete, sender=Department)
+def detach_department_metrics(sender, instance, **kwargs):
+    """
+    Assets of a deleted department are set to NULL without signals
+    """
+    MetricsRollupService.detach_department(instance.pk)
@@ -1,3 +1,500 @@
-from django.test import TestCase
+import csv
+import importlib.util
+import io
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future
+from datetime import datetime
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.assets.models import Asset, AssetMaintenance, AssetAssignment
+from apps.categories.models import Category
+from apps.departments.models import Department
+from apps.requests.models import RequestType
+from apps.requests.services import RequestService
+from .dashboard import DashboardService
+from .exports import AssetExport, stream_csv
+from .metrics import DEPARTMENT, GLOBAL, AssetMetrics, MetricsRollupService
+from .jobs import ReportJobService
+from .models import MetricsRollup, Report, ReportJob, ReportTemplate
+from .results import ReportResultCache
+from core.pdf import (
+    PDFRenderPool, PDFRenderTimeout, compile_template, render_template_file,
+)
+from core.constants import (
+    JOB_STATUS_COMPLETED, JOB_STATUS_FAILED, JOB_STATUS_QUEUED, ROLE_ADMIN,
+)
+
+
+class DashboardServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Laptops')
+        for asset_status in ['AVAILABLE', 'AVAILABLE', 'ASSIGNED', 'MAINTENANCE']:
+            self.create_asset(asset_status=asset_status)
+        self.now = timezone.make_aware(datetime(2024, 3, 15, 12, 0))
+
+    def create_asset(self, **kwargs):
+        return Asset.objects.create(
+            name='Asset',
+            category=self.category,
+            purchase_date=timezone.now().date(),
+            purchase_price=Decimal('100.00'),
+            **kwargs
+        )
+
+    def create_maintenance(self, when):
+        return AssetMaintenance.objects.create(
+            asset=Asset.objects.first(),
+            maintenance_date=when,
+            description='Service',
+            cost=Decimal('10.00')
+        )
+
+    def test_compute_stats_in_two_queries(self):
+        self.create_maintenance(self.now)
+        # Same month, previous year: must not be counted
+        self.create_maintenance(self.now.replace(year=2023))
+
+        with self.assertNumQueries(2):
+            stats = DashboardService.compute_stats(self.now)
+
+        self.assertEqual(stats['assets'], {
+            'total': 4,
+            'available': 2,
+            'assigned': 1,
+            'maintenance': 1,
+            'retired': 0,
+        })
+        self.assertEqual(stats['maintenance']['this_month'], 1)
+        self.assertEqual(stats['assignments']['this_month'], 0)
+
+    def test_stats_cached_until_write(self):
+        DashboardService.get_stats()
+        with self.assertNumQueries(0):
+            stats = DashboardService.get_stats()
+        self.assertEqual(stats['assets']['total'], 4)
+
+        AssetAssignment.objects.create(asset=Asset.objects.first())
+        with self.assertNumQueries(2):
+            stats = DashboardService.get_stats()
+        self.assertEqual(stats['assignments']['this_month'], 1)
+
+
+class MetricsRollupTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Monitors')
+        self.department = Department.objects.create(name='Finance', code='FIN')
+
+    def create_asset(self, **kwargs):
+        return Asset.objects.create(
+            name='Asset',
+            category=self.category,
+            purchase_date=timezone.now().date(),
+            purchase_price=Decimal('100.00'),
+            **kwargs
+        )
+
+    def rollup_rows(self):
+        return sorted(
+            MetricsRollup.objects.values_list(
+                'dimension', 'department_id', 'category_id', 'asset_count',
+                'assigned_count', 'total_value', 'assignment_count',
+                'maintenance_count', 'maintenance_cost'
+            ),
+            key=str
+        )
+
+    def test_incremental_refresh_matches_rebuild(self):
+        first = self.create_asset(department=self.department)
+        second = self.create_asset(asset_status='MAINTENANCE')
+        AssetAssignment.objects.create(asset=first)
+        AssetMaintenance.objects.create(
+            asset=second,
+            maintenance_date=timezone.now(),
+            description='Repair',
+            cost=Decimal('25.00')
+        )
+        first.asset_status = 'ASSIGNED'
+        first.save()
+        self.create_asset(department=self.department).delete()
+
+        incremental = self.rollup_rows()
+        MetricsRollupService.rebuild()
+        self.assertEqual(incremental, self.rollup_rows())
+
+        self.assertEqual(AssetMetrics.get_asset_utilization_rate(), {
+            'total_assets': 2,
+            'assigned_assets': 1,
+            'utilization_rate': 50.0,
+        })
+        maintenance = AssetMetrics.get_asset_maintenance_metrics()
+        self.assertEqual(maintenance['total_in_maintenance'], 1)
+        self.assertEqual(maintenance['total_maintenance_cost'], Decimal('25.00'))
+        self.assertEqual(
+            AssetMetrics.get_most_used_assets(limit=1)[0]['id'], first.pk
+        )
+
+    def test_migration_rebuilds_rollups(self):
+        first = self.create_asset(department=self.department, asset_status='MAINTENANCE')
+        self.create_asset()
+        AssetAssignment.objects.create(asset=first)
+        AssetMaintenance.objects.create(
+            asset=first,
+            maintenance_date=timezone.now(),
+            description='Repair',
+            cost=Decimal('25.00')
+        )
+        incremental = self.rollup_rows()
+        maintenance = AssetMetrics.get_asset_maintenance_metrics()
+
+        MetricsRollup.objects.all().delete()
+        migration = import_module('apps.reports.migrations.0005_metricsrollup_unique')
+        migration.rebuild_rollups(django_apps, None)
+        self.assertEqual(self.rollup_rows(), incremental)
+        self.assertEqual(AssetMetrics.get_asset_maintenance_metrics(), maintenance)
+        self.assertEqual(
+            AssetMetrics.get_most_used_assets(limit=1)[0]['id'], first.pk
+        )
+
+    def test_reads_do_not_scale_with_assets(self):
+        for _ in range(20):
+            self.create_asset(department=self.department)
+
+        with self.assertNumQueries(1):
+            AssetMetrics.get_asset_utilization_rate()
+        with self.assertNumQueries(1):
+            rows = list(AssetMetrics.get_department_usage_metrics())
+        self.assertEqual(rows[0]['department__name'], 'Finance')
+        self.assertEqual(rows[0]['asset_count'], 20)
+
+    def test_department_delete_moves_assets(self):
+        self.create_asset(department=self.department)
+        self.department.delete()
+
+        incremental = self.rollup_rows()
+        MetricsRollupService.rebuild()
+        self.assertEqual(incremental, self.rollup_rows())
+
+    def test_request_counters_follow_the_workflow(self):
+        user = get_user_model().objects.create_user(
+            username='requester', email='requester@example.com', password='pass12345'
+        )
+        request_type = RequestType.objects.create(name='New asset')
+        requests = [
+            RequestService.create_request(
+                {'request_type': request_type, 'title': f'Request {i}', 'description': '-'},
+                user
+            )
+            for i in range(4)
+        ]
+        # Decisions move requests with UPDATEs, single and in bulk
+        RequestService.process_approval(requests[0].pk, user, 'APPROVED')
+        RequestService.process_approvals(
+            [requests[1].pk, requests[2].pk], user, 'REJECTED'
+        )
+        requests[3].delete()
+
+        with self.assertNumQueries(1):
+            counts = MetricsRollupService.get_global()
+        self.assertEqual(
+            [counts[field] for field in (
+                'request_total', 'request_pending', 'request_approved', 'request_rejected'
+            )],
+            [3, 0, 1, 2]
+        )
+        incremental = self.rollup_rows()
+        MetricsRollupService.rebuild()
+        self.assertEqual(incremental, self.rollup_rows())
+        self.assertEqual(MetricsRollupService.get_global()['request_rejected'], 2)
+
+    def test_one_row_per_group(self):
+        self.create_asset(department=self.department)
+        self.create_asset()
+        for group in ((GLOBAL, None), (DEPARTMENT, None), (DEPARTMENT, self.department.pk)):
+            dimension, key = group
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                MetricsRollup.objects.create(
+                    dimension=dimension,
+                    department_id=key if dimension == DEPARTMENT else None
+                )
+
+
+class ReportExportTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Printers')
+        for i in range(5):
+            Asset.objects.create(
+                name=f'Printer {i}',
+                category=self.category,
+                purchase_date=timezone.now().date(),
+                purchase_price=Decimal('50.00'),
+                asset_status='RETIRED' if i == 4 else 'AVAILABLE'
+            )
+
+    def test_stream_csv_in_chunks(self):
+        export = AssetExport({'status': 'AVAILABLE'}, chunk_size=2)
+        chunks = list(export.stream_csv())
+        # Header with the first two rows, two more, then the last one
+        self.assertEqual(len(chunks), 3)
+
+        rows = list(csv.reader(io.StringIO(b''.join(chunks).decode())))
+        self.assertEqual(rows[0], export.headers)
+        self.assertEqual(len(rows), 5)
+        self.assertTrue(all(row[2] == 'Printers' for row in rows[1:]))
+
+    def test_csv_file_and_summary(self):
+        export = AssetExport()
+        report_file = export.to_file('CSV', name='assets')
+        self.assertEqual(report_file.name, 'assets.csv')
+        rows = list(csv.reader(io.TextIOWrapper(report_file, encoding='utf-8')))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(export.summary(), {
+            'total_count': 5,
+            'total_value': Decimal('250.00'),
+        })
+
+    def test_stream_csv_empty(self):
+        self.assertEqual(
+            b''.join(stream_csv(['A', 'B'], iter([]))),
+            b'A,B\r\n'
+        )
+
+    def test_pdf_context_renders_instance_templates(self):
+        # Written for the model instances the context used to hold
+        source = (
+            '{% for asset in assets %}'
+            '{{ asset.name }}/{{ asset.category.name }}/'
+            '{% if asset.assigned_to %}{{ asset.assigned_to.user.username }}'
+            '{% else %}unassigned{% endif %};'
+            '{% endfor %}{{ total_count }} {{ total_value|floatformat:2 }}'
+        )
+        html = render_template_file(
+            ContentFile(source.encode(), name='assets.html'),
+            AssetExport({'status': 'RETIRED'}).context()
+        )
+        self.assertEqual(html, 'Printer 4/Printers/unassigned;1 50.00')
+
+
+class ReportJobTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = get_user_model().objects.create_user(
+            username='reporter',
+            email='reporter@example.com',
+            password='reporterpass123'
+        )
+        profile = self.user.profile
+        profile.role = ROLE_ADMIN
+        profile.save()
+
+        self.template = ReportTemplate.objects.create(
+            name='Assets',
+            template_type='ASSET',
+            template_file='report_templates/assets.html'
+        )
+        category = Category.objects.create(name='Scanners')
+        for i in range(3):
+            Asset.objects.create(
+                name=f'Scanner {i}',
+                category=category,
+                purchase_date=timezone.now().date(),
+                purchase_price=Decimal('20.00')
+            )
+
+    def test_generate_returns_accepted_job(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            reverse('reports:reports-generate'),
+            {'template_id': self.template.pk, 'format': 'CSV'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], JOB_STATUS_QUEUED)
+        self.assertTrue(ReportJob.objects.filter(pk=response.data['id']).exists())
+
+        response = self.client.post(
+            reverse('reports:reports-generate'),
+            {'template_id': self.template.pk, 'format': 'DOCX'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_claim_and_run(self):
+        job = ReportJobService.enqueue(self.template, 'CSV', user=self.user)
+        self.assertEqual(ReportJobService.claim('worker-1', 5), [job.pk])
+        # Already running, nobody else gets it
+        self.assertEqual(ReportJobService.claim('worker-2', 5), [])
+
+        job = ReportJobService.run(job.pk)
+        self.assertEqual(job.status, JOB_STATUS_COMPLETED)
+        self.assertEqual(job.progress, 100)
+        self.assertEqual(job.attempts, 1)
+        with job.report.generated_file.open('rb') as report_file:
+            self.assertEqual(len(report_file.read().splitlines()), 4)
+
+    def test_retry_with_backoff_then_fail(self):
+        job = ReportJobService.enqueue(self.template, 'CSV', max_attempts=2)
+        # Breaks the job after it was accepted
+        ReportTemplate.objects.filter(pk=self.template.pk).update(
+            template_type='UNKNOWN'
+        )
+
+        ReportJobService.claim('worker-1')
+        job = ReportJobService.run(job.pk)
+        self.assertEqual(job.status, JOB_STATUS_QUEUED)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(ReportJobService.claim('worker-1'), [])
+
+        ReportJob.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        ReportJobService.claim('worker-1')
+        job = ReportJobService.run(job.pk)
+        self.assertEqual(job.status, JOB_STATUS_FAILED)
+        self.assertEqual(job.error, 'Invalid template type')
+
+    def test_identical_request_reuses_result(self):
+        job = ReportJobService.enqueue(self.template, 'CSV')
+        ReportJobService.claim('worker-1')
+        job = ReportJobService.run(job.pk)
+
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            reverse('reports:reports-generate'),
+            {'template_id': self.template.pk, 'format': 'CSV'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], JOB_STATUS_COMPLETED)
+        self.assertEqual(response.data['report'], job.report_id)
+
+        # Other parameters, or changed data, are generated afresh
+        other = ReportJobService.enqueue(
+            self.template, 'CSV', {'status': 'RETIRED'}
+        )
+        self.assertEqual(other.status, JOB_STATUS_QUEUED)
+        Asset.objects.first().delete()
+        again = ReportJobService.enqueue(self.template, 'CSV')
+        self.assertEqual(again.status, JOB_STATUS_QUEUED)
+
+    def test_evict_by_size_least_recently_used_first(self):
+        reports = []
+        for parameters in ({}, {'status': 'AVAILABLE'}, {'category': 1}):
+            job = ReportJobService.enqueue(self.template, 'CSV', parameters)
+            ReportJobService.claim('worker-1')
+            reports.append(ReportJobService.run(job.pk).report)
+        size = reports[0].file_size
+        self.assertGreater(size, 0)
+
+        # Using the oldest makes the second the least recently used
+        Report.objects.filter(pk=reports[0].pk).update(last_used_at=timezone.now())
+        self.assertEqual(ReportResultCache.evict(max_size=size * 2), 1)
+        evicted = Report.objects.get(pk=reports[1].pk)
+        self.assertEqual(evicted.fingerprint, '')
+        self.assertIsNone(evicted.last_used_at)
+
+        self.assertEqual(ReportResultCache.evict(max_age=0), 2)
+        # Evicting never touches the report history
+        self.assertEqual(ReportJob.objects.filter(report__isnull=True).count(), 0)
+        for report in reports:
+            self.assertTrue(Report.objects.filter(pk=report.pk).exists())
+            self.assertTrue(
+                report.generated_file.storage.exists(report.generated_file.name)
+            )
+        job = ReportJobService.enqueue(self.template, 'CSV')
+        self.assertEqual(job.status, JOB_STATUS_QUEUED)
+
+    def test_data_version_costs_no_query(self):
+        export = AssetExport()
+        with self.assertNumQueries(0):
+            version = ReportResultCache.data_version(export)
+        self.assertEqual(ReportResultCache.data_version(export), version)
+        asset = Asset.objects.first()
+        asset.name = 'Renamed'
+        asset.save()
+        self.assertNotEqual(ReportResultCache.data_version(export), version)
+
+
+class PDFRenderingTests(TestCase):
+    def test_compiled_templates_reused(self):
+        source = '<p>{{ total_count }} assets</p>'
+        self.assertIs(compile_template(source), compile_template(source))
+        html = render_template_file(
+            ContentFile(source.encode(), name='assets.html'), {'total_count': 3}
+        )
+        self.assertEqual(html, '<p>3 assets</p>')
+
+    @unittest.skipUnless(importlib.util.find_spec('weasyprint'), 'WeasyPrint not installed')
+    def test_render_on_pool(self):
+        pool = PDFRenderPool(workers=1, timeout=60)
+        self.addCleanup(pool.shutdown)
+        pdf, timings = pool.render('<h1>Assets</h1>')
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        for key in ('queued', 'parse', 'layout', 'write', 'total'):
+            self.assertIn(key, timings)
+        self.assertEqual(pool.stats()['renders'], 1)
+
+    def test_stuck_render_times_out_and_resets_the_pool(self):
+        pool = PDFRenderPool(workers=1, timeout=0.01)
+        executor = mock.Mock()
+
+        def submit(render, *args):
+            pool._job_started(args[-1])  # As the worker would
+            return Future()  # Never completes
+
+        executor.submit.side_effect = submit
+        worker = mock.Mock()
+        executor._processes = {1: worker}
+        pool._executor = executor
+
+        with mock.patch('core.pdf.TIMEOUT_GRACE', 0.01):
+            with self.assertRaises(PDFRenderTimeout):
+                pool.render('<h1>Assets</h1>')
+        executor.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+        worker.terminate.assert_called_once_with()
+        self.assertIsNone(pool._executor)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_queued_render_does_not_time_out(self):
+        pool = PDFRenderPool(workers=1, timeout=0.01)
+        executor = mock.Mock()
+        future = Future()  # Waits behind other renders, never started
+        executor.submit.return_value = future
+        pool._executor = executor
+
+        results = []
+        with mock.patch('core.pdf.TIMEOUT_GRACE', 0.01):
+            caller = threading.Thread(
+                target=lambda: results.append(pool.render('<h1>Assets</h1>'))
+            )
+            caller.start()
+            caller.join(0.2)
+            self.assertTrue(caller.is_alive())
+            executor.shutdown.assert_not_called()
+
+            future.set_result((b'%PDF', {
+                'queued': 0.2, 'parse': 0, 'layout': 0, 'write': 0, 'pages': 1
+            }))
+            caller.join()
+        self.assertEqual(results[0][0], b'%PDF')
+        self.assertIs(pool._executor, executor)
+        self.assertEqual(pool.stats()['renders'], 1)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MetricsViewSet, ReportViewSet
+from .views import MetricsViewSet, ReportJobViewSet, ReportViewSet
 
 app_name = 'reports'
 
@@ -8,6 +8,7 @@ app_name = 'reports'
 router = DefaultRouter()
 router.register(r'metrics', MetricsViewSet, basename='metrics')
 router.register(r'reports', ReportViewSet, basename='reports')
+router.register(r'jobs', ReportJobViewSet, basename='report-jobs')
 
 # Define URL patterns
 urlpatterns = [
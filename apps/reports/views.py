@@ -6,14 +6,17 @@ from rest_framework.permissions import IsAuthenticated
 from django.db.models import Count, Sum, Avg
 from django.utils import timezone
 from datetime import timedelta
-from .models import ReportTemplate, Report
-from .serializers import ReportTemplateSerializer, ReportSerializer
+from .models import ReportTemplate, Report, ReportJob
+from .serializers import ReportTemplateSerializer, ReportSerializer, ReportJobSerializer
 from core.permissions import IsAdminUser, IsManagerUser
-from core.utils import generate_pdf, generate_excel
-from apps.assets.models import Asset, AssetMaintenance, AssetAssignment
+from django.http import StreamingHttpResponse
+from apps.assets.models import Asset
 from apps.users.models import UserActivityLog
 from django.db.models.functions import TruncDate
 from .metrics import AssetMetrics
+from .dashboard import DashboardService
+from .exports import CONTENT_TYPES, EXTENSIONS, get_export
+from .jobs import ReportJobService
 from django.db.models import ExpressionWrapper, F, DurationField
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -27,88 +30,32 @@ class ReportViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def dashboard(self, request):
         """Get dashboard statistics"""
-        # Asset statistics
-        total_assets = Asset.objects.count()
-        available_assets = Asset.objects.filter(
-            asset_status='AVAILABLE'
-        ).count()
-        assigned_assets = Asset.objects.filter(
-            asset_status='ASSIGNED'
-        ).count()
-        maintenance_assets = Asset.objects.filter(
-            asset_status='MAINTENANCE'
-        ).count()
-        
-        # Maintenance statistics
-        maintenance_this_month = AssetMaintenance.objects.filter(
-            maintenance_date__month=timezone.now().month
-        ).count()
-        
-        # Assignment statistics
-        assignments_this_month = AssetAssignment.objects.filter(
-            assigned_date__month=timezone.now().month
-        ).count()
-        
-        return Response({
-            'assets': {
-                'total': total_assets,
-                'available': available_assets,
-                'assigned': assigned_assets,
-                'maintenance': maintenance_assets,
-            },
-            'maintenance': {
-                'this_month': maintenance_this_month,
-            },
-            'assignments': {
-                'this_month': assignments_this_month,
-            }
-        })
+        return Response(DashboardService.get_stats())
     
     @action(detail=False, methods=['post'])
     def generate(self, request):
-        """Generate a new report"""
+        """
+        Queue a new report
+
+        The report is generated by the ``run_report_jobs`` worker; poll
+        the returned job for progress and the result file.
+        """
         template_id = request.data.get('template_id')
         report_format = request.data.get('format', 'PDF')
         parameters = request.data.get('parameters', {})
         
         try:
             template = ReportTemplate.objects.get(id=template_id)
-            
-            # Generate report based on template type
-            if template.template_type == 'ASSET':
-                data = self._generate_asset_report(parameters)
-            elif template.template_type == 'MAINTENANCE':
-                data = self._generate_maintenance_report(parameters)
-            elif template.template_type == 'ASSIGNMENT':
-                data = self._generate_assignment_report(parameters)
-            else:
-                return Response(
-                    {"error": "Invalid template type"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Generate file based on format
-            if report_format == 'PDF':
-                report_file = generate_pdf(template.template_file, data)
-            elif report_format in ['EXCEL', 'CSV']:
-                report_file = generate_excel(data, report_format)
-            else:
-                return Response(
-                    {"error": "Invalid format"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Create report record
-            report = Report.objects.create(
-                template=template,
-                format=report_format,
-                parameters=parameters,
-                generated_file=report_file
+            job = ReportJobService.enqueue(
+                template,
+                report_format,
+                parameters,
+                user=request.user
             )
-            
+            # Served from the result cache when already completed
             return Response(
-                ReportSerializer(report).data,
-                status=status.HTTP_201_CREATED
+                ReportJobSerializer(job, context={'request': request}).data,
+                status=status.HTTP_200_OK if job.report_id else status.HTTP_202_ACCEPTED
             )
             
         except ReportTemplate.DoesNotExist:
@@ -116,31 +63,35 @@ class ReportViewSet(viewsets.ModelViewSet):
                 {"error": "Template not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
-        except Exception as e:
+        except ValueError as e:
             return Response(
                 {"error": str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                status=status.HTTP_400_BAD_REQUEST
             )
     
-    def _generate_asset_report(self, parameters):
-        """Generate asset report data"""
-        queryset = Asset.objects.all()
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream a report as CSV without storing it
+
+        ``type`` is a template type (ASSET, MAINTENANCE or ASSIGNMENT); the
+        remaining query parameters filter the rows.
+        """
+        parameters = request.query_params.dict()
+        export = get_export(parameters.pop('type', 'ASSET').upper(), parameters)
+        if export is None:
+            return Response(
+                {"error": "Invalid template type"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Apply filters from parameters
-        if parameters.get('status'):
-            queryset = queryset.filter(asset_status=parameters['status'])
-        if parameters.get('category'):
-            queryset = queryset.filter(category_id=parameters['category'])
-        if parameters.get('department'):
-            queryset = queryset.filter(department_id=parameters['department'])
-            
-        return {
-            'assets': queryset,
-            'total_count': queryset.count(),
-            'total_value': queryset.aggregate(
-                total=Sum('purchase_price')
-            )['total']
-        }
+        response = StreamingHttpResponse(
+            export.stream_csv(),
+            content_type=CONTENT_TYPES['CSV']
+        )
+        filename = f"{export.context_name}_{timezone.now():%Y%m%d%H%M%S}.{EXTENSIONS['CSV']}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
     
     @action(detail=False, methods=['get'])
     def user_activity(self, request):
@@ -183,6 +134,31 @@ class ReportViewSet(viewsets.ModelViewSet):
         
         return Response(report_data)
 
+class ReportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """ViewSet for following queued report generation"""
+    queryset = ReportJob.objects.select_related('template', 'report')
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser|IsManagerUser]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        status_filter = self.request.query_params.get('status')
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+        return queryset
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Cancel a queued or running job"""
+        job = self.get_object()
+        if not ReportJobService.cancel(job.pk):
+            return Response(
+                {"error": f"Job is already {job.status.lower()}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data)
+
 class MetricsViewSet(viewsets.ViewSet):
     """
     ViewSet for accessing various system metrics and analytics.
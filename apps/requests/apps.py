@@ -7,9 +7,4 @@ class RequestsConfig(AppConfig):
     verbose_name = 'Asset Requests'
 
     def ready(self):
-        print("Loading requests module")
-        try:
-            from . import signals  # Import signals
-            print("Request signals loaded successfully")
-        except Exception as e:
-            print(f"Error loading request signals: {e}")
+        from . import signals  # Connects the receivers
@@ -1,5 +1,5 @@
 from django.utils import timezone
-from django.contrib.auth.models import AnonymousUser
+from core.activity import get_last_activity_tracker
 
 class RequestMiddleware:
     """
@@ -12,11 +12,15 @@ class RequestMiddleware:
         # Code to be executed for each request before
         # the view (and later middleware) are called.
         
-        # Add request tracking for authenticated users
-        if hasattr(request, 'user') and not isinstance(request.user, AnonymousUser):
+        # Add request tracking for authenticated users. The tracker only
+        # records the timestamp in memory; UserProfile.last_activity is
+        # written in batches, at most once per LAST_ACTIVITY_INTERVAL.
+        if hasattr(request, 'user') and request.user.is_authenticated:
             request.user.last_activity = timezone.now()
-            if hasattr(request.user, 'profile'):
-                request.user.profile.save()  # This will update the last_modified timestamp
+            get_last_activity_tracker().touch(
+                request.user.pk,
+                request.user.last_activity
+            )
 
         response = self.get_response(request)
 
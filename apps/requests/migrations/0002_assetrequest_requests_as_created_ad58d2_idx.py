@@ -0,0 +1,20 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0003_asset_assets_asse_created_6d1779_idx'),
+        ('requests', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assetrequest',
+            index=models.Index(fields=['created_at'], name='requests_as_created_ad58d2_idx'),
+        ),
+    ]
@@ -1,6 +1,6 @@
 from django.db import models
 from core.models import AuditableModel
-from core.utils import generate_unique_id
+from core.sequences import next_id, register_id_prefix
 from core.constants import (
     STATUS_CHOICES, STATUS_ACTIVE,
     REQUEST_STATUS_CHOICES, REQUEST_STATUS_PENDING,
@@ -31,9 +31,11 @@ class RequestType(AuditableModel):
 
     def save(self, *args, **kwargs):
         if not self.code:
-            self.code = generate_unique_id(prefix='REQ')
+            self.code = next_id('REQ')
         super().save(*args, **kwargs)
 
+register_id_prefix('REQ', RequestType, 'code')
+
 class AssetRequest(AuditableModel):
     """
     Asset request model for handling various types of asset-related requests
@@ -100,6 +102,7 @@ class AssetRequest(AuditableModel):
     class Meta:
         ordering = ['-created_at']
         indexes = [
+            models.Index(fields=['created_at']),
             models.Index(fields=['request_id']),
             models.Index(fields=['status']),
             models.Index(fields=['priority']),
@@ -111,9 +114,11 @@ class AssetRequest(AuditableModel):
 
     def save(self, *args, **kwargs):
         if not self.request_id:
-            self.request_id = generate_unique_id(prefix='REQ')
+            self.request_id = next_id('REQ')
         super().save(*args, **kwargs)
 
+register_id_prefix('REQ', AssetRequest, 'request_id')
+
 class RequestApproval(AuditableModel):
     """
     Tracks approval workflow for asset requests
@@ -123,9 +128,12 @@ class RequestApproval(AuditableModel):
         on_delete=models.CASCADE,
         related_name='approvals'
     )
+    # Set once the approval level is decided
     approver = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.PROTECT,
+        null=True,
+        blank=True,
         related_name='request_approvals'
     )
     approval_level = models.PositiveIntegerField()
@@ -2,6 +2,9 @@ from rest_framework import serializers
 from .models import AssetRequest, RequestType, RequestApproval
 from apps.users.serializers import UserSerializer
 from django.utils import timezone
+from core.constants import (
+    BULK_DECISION_MAX_REQUESTS, REQUEST_STATUS_APPROVED, REQUEST_STATUS_REJECTED
+)
 
 class RequestTypeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -49,4 +52,18 @@ class AssetRequestSerializer(serializers.ModelSerializer):
         
         # Add more custom validation as needed
         
-        return data 
\ No newline at end of file
+        return data 
+
+class BulkDecisionSerializer(serializers.Serializer):
+    """
+    Input of the bulk approve/reject endpoint
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_DECISION_MAX_REQUESTS
+    )
+    decision = serializers.ChoiceField(
+        choices=[REQUEST_STATUS_APPROVED, REQUEST_STATUS_REJECTED]
+    )
+    comments = serializers.CharField(required=False, allow_blank=True, default='')
@@ -1,10 +1,25 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
 from .models import RequestType, AssetRequest, RequestApproval
 from apps.users.models import UserProfile
+from apps.assets.models import Asset
+from apps.categories.models import Category
+from apps.departments.models import Department
+from core.principal import get_principal
+from apps.reports.metrics import MetricsRollupService
+from apps.reports.models import MetricsRollup
+from core.counters import ASSET_STATUS, CounterService
+from .services import RequestService
+from .workflow import InvalidTransition, RequestWorkflow
 
 User = get_user_model()
 
@@ -69,3 +84,323 @@ class RequestTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.asset_request.refresh_from_db()
         self.assertEqual(self.asset_request.status, 'APPROVED')
+
+
+class RequestWorkflowTests(TestCase):
+    def setUp(self):
+        self.requester = User.objects.create_user(
+            username='requester', email='requester@example.com', password='pass12345'
+        )
+        self.approvers = []
+        for n in range(3):
+            user = User.objects.create_user(
+                username=f'manager{n}', email=f'manager{n}@example.com', password='pass12345'
+            )
+            user.profile.role = 'MANAGER'
+            user.profile.save()
+            self.approvers.append(user)
+
+    def create_request(self, levels=2, **data):
+        request_type = RequestType.objects.create(
+            name=f'Type {levels} {RequestType.objects.count()}',
+            requires_approval=levels > 0,
+            approval_levels=levels
+        )
+        return RequestService.create_request(
+            {'request_type': request_type, 'title': 'Laptop', 'description': 'Needed', **data},
+            self.requester
+        )
+
+    def test_approvals_created_in_bulk(self):
+        request = self.create_request(levels=3)
+        self.assertEqual(
+            list(request.approvals.values_list('approval_level', 'status')),
+            [(1, 'PENDING'), (2, 'PENDING'), (3, 'PENDING')]
+        )
+
+    def test_requests_without_approval_are_approved_on_creation(self):
+        category = Category.objects.create(name='Laptops')
+        asset = Asset.objects.create(
+            name='Laptop',
+            category=category,
+            purchase_date=timezone.now().date(),
+            purchase_price=Decimal('900.00')
+        )
+        request = self.create_request(levels=0, asset=asset)
+        self.assertEqual(request.status, 'APPROVED')
+        self.assertFalse(request.approvals.exists())
+        request.refresh_from_db()
+        self.assertEqual(request.status, 'APPROVED')
+        self.assertIsNotNone(request.completion_date)
+        asset.refresh_from_db()
+        self.assertEqual(asset.assigned_to, self.requester.profile)
+
+    def test_last_approval_approves_and_assigns(self):
+        category = Category.objects.create(name='Laptops')
+        asset = Asset.objects.create(
+            name='Laptop',
+            category=category,
+            purchase_date=timezone.now().date(),
+            purchase_price=Decimal('900.00')
+        )
+        request = self.create_request(levels=2, asset=asset)
+
+        RequestService.process_approval(request.pk, self.approvers[0], 'APPROVED')
+        request.refresh_from_db()
+        self.assertEqual(request.status, 'PENDING')
+
+        approval = RequestService.process_approval(
+            request.pk, self.approvers[1], 'APPROVED', 'Fine'
+        )
+        self.assertEqual(approval.approval_level, 2)
+        request.refresh_from_db()
+        self.assertEqual(request.status, 'APPROVED')
+        self.assertIsNotNone(request.completion_date)
+        asset.refresh_from_db()
+        self.assertEqual(asset.assigned_to, self.requester.profile)
+
+        with self.assertRaises(InvalidTransition):
+            RequestService.process_approval(request.pk, self.approvers[2], 'APPROVED')
+
+    def test_rejection_closes_pending_levels(self):
+        request = self.create_request(levels=3)
+        RequestService.process_approval(request.pk, self.approvers[0], 'REJECTED')
+        request.refresh_from_db()
+        self.assertEqual(request.status, 'REJECTED')
+        self.assertEqual(
+            list(request.approvals.values_list('status', flat=True)),
+            ['REJECTED', 'CANCELLED', 'CANCELLED']
+        )
+        with self.assertRaises(InvalidTransition):
+            RequestService.cancel_request(request.pk, self.requester)
+
+    def test_decision_queries_do_not_depend_on_levels(self):
+        counts = []
+        for levels in (2, 6):
+            request = self.create_request(levels=levels)
+            with CaptureQueriesContext(connection) as queries:
+                RequestService.process_approval(request.pk, self.approvers[0], 'APPROVED')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        # Lock, decide, move the request, queue the notification
+        self.assertLessEqual(counts[0], 5)
+
+    def test_stale_decision_loses(self):
+        request = self.create_request(levels=1)
+        lock = RequestWorkflow.lock
+
+        def racing_lock(request_id):
+            locked = lock(request_id)
+            # Another approver decides between our read and our write
+            RequestApproval.objects.filter(request_id=request_id).update(
+                status='APPROVED', approver=self.approvers[1]
+            )
+            return locked
+
+        with mock.patch.object(RequestWorkflow, 'lock', side_effect=racing_lock):
+            with self.assertRaises(InvalidTransition):
+                RequestService.process_approval(request.pk, self.approvers[0], 'REJECTED')
+        request.refresh_from_db()
+        self.assertEqual(request.status, 'PENDING')
+
+
+class BulkDecisionTests(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(
+            username='manager', email='manager@example.com', password='pass12345'
+        )
+        self.manager.profile.role = 'MANAGER'
+        self.manager.profile.save()
+        self.requester = User.objects.create_user(
+            username='requester', email='requester@example.com', password='pass12345'
+        )
+        self.request_type = RequestType.objects.create(
+            name='Transfer', requires_approval=True, approval_levels=1
+        )
+        self.url = reverse('requests:request-bulk-decision')
+
+    def create_requests(self, count, with_assets=False, requester=None):
+        start = AssetRequest.objects.count()
+        assets = [None] * count
+        if with_assets:
+            category, _ = Category.objects.get_or_create(name='Laptops')
+            assets = Asset.objects.bulk_create([
+                Asset(
+                    asset_id=f'AST{start + n:06d}',
+                    name='Laptop',
+                    category=category,
+                    purchase_date=timezone.now().date(),
+                    purchase_price=Decimal('900.00')
+                )
+                for n in range(count)
+            ])
+            # Created without signals: start from consistent totals
+            MetricsRollupService.rebuild()
+            CounterService.reconcile(ASSET_STATUS)
+        requests = AssetRequest.objects.bulk_create([
+            AssetRequest(
+                request_id=f'REQ{start + n:06d}',
+                request_type=self.request_type,
+                requester=requester or self.requester,
+                asset=asset,
+                title='Transfer',
+                description='Move it'
+            )
+            for n, asset in enumerate(assets)
+        ])
+        RequestWorkflow.create_approvals(requests)
+        return [request.pk for request in requests]
+
+    def test_per_item_results(self):
+        ids = self.create_requests(3)
+        RequestService.process_approval(ids[0], self.manager, 'REJECTED')
+
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.post(
+            self.url,
+            {'ids': ids + [999999], 'decision': 'APPROVED', 'comments': 'Batch'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['succeeded'], 2)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual(
+            [result['success'] for result in response.data['results']],
+            [False, True, True, False]
+        )
+        self.assertEqual(
+            AssetRequest.objects.filter(pk__in=ids, status='APPROVED').count(), 2
+        )
+        self.assertEqual(
+            RequestApproval.objects.filter(comments='Batch', approver=self.manager).count(), 2
+        )
+
+    def test_queries_do_not_scale_with_requests(self):
+        for with_assets in (False, True):
+            counts = []
+            # The first batch also creates the counter and rollup rows
+            for size in (1, 5, 200):
+                ids = self.create_requests(size, with_assets)
+                with CaptureQueriesContext(connection) as queries:
+                    results = RequestService.process_approvals(ids, self.manager, 'APPROVED')
+                self.assertTrue(all(result['success'] for result in results))
+                counts.append(len(queries))
+            self.assertEqual(counts[1], counts[2], f'with_assets={with_assets}')
+
+    def test_approved_assets_are_assigned_in_bulk(self):
+        ids = self.create_requests(3, with_assets=True)
+        RequestService.process_approvals(ids, self.manager, 'APPROVED')
+
+        assets = Asset.objects.filter(asset_requests__pk__in=ids)
+        self.assertEqual(
+            set(assets.values_list('assigned_to', 'asset_status')),
+            {(self.requester.profile.pk, 'ASSIGNED')}
+        )
+        self.assertEqual(CounterService.get_many(ASSET_STATUS), {'AVAILABLE': 0, 'ASSIGNED': 3})
+        self.assertEqual(MetricsRollupService.get_global()['assigned_count'], 3)
+        # The same rollups as computed from scratch
+        rollups = list(MetricsRollup.objects.order_by('dimension', 'department', 'category').values(
+            'dimension', 'department', 'category', 'asset_count', 'assigned_count'
+        ))
+        MetricsRollupService.rebuild()
+        self.assertEqual(rollups, list(MetricsRollup.objects.order_by(
+            'dimension', 'department', 'category'
+        ).values('dimension', 'department', 'category', 'asset_count', 'assigned_count')))
+
+    def test_scoped_to_requests_the_manager_can_see(self):
+        finance = Department.objects.create(name='Finance')
+        sales = Department.objects.create(name='Sales')
+        self.manager.profile.department = finance
+        self.manager.profile.save()
+        self.requester.profile.department = sales
+        self.requester.profile.save()
+        colleague = User.objects.create_user(
+            username='colleague', email='colleague@example.com', password='pass12345'
+        )
+        colleague.profile.department = finance
+        colleague.profile.save()
+        outside = self.create_requests(1)
+        own = self.create_requests(1, requester=colleague)
+
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.post(
+            self.url, {'ids': outside + own, 'decision': 'APPROVED'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0], {
+            'id': outside[0], 'success': False, 'error': 'Request not found'
+        })
+        self.assertTrue(response.data['results'][1]['success'])
+        self.assertEqual(AssetRequest.objects.get(pk=outside[0]).status, 'PENDING')
+
+    def test_requires_approver(self):
+        ids = self.create_requests(1)
+        self.client.force_authenticate(user=self.requester)
+        response = self.client.post(
+            self.url, {'ids': ids, 'decision': 'APPROVED'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class PrincipalTests(APITestCase):
+    def setUp(self):
+        self.department = Department.objects.create(name='Finance')
+        self.manager = self.create_user('manager', 'MANAGER', self.department)
+        self.colleague = self.create_user('colleague', 'STAFF', self.department)
+        self.outsider = self.create_user('outsider', 'STAFF')
+        self.request_type = RequestType.objects.create(name='Loan', approval_levels=2)
+        self.own = self.create_request(self.colleague)
+        self.decided = self.create_request(self.outsider)
+        self.unrelated = self.create_request(self.outsider)
+        for level in (1, 2):
+            RequestApproval.objects.create(
+                request=self.decided, approver=self.manager,
+                approval_level=level, status='APPROVED'
+            )
+
+    def create_user(self, username, role, department=None):
+        user = User.objects.create_user(
+            username=username, email=f'{username}@example.com', password='pass12345'
+        )
+        user.profile.role = role
+        user.profile.department = department
+        user.profile.save()
+        return user
+
+    def create_request(self, requester):
+        return AssetRequest.objects.create(
+            request_type=self.request_type, requester=requester,
+            title='Laptop', description='Needed'
+        )
+
+    def test_manager_sees_department_and_decided_requests_once(self):
+        # A fresh instance, as authentication would load it
+        self.client.force_authenticate(user=User.objects.get(pk=self.manager.pk))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('requests:request-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(item['id'] for item in response.data['results']),
+            sorted([self.own.pk, self.decided.pk])
+        )
+        profile_reads = [
+            q for q in queries
+            if f'"users_userprofile"."user_id" = {self.manager.pk}' in q['sql']
+        ]
+        self.assertEqual(len(profile_reads), 1)
+
+    def test_approver_checks_are_read_once(self):
+        request = RequestFactory().get('/')
+        request.user = self.manager
+        principal = get_principal(request)
+        self.assertIs(get_principal(request), principal)
+
+        with self.assertNumQueries(2):
+            self.assertTrue(principal.is_approver(self.decided))
+            self.assertFalse(principal.is_approver(self.unrelated.pk))
+        with self.assertNumQueries(0):
+            self.assertTrue(principal.is_approver(self.decided.pk))
+            self.assertFalse(principal.is_approver(self.unrelated))
+
+        request.user = self.outsider
+        self.assertFalse(get_principal(request).is_approver(self.decided))
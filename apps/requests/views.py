@@ -3,14 +3,21 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from core.permissions import IsAdmin, IsManager, IsRequesterOrApprover
-from .models import AssetRequest, RequestType
+from django.db.models import Q
+from core.pagination import KeysetPagination
+from core.principal import get_principal
+from core.permissions import (
+    CanApproveRequests, IsAdmin, IsManager, IsRequesterOrApprover
+)
+from .models import AssetRequest, RequestApproval, RequestType
 from .serializers import (
     AssetRequestSerializer,
+    BulkDecisionSerializer,
     RequestTypeSerializer,
     RequestApprovalSerializer
 )
 from .services import RequestService
+from .workflow import decision_error
 
 # Create your views here.
 
@@ -63,27 +70,30 @@ class AssetRequestViewSet(viewsets.ModelViewSet):
     """
     serializer_class = AssetRequestSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):  # for swagger schema generation
             return AssetRequest.objects.none()
             
-        user = self.request.user
-        if not hasattr(user, 'profile'):  # Handle anonymous or invalid users
+        principal = get_principal(self.request)
+        if principal.profile is None:  # Handle anonymous or invalid users
             return AssetRequest.objects.none()
             
-        if user.profile.role == 'ADMIN':
+        if principal.is_admin:
             return AssetRequest.objects.all()
-        elif user.profile.role == 'MANAGER':
+        elif principal.is_manager:
+            # A semi-join, so requests with several decisions are listed once
             return AssetRequest.objects.filter(
-                approvals__approver=user
-            ) | AssetRequest.objects.filter(
-                requester__profile__department=user.profile.department
+                Q(pk__in=RequestApproval.objects.filter(
+                    approver=principal.user
+                ).values('request_id')) |
+                Q(requester__profile__department_id=principal.department_id)
             )
-        return AssetRequest.objects.filter(requester=user)
+        return AssetRequest.objects.filter(requester=principal.user)
 
     def perform_create(self, serializer):
-        RequestService.create_request(
+        serializer.instance = RequestService.create_request(
             serializer.validated_data,
             self.request.user
         )
@@ -126,6 +136,40 @@ class AssetRequestViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='bulk-decision',
+        permission_classes=[IsAuthenticated, CanApproveRequests]
+    )
+    def bulk_decision(self, request):
+        """Approve or reject many asset requests in one call"""
+        serializer = BulkDecisionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        # Requests the user cannot see are reported as not found
+        visible = set(
+            self.get_queryset().filter(pk__in=ids).values_list('pk', flat=True)
+        )
+        decided = {
+            result['id']: result
+            for result in RequestService.process_approvals(
+                [pk for pk in ids if pk in visible],
+                request.user,
+                serializer.validated_data['decision'],
+                serializer.validated_data['comments']
+            )
+        }
+        results = [
+            decided.get(pk) or decision_error(pk, "Request not found") for pk in ids
+        ]
+        succeeded = sum(1 for result in results if result['success'])
+        return Response({
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'results': results,
+        })
+
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         """Cancel an asset request"""
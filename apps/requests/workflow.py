@@ -0,0 +1,456 @@
+from collections import Counter as Tally, defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from apps.assets.models import Asset
+from apps.notifications.services import NotificationService
+from apps.reports.dashboard import DashboardService
+from apps.reports.metrics import MetricsRollupService
+from apps.users.models import UserProfile
+from core.cache_tags import TaggedCache, instance_tag, model_tag
+from core.counters import ASSET_STATUS, CounterService
+from core.constants import (
+    ASSET_STATUS_ASSIGNED, BULK_DECISION_CHUNK_SIZE, REQUEST_STATUS_APPROVED, REQUEST_STATUS_CANCELLED,
+    REQUEST_STATUS_COMPLETED, REQUEST_STATUS_PENDING, REQUEST_STATUS_REJECTED,
+)
+from .models import AssetRequest, RequestApproval
+from .signals import requests_moved
+
+# Request status -> statuses it may move to
+TRANSITIONS = {
+    REQUEST_STATUS_PENDING: {
+        REQUEST_STATUS_APPROVED, REQUEST_STATUS_REJECTED, REQUEST_STATUS_CANCELLED,
+    },
+    REQUEST_STATUS_APPROVED: {REQUEST_STATUS_COMPLETED, REQUEST_STATUS_CANCELLED},
+    REQUEST_STATUS_REJECTED: set(),
+    REQUEST_STATUS_CANCELLED: set(),
+    REQUEST_STATUS_COMPLETED: set(),
+}
+
+DECISIONS = (REQUEST_STATUS_APPROVED, REQUEST_STATUS_REJECTED)
+
+
+class InvalidTransition(ValidationError):
+    """A request cannot move from its current status to the one asked for"""
+
+
+class RequestWorkflow:
+    """
+    State machine of asset requests and their approvals.
+
+    A request needing approval gets one pending approval per level when it
+    is created. Approvers decide the lowest pending level: the last
+    approval approves the request, any rejection rejects it and closes the
+    levels still pending. Requests that need no approval are approved as
+    soon as they are created, through the same transition. Notifications
+    are queued in the same transaction.
+
+    Every decision reads the request and its approvals in one locked
+    query and writes with conditional UPDATEs, so it costs the same few
+    queries at any number of levels, and of two approvers racing for the
+    same level exactly one wins.
+    """
+
+    @staticmethod
+    def check_transition(current, target):
+        if target not in TRANSITIONS.get(current, ()):
+            raise InvalidTransition(
+                f"Cannot move a {current.lower()} request to {target.lower()}"
+            )
+
+    @staticmethod
+    def needs_approval(request_type):
+        return bool(request_type.requires_approval and request_type.approval_levels)
+
+    @staticmethod
+    def start(request):
+        """
+        Open a request just created as pending: create its approvals, or
+        approve it and assign its asset if its type needs no approval
+        """
+        if RequestWorkflow.needs_approval(request.request_type):
+            RequestWorkflow.create_approvals([request])
+            return
+        RequestWorkflow.move(request, REQUEST_STATUS_APPROVED)
+        if request.asset_id:
+            RequestWorkflow.assign_assets([request])
+
+    @staticmethod
+    def create_approvals(requests):
+        """Create the pending approvals of ``requests`` in one query"""
+        return RequestApproval.objects.bulk_create([
+            RequestApproval(request=request, approval_level=level)
+            for request in requests
+            if request.request_type.requires_approval
+            for level in range(1, request.request_type.approval_levels + 1)
+        ])
+
+    @staticmethod
+    def lock(request_id):
+        """
+        Return the request and its approvals, locked until the end of the
+        transaction
+        """
+        approvals = list(
+            RequestApproval.objects.select_for_update()
+            .select_related('request__request_type')
+            .filter(request_id=request_id)
+            .order_by('approval_level')
+        )
+        if not approvals:
+            request = AssetRequest.objects.select_for_update().select_related(
+                'request_type'
+            ).get(pk=request_id)
+            return request, approvals
+
+        request = approvals[0].request
+        for approval in approvals:
+            approval.request = request
+        return request, approvals
+
+    @staticmethod
+    def plan(request, approvals, decision):
+        """
+        Work out ``decision`` on a locked request
+
+        Returns the approval it decides, the status the request moves to
+        (None while levels remain) and the levels still pending after it.
+        """
+        if request.status != REQUEST_STATUS_PENDING:
+            raise InvalidTransition(
+                f"Cannot decide on a {request.status.lower()} request"
+            )
+        pending = [a for a in approvals if a.status == REQUEST_STATUS_PENDING]
+        if not pending:
+            raise ValidationError("No pending approvals found")
+
+        approval, remaining = pending[0], pending[1:]
+        if decision == REQUEST_STATUS_REJECTED:
+            target = REQUEST_STATUS_REJECTED
+        elif not remaining:
+            target = REQUEST_STATUS_APPROVED
+        else:
+            target = None
+        return approval, target, remaining
+
+    @staticmethod
+    def move(request, target, now=None):
+        """Move a locked request to ``target``"""
+        RequestWorkflow.check_transition(request.status, target)
+        now = now or timezone.now()
+        fields = {'status': target, 'updated_at': now}
+        if target == REQUEST_STATUS_APPROVED:
+            fields['completion_date'] = now
+        updated = AssetRequest.objects.filter(
+            pk=request.pk, status=request.status
+        ).update(**fields)
+        if not updated:
+            raise InvalidTransition("Request was changed by someone else")
+        requests_moved.send(
+            sender=RequestWorkflow, transitions={(request.status, target): 1}
+        )
+        for field, value in fields.items():
+            setattr(request, field, value)
+
+    @staticmethod
+    @transaction.atomic
+    def decide(request_id, approver, decision, comments=None):
+        """
+        Record ``approver``'s decision on the next pending approval level
+
+        Returns the updated approval.
+        """
+        if decision not in DECISIONS:
+            raise ValidationError(f"Invalid decision: {decision}")
+
+        request, approvals = RequestWorkflow.lock(request_id)
+        if not approvals and request.status == REQUEST_STATUS_PENDING:
+            # Created without going through the workflow
+            approvals = RequestWorkflow.create_approvals([request])
+        approval, target, remaining = RequestWorkflow.plan(
+            request, approvals, decision
+        )
+
+        now = timezone.now()
+        decided = {
+            'approver': approver,
+            'status': decision,
+            'comments': comments or '',
+            'approval_date': now,
+            'updated_at': now,
+        }
+        won = RequestApproval.objects.filter(
+            pk=approval.pk, status=REQUEST_STATUS_PENDING
+        ).update(**decided)
+        if not won:
+            raise InvalidTransition("Approval was decided by someone else")
+        for field, value in decided.items():
+            setattr(approval, field, value)
+
+        if target is not None:
+            RequestWorkflow.move(request, target, now)
+        if target == REQUEST_STATUS_REJECTED and remaining:
+            RequestApproval.objects.filter(
+                pk__in=[a.pk for a in remaining]
+            ).update(status=REQUEST_STATUS_CANCELLED, updated_at=now)
+        elif target == REQUEST_STATUS_APPROVED and request.asset_id:
+            RequestWorkflow.assign_assets([request])
+
+        notification = (
+            'request_approved' if decision == REQUEST_STATUS_APPROVED
+            else 'request_rejected'
+        )
+        NotificationService.notify(notification, request.requester_id, {
+            'request': request, 'approval': approval, 'comments': approval.comments,
+        })
+        return approval
+
+    @staticmethod
+    def decide_many(request_ids, approver, decision, comments=None,
+                    chunk_size=BULK_DECISION_CHUNK_SIZE):
+        """
+        Record ``approver``'s decision on many requests at once
+
+        Requests are decided ``chunk_size`` per transaction, each chunk in
+        a fixed number of queries. Returns one result per distinct id, in
+        the order given; a request that cannot be decided gets an
+        ``error`` instead of failing the others.
+        """
+        if decision not in DECISIONS:
+            raise ValidationError(f"Invalid decision: {decision}")
+
+        request_ids = list(dict.fromkeys(request_ids))
+        results = {}
+        for start in range(0, len(request_ids), chunk_size):
+            chunk = request_ids[start:start + chunk_size]
+            try:
+                results.update(RequestWorkflow._decide_chunk(
+                    chunk, approver, decision, comments
+                ))
+            except InvalidTransition:
+                # Lost a race for some of the chunk; settle it one by one
+                for request_id in chunk:
+                    try:
+                        approval = RequestWorkflow.decide(
+                            request_id, approver, decision, comments
+                        )
+                    except (ValidationError, AssetRequest.DoesNotExist) as e:
+                        results[request_id] = decision_error(request_id, e)
+                    else:
+                        results[request_id] = decision_result(approval)
+        return [results[request_id] for request_id in request_ids]
+
+    @staticmethod
+    @transaction.atomic
+    def _decide_chunk(request_ids, approver, decision, comments):
+        approvals = list(
+            RequestApproval.objects.select_for_update()
+            .select_related('request__request_type')
+            .filter(request_id__in=request_ids)
+            .order_by('request_id', 'approval_level')
+        )
+        requests = {}
+        by_request = defaultdict(list)
+        for approval in approvals:
+            approval.request = requests.setdefault(approval.request_id, approval.request)
+            by_request[approval.request_id].append(approval)
+
+        missing = [pk for pk in request_ids if pk not in requests]
+        if missing:
+            unstarted = list(
+                AssetRequest.objects.select_for_update()
+                .select_related('request_type')
+                .filter(pk__in=missing)
+            )
+            requests.update((request.pk, request) for request in unstarted)
+            # Created without going through the workflow
+            for approval in RequestWorkflow.create_approvals([
+                request for request in unstarted
+                if request.status == REQUEST_STATUS_PENDING
+            ]):
+                by_request[approval.request_id].append(approval)
+
+        results = {}
+        plans = []
+        for pk in request_ids:
+            request = requests.get(pk)
+            if request is None:
+                results[pk] = decision_error(pk, "Request not found")
+                continue
+            try:
+                plans.append(RequestWorkflow.plan(request, by_request[pk], decision))
+            except ValidationError as e:
+                results[pk] = decision_error(pk, e)
+        if not plans:
+            return results
+
+        now = timezone.now()
+        decided = {
+            'approver': approver,
+            'status': decision,
+            'comments': comments or '',
+            'approval_date': now,
+            'updated_at': now,
+        }
+        won = RequestApproval.objects.filter(
+            pk__in=[approval.pk for approval, _, _ in plans],
+            status=REQUEST_STATUS_PENDING
+        ).update(**decided)
+        if won != len(plans):
+            raise InvalidTransition("Approvals were decided by someone else")
+
+        for target in DECISIONS:
+            moving = [approval.request for approval, to, _ in plans if to == target]
+            if not moving:
+                continue
+            fields = {'status': target, 'updated_at': now}
+            if target == REQUEST_STATUS_APPROVED:
+                fields['completion_date'] = now
+            moved = AssetRequest.objects.filter(
+                pk__in=[request.pk for request in moving],
+                status=REQUEST_STATUS_PENDING
+            ).update(**fields)
+            if moved != len(moving):
+                raise InvalidTransition("Requests were changed by someone else")
+            requests_moved.send(
+                sender=RequestWorkflow,
+                transitions={(REQUEST_STATUS_PENDING, target): moved}
+            )
+            for request in moving:
+                for field, value in fields.items():
+                    setattr(request, field, value)
+
+        closed = [
+            pending.pk
+            for _, target, remaining in plans if target == REQUEST_STATUS_REJECTED
+            for pending in remaining
+        ]
+        if closed:
+            RequestApproval.objects.filter(pk__in=closed).update(
+                status=REQUEST_STATUS_CANCELLED, updated_at=now
+            )
+        assigned = [
+            approval.request for approval, target, _ in plans
+            if target == REQUEST_STATUS_APPROVED and approval.request.asset_id
+        ]
+        if assigned:
+            RequestWorkflow.assign_assets(assigned)
+
+        for approval, _, _ in plans:
+            for field, value in decided.items():
+                setattr(approval, field, value)
+            results[approval.request_id] = decision_result(approval)
+
+        RequestWorkflow.notify_decisions(
+            [approval.request for approval, _, _ in plans], decision, comments
+        )
+        return results
+
+    @staticmethod
+    def notify_decisions(requests, decision, comments=None):
+        """One notification per requester for a batch of decided requests"""
+        by_requester = defaultdict(list)
+        for request in requests:
+            by_requester[request.requester_id].append(request)
+        notification = (
+            'request_approved' if decision == REQUEST_STATUS_APPROVED
+            else 'request_rejected'
+        )
+        NotificationService.notify_each(notification, [
+            (requester_id, {'requests': decided, 'comments': comments or ''})
+            for requester_id, decided in by_requester.items()
+        ])
+
+    @staticmethod
+    @transaction.atomic
+    def cancel(request_id, user):
+        """Cancel a request and close its pending approvals"""
+        request, _ = RequestWorkflow.lock(request_id)
+        if request.requester_id != user.pk and not user.profile.is_admin:
+            raise ValidationError("Unauthorized to cancel this request")
+
+        now = timezone.now()
+        RequestWorkflow.move(request, REQUEST_STATUS_CANCELLED, now)
+        RequestApproval.objects.filter(
+            request=request, status=REQUEST_STATUS_PENDING
+        ).update(status=REQUEST_STATUS_CANCELLED, updated_at=now)
+
+        NotificationService.notify(
+            'request_cancelled', request.requester_id, {'request': request}
+        )
+        return request
+
+    @staticmethod
+    def assign_assets(requests):
+        """
+        Assign the requested assets to their requesters
+
+        One UPDATE for the lot. It bypasses save(), so the status
+        counters, metrics rollups and caches the asset signals maintain
+        are moved here, in bulk.
+        """
+        assets = {
+            asset['pk']: asset
+            for asset in Asset.objects.select_for_update().filter(
+                pk__in=[request.asset_id for request in requests]
+            ).values('pk', 'asset_status', 'assigned_to_id')
+        }
+        profiles = dict(UserProfile.objects.filter(
+            user_id__in=[request.requester_id for request in requests]
+        ).values_list('user_id', 'pk'))
+        # The last request for an asset wins, as it would saving one by one
+        assignees = {
+            request.asset_id: profiles.get(request.requester_id) for request in requests
+        }
+        by_assignee = defaultdict(list)
+        for asset_pk, profile_pk in assignees.items():
+            by_assignee[profile_pk].append(asset_pk)
+
+        Asset.objects.filter(pk__in=list(assets)).update(
+            assigned_to=Case(
+                *[When(pk__in=pks, then=Value(profile_pk))
+                  for profile_pk, pks in by_assignee.items()],
+                output_field=Asset._meta.get_field('assigned_to')
+            ),
+            asset_status=ASSET_STATUS_ASSIGNED,
+            updated_at=timezone.now(),
+            version=F('version') + 1,
+        )
+
+        moved = Tally(
+            asset['asset_status'] for asset in assets.values()
+            if asset['asset_status'] != ASSET_STATUS_ASSIGNED
+        )
+        if moved:
+            CounterService.apply(ASSET_STATUS, {
+                **{status: -count for status, count in moved.items()},
+                ASSET_STATUS_ASSIGNED: sum(moved.values()),
+            })
+        MetricsRollupService.move_assets(list(assets), ASSET_STATUS_ASSIGNED)
+
+        tags = {model_tag(Asset)}
+        for asset in assets.values():
+            tags.add(instance_tag(Asset, asset['pk']))
+            for profile_pk in (asset['assigned_to_id'], assignees[asset['pk']]):
+                if profile_pk is not None:
+                    tags.add(instance_tag(UserProfile, profile_pk))
+        TaggedCache.invalidate(*tags)
+        DashboardService.invalidate()
+
+
+def decision_result(approval):
+    return {
+        'id': approval.request_id,
+        'success': True,
+        'approval_level': approval.approval_level,
+        'request_status': approval.request.status,
+    }
+
+
+def decision_error(request_id, error):
+    if isinstance(error, ValidationError):
+        error = ' '.join(error.messages)
+    return {'id': request_id, 'success': False, 'error': str(error)}
@@ -1,7 +1,8 @@
 from django.db import models
 from core.models import AuditableModel
-from core.utils import generate_unique_id
+from core.sequences import next_id, register_id_prefix
 from core.constants import STATUS_CHOICES, STATUS_ACTIVE
+from core.counters import TAG_ASSETS, CounterService
 
 class Tag(AuditableModel):
     """
@@ -30,10 +31,14 @@ class Tag(AuditableModel):
 
     def save(self, *args, **kwargs):
         if not self.code:
-            self.code = generate_unique_id(prefix='TAG')
+            self.code = next_id('TAG')
         super().save(*args, **kwargs)
 
     @property
     def asset_count(self):
         """Get number of assets with this tag"""
-        return self.asset_tags.count()
+        if hasattr(self, 'counted_assets'):
+            return self.counted_assets
+        return CounterService.get(TAG_ASSETS, self.pk)
+
+register_id_prefix('TAG', Tag, 'code')
@@ -1,3 +1,44 @@
+from decimal import Decimal
+
 from django.test import TestCase
+from django.utils import timezone
+
+from apps.assets.models import Asset
+from apps.categories.models import Category
+from core.cache_tags import instance_tag
+from core.utils import CacheManager
+from .models import Tag
+
+
+class TaggedCacheTests(TestCase):
+    def setUp(self):
+        self.tag = Tag.objects.create(name='Spare')
+        self.asset = Asset.objects.create(
+            name='Asset',
+            category=Category.objects.create(name='Laptops'),
+            purchase_date=timezone.now().date(),
+            purchase_price=Decimal('100.00')
+        )
+        self.computed = 0
+
+    def cached_tag_usage(self):
+        def compute():
+            self.computed += 1
+            return self.tag.asset_set.count()
+        return CacheManager.get_or_set_with_version(
+            f'tag_usage_{self.tag.pk}', compute, tags=[instance_tag(self.tag)]
+        )
+
+    def test_entries_follow_saves_and_links(self):
+        self.assertEqual([self.cached_tag_usage(), self.cached_tag_usage()], [0, 0])
+        self.assertEqual(self.computed, 1)
+
+        # Linking from the asset side invalidates the tag's entries too
+        with self.captureOnCommitCallbacks(execute=True):
+            self.asset.tags.add(self.tag)
+        self.assertEqual(self.cached_tag_usage(), 1)
+        self.assertEqual(self.computed, 2)
 
-# Create your tests here.
+        CacheManager.bump_version()
+        self.cached_tag_usage()
+        self.assertEqual(self.computed, 3)
@@ -3,7 +3,8 @@ from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Count
+from core.conditional import ConditionalRequestMixin
+from core.counters import TAG_ASSETS, CounterService
 from .models import Tag
 from .serializers import TagSerializer
 from core.permissions import IsAdminUser, IsManagerUser
@@ -12,7 +13,7 @@ from drf_yasg import openapi
 
 # Create your views here.
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(ConditionalRequestMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing tags
     """
@@ -27,7 +28,7 @@ class TagViewSet(viewsets.ModelViewSet):
             return Tag.objects.none()
             
         return Tag.objects.all().annotate(
-            total_assets=Count('assets')
+            counted_assets=CounterService.subquery(TAG_ASSETS)
         )
 
     @swagger_auto_schema(
@@ -42,7 +43,7 @@ class TagViewSet(viewsets.ModelViewSet):
                         "code": "TAG001",
                         "description": "Computing devices",
                         "color": "#FF0000",
-                        "total_assets": 5
+                        "asset_count": 5
                     }]
                 }
             )
@@ -102,8 +103,8 @@ class TagViewSet(viewsets.ModelViewSet):
     def assets(self, request, pk=None):
         """Get assets associated with this tag"""
         tag = self.get_object()
-        assets = tag.assets.all()
+        assets = tag.asset_set.all()
         return Response({
-            'count': assets.count(),
+            'count': tag.asset_count,
             'assets': assets.values('id', 'name', 'asset_id', 'status')
         })
@@ -7,9 +7,4 @@ class UsersConfig(AppConfig):
     verbose_name = 'Users'
 
     def ready(self):
-        print("Loading users module")
-        try:
-            from . import signals  # Import signals
-            print("User signals loaded successfully")
-        except Exception as e:
-            print(f"Error loading user signals: {e}")
+        from . import signals  # Connects the receivers
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_alter_userprofile_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='last_activity',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
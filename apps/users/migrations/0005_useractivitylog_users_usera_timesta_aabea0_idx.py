@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_userprofile_last_activity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useractivitylog',
+            index=models.Index(fields=['timestamp'], name='users_usera_timesta_aabea0_idx'),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from core.models import AuditableModel
 from core.constants import ROLE_CHOICES, ROLE_USER, STATUS_CHOICES, STATUS_ACTIVE
@@ -27,6 +27,7 @@ class UserProfile(AuditableModel):
     )
     employee_id = models.CharField(max_length=20, unique=True)
     phone_number = models.CharField(max_length=15, null=True, blank=True)
+    last_activity = models.DateTimeField(null=True, blank=True, editable=False)
     status = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
@@ -84,7 +85,9 @@ class UserProfile(AuditableModel):
         if self.phone_number:
             # Remove any non-digit characters and ensure it's a string
             self.phone_number = str(''.join(filter(str.isdigit, str(self.phone_number))))
-        super().save(*args, **kwargs)
+        # Together with the department counters its post_save moves
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
 class UserActivityLog(AuditableModel):
     """Log user activities"""
@@ -104,6 +107,7 @@ class UserActivityLog(AuditableModel):
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['user', '-timestamp']),
+            models.Index(fields=['timestamp']),
             models.Index(fields=['action']),
             models.Index(fields=['status']),
         ]
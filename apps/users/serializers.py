@@ -61,9 +61,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'employee_id', 
             'phone_number',
             'status',
-            'is_active'
+            'is_active',
+            'last_activity'
         )
-        read_only_fields = ('id', 'employee_id')
+        read_only_fields = ('id', 'employee_id', 'last_activity')
 
     def validate_phone_number(self, value):
         """Validate phone number format"""
@@ -1,12 +1,21 @@
-from django.db.models.signals import post_save
+from django.db.models import Count
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from apps.departments.models import Department
 from .models import UserProfile
+from core.cache_tags import TaggedCache, instance_tag, track_model
 from core.constants import ROLE_ADMIN
+from core.counters import (
+    DEPARTMENT_USERS, DEPARTMENT_ACTIVE_USERS, CounterService, register_counter,
+)
 import uuid
 
 User = get_user_model()
 
+track_model(User)
+track_model(UserProfile, parents=('user', 'department'))
+
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
     """
@@ -30,4 +39,77 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
             # If user becomes superuser, update role to ADMIN
             if instance.is_superuser and instance.profile.role != ROLE_ADMIN:
                 instance.profile.role = ROLE_ADMIN
-                instance.profile.save() 
\ No newline at end of file
+                instance.profile.save() 
+
+
+@receiver(post_save, sender=User)
+def invalidate_profile_tag(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Profiles embed their user, e.g. in expanded asset lists; login only
+    moves ``last_login``, which none of them show
+    """
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    if hasattr(instance, 'profile'):
+        TaggedCache.invalidate(instance_tag(instance.profile))
+
+
+register_counter(
+    DEPARTMENT_USERS,
+    lambda apps: apps.get_model('users', 'UserProfile').objects.order_by()
+    .values_list('department_id').annotate(Count('pk'))
+)
+register_counter(
+    DEPARTMENT_ACTIVE_USERS,
+    lambda apps: apps.get_model('users', 'UserProfile').objects.filter(is_active=True)
+    .order_by().values_list('department_id').annotate(Count('pk'))
+)
+
+
+def _membership(department_id, is_active):
+    return {
+        DEPARTMENT_USERS: department_id,
+        DEPARTMENT_ACTIVE_USERS: department_id if is_active else None,
+    }
+
+
+@receiver(pre_save, sender=UserProfile)
+def remember_membership(sender, instance, **kwargs):
+    """
+    Keep the stored department membership for the counters
+    """
+    instance._membership_before = {}
+    if instance.pk and not instance._state.adding:
+        before = UserProfile.objects.filter(pk=instance.pk).values(
+            'department_id', 'is_active'
+        ).first()
+        if before:
+            instance._membership_before = _membership(**before)
+
+
+@receiver(post_save, sender=UserProfile)
+def update_department_counters(sender, instance, **kwargs):
+    """
+    Move department member counters when a profile joins or leaves
+    """
+    before = getattr(instance, '_membership_before', {})
+    after = _membership(instance.department_id, instance.is_active)
+    for name, department_id in after.items():
+        old = before.get(name)
+        if old != department_id:
+            CounterService.increment(name, old, -1)
+            CounterService.increment(name, department_id, 1)
+
+
+@receiver(post_delete, sender=UserProfile)
+def release_department_counters(sender, instance, **kwargs):
+    for name, department_id in _membership(
+            instance.department_id, instance.is_active).items():
+        CounterService.increment(name, department_id, -1)
+
+
+@receiver(post_delete, sender=Department)
+def discard_department_member_counters(sender, instance, **kwargs):
+    # Profiles are detached with SET_NULL, which sends no signals
+    CounterService.discard(DEPARTMENT_USERS, instance.pk)
+    CounterService.discard(DEPARTMENT_ACTIVE_USERS, instance.pk)
@@ -3,9 +3,10 @@ from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from .models import UserProfile
+from .models import UserProfile, UserActivityLog
 from apps.departments.models import Department
 from core.constants import ROLE_ADMIN, ROLE_MANAGER, ROLE_USER
+from core.activity import ActivityLogBuffer, LastActivityTracker
 
 User = get_user_model()
 
@@ -166,3 +167,140 @@ class UserProfileTests(APITestCase):
         """Clean up after tests"""
         User.objects.all().delete()
         Department.objects.all().delete()
+
+
+class ActivityLogBufferTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='buffered',
+            email='buffered@example.com',
+            password='bufferedpass123'
+        )
+
+    def test_flush_writes_batches(self):
+        """Test queued records are written in bulk on flush"""
+        buffer = ActivityLogBuffer(max_size=100, batch_size=2)
+        for i in range(5):
+            buffer.enqueue(self.user.pk, f'action_{i}', '127.0.0.1')
+
+        with self.assertNumQueries(3):
+            self.assertEqual(buffer.flush(), 5)
+
+        self.assertEqual(UserActivityLog.objects.filter(user=self.user).count(), 5)
+        stats = buffer.stats()
+        self.assertEqual(stats['flushed'], 5)
+        self.assertEqual(stats['pending'], 0)
+        buffer.shutdown()
+
+    def test_overflow_policies(self):
+        """Test the buffer stays bounded and counts dropped records"""
+        oldest = ActivityLogBuffer(max_size=3, batch_size=10)
+        newest = ActivityLogBuffer(
+            max_size=3, batch_size=10, overflow_policy='drop_newest'
+        )
+        for i in range(5):
+            oldest.enqueue(self.user.pk, f'action_{i}')
+            newest.enqueue(self.user.pk, f'action_{i}')
+
+        self.assertEqual(oldest.stats()['dropped'], 2)
+        self.assertEqual(newest.stats()['dropped'], 2)
+        self.assertEqual(
+            [record[1] for record in oldest._records],
+            ['action_2', 'action_3', 'action_4']
+        )
+        self.assertEqual(
+            [record[1] for record in newest._records],
+            ['action_0', 'action_1', 'action_2']
+        )
+        for buffer in (oldest, newest):
+            buffer._records.clear()
+            buffer.shutdown()
+
+
+class LastActivityTrackerTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f'active{i}',
+                email=f'active{i}@example.com',
+                password='activepass123'
+            ) for i in range(3)
+        ]
+
+    def test_coalesced_batched_update(self):
+        """Test activity is persisted once per interval in one UPDATE"""
+        tracker = LastActivityTracker(interval=300)
+        for _ in range(5):
+            for user in self.users:
+                tracker.touch(user.pk)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(tracker.flush(), 3)
+
+        profiles = UserProfile.objects.filter(user__in=self.users)
+        self.assertTrue(all(p.last_activity for p in profiles))
+        self.assertTrue(all(p.version == 1 for p in profiles))
+
+        # Within the interval further requests stay write-free
+        for user in self.users:
+            self.assertFalse(tracker.touch(user.pk))
+        with self.assertNumQueries(0):
+            self.assertEqual(tracker.flush(), 0)
+        tracker.shutdown()
+
+
+class ActivityLogPaginationTests(APITestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_user(
+            username='pager',
+            email='pager@example.com',
+            password='pagerpass123'
+        )
+        profile = self.admin_user.profile
+        profile.role = ROLE_ADMIN
+        profile.save()
+        UserActivityLog.objects.bulk_create([
+            UserActivityLog(user=self.admin_user, action=f'action_{i}')
+            for i in range(25)
+        ])
+        # Ties on the timestamp are broken by the primary key
+        UserActivityLog.objects.filter(action__in=['action_10', 'action_11']).update(
+            timestamp=UserActivityLog.objects.get(action='action_12').timestamp
+        )
+        self.client.force_authenticate(self.admin_user)
+        self.url = reverse('users:activity-list')
+
+    def test_cursor_walks_every_row_once(self):
+        """Test cursor pages cover the log in order without COUNT(*)"""
+        expected = list(UserActivityLog.objects.order_by(
+            '-timestamp', '-pk'
+        ).values_list('pk', flat=True))
+
+        seen = []
+        url = f'{self.url}?page_size=10&count=false'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(row['id'] for row in response.data['results'])
+            last = response.data
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+
+        # And back again from the last page
+        previous = self.client.get(last['previous'])
+        self.assertEqual(
+            [row['id'] for row in previous.data['results']], expected[10:20]
+        )
+
+    def test_count_and_page_number_fallback(self):
+        """Test the count, on by default, and ?page= keep working"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 25)
+
+        response = self.client.get(f'{self.url}?page=3')
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 5)
+
+        response = self.client.get(f'{self.url}?cursor=bogus')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
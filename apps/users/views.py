@@ -6,6 +6,8 @@ from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
 from .models import UserProfile, UserActivityLog
 from .serializers import UserSerializer, UserProfileSerializer, UserActivityLogSerializer
+from core.pagination import KeysetPagination
+from core.principal import get_principal
 from core.permissions import IsAdmin, IsManager
 from django.db.models import Q
 from datetime import timedelta
@@ -23,14 +25,14 @@ class UserViewSet(viewsets.ModelViewSet):
         if getattr(self, 'swagger_fake_view', False):  # for swagger schema generation
             return User.objects.none()
             
-        user = self.request.user
-        if user.profile.is_admin:
+        principal = get_principal(self.request)
+        if principal.is_admin:
             return User.objects.all().order_by('username')
-        elif user.profile.is_manager:
+        elif principal.is_manager:
             return User.objects.filter(
-                profile__department=user.profile.department
+                profile__department_id=principal.department_id
             ).order_by('username')
-        return User.objects.filter(id=user.id)
+        return User.objects.filter(id=principal.user.id)
 
     def get_permissions(self):
         """Set custom permissions for different actions"""
@@ -167,14 +169,14 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.profile.is_admin:
+        principal = get_principal(self.request)
+        if principal.is_admin:
             return UserProfile.objects.all()
-        elif user.profile.is_manager:
+        elif principal.is_manager:
             return UserProfile.objects.filter(
-                department=user.profile.department
+                department_id=principal.department_id
             )
-        return UserProfile.objects.filter(user=user)
+        return UserProfile.objects.filter(user=principal.user)
 
     def get_permissions(self):
         """Set custom permissions for different actions"""
@@ -299,14 +301,15 @@ class UserActivityViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing user activity logs"""
     serializer_class = UserActivityLogSerializer
     permission_classes = [IsAuthenticated, IsAdmin|IsManager]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
-        user = self.request.user
+        principal = get_principal(self.request)
         queryset = UserActivityLog.objects.all()
 
-        if user.profile.is_manager:
+        if principal.is_manager:
             queryset = queryset.filter(
-                user__profile__department=user.profile.department
+                user__profile__department_id=principal.department_id
             )
 
         # Filter by user
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
     'apps.tags',
     'apps.reports',
     'apps.requests.apps.RequestsConfig',
+    'apps.notifications',
 ]
 
 # Add Swagger in debug mode only
@@ -210,13 +211,96 @@ CORS_ALLOWED_ORIGINS = [
 CORS_ALLOW_CREDENTIALS = True
 
 # Cache settings
+# Cache shared by all worker processes through one SQLite file, with an
+# in-process copy of recently read entries (see core.cache_backend)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+        'BACKEND': 'core.cache_backend.SQLiteCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / 'cache.sqlite3')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,  # Entries kept before the soonest to expire are culled
+            'L1_MAX_ENTRIES': 1000,  # Entries copied in each process
+            'CULL_INTERVAL': 60,  # Seconds between expiry sweeps of a process
+            'CHANGE_RETENTION': 300,  # Seconds writes stay in the log other processes replay
+            'BUSY_TIMEOUT': 5.0,  # Seconds a write waits for another process's lock
+        },
     }
 }
 
+# Test runs start from an empty cache of their own (see core.test_runner)
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# User activity logging (see core.activity.ActivityLogBuffer)
+ACTIVITY_LOG_BUFFER = {
+    'MAX_SIZE': 10000,  # Records held in memory before overflow
+    'BATCH_SIZE': 500,  # Records per bulk INSERT
+    'FLUSH_INTERVAL': 2.0,  # Seconds between background flushes
+    'OVERFLOW_POLICY': 'drop_oldest',  # or 'drop_newest'
+}
+
+# Minimum seconds between two UserProfile.last_activity writes per user
+LAST_ACTIVITY_INTERVAL = 300
+
+# Rendered QR codes (see core.qrcodes.QRCodeCache)
+QR_CODE_CACHE = {
+    'MEMORY_ENTRIES': 256,  # PNGs kept in the in-process LRU
+    'DIRECTORY': 'qr_codes',  # Content-addressed files under MEDIA_ROOT
+}
+
+# Fuzzy asset search (see apps.assets.search.AssetSearchIndex)
+ASSET_SEARCH = {
+    'LIMIT': 200,  # Default cap on ranked results; the asset list takes every match
+    'SCORE_CUTOFF': 70,  # Minimum RapidFuzz score (0-100) for a token match
+    'SYNC_INTERVAL': 1.0,  # Seconds between checks for writes by other processes
+}
+
+# Background report generation (see apps.reports.jobs)
+REPORT_JOBS = {
+    'WORKERS': 2,  # Jobs run concurrently by one run_report_jobs worker
+    'USE_PROCESSES': False,  # Processes instead of threads (PDFs render on PDF_RENDERING's pool either way)
+    'POLL_INTERVAL': 2.0,  # Seconds between queue polls when idle
+    'MAX_ATTEMPTS': 3,  # Attempts before a job is marked failed
+    'RETRY_DELAY': 30,  # Seconds before the first retry, doubled per attempt
+    'LEASE_TIMEOUT': 600,  # Seconds without progress before a job is requeued
+}
+
+# Generated report reuse (see apps.reports.results.ReportResultCache)
+REPORT_CACHE = {
+    'ENABLED': True,
+    'MAX_AGE': 60 * 60 * 24,  # Seconds a generated report may be reused
+    'MAX_SIZE': 512 * 1024 * 1024,  # Bytes of report files kept for reuse
+}
+
+# PDF rendering worker pool (see core.pdf.PDFRenderPool)
+PDF_RENDERING = {
+    'WORKERS': None,  # Worker processes; None uses one per CPU
+    'TIMEOUT': 120,  # Seconds a single render may take
+    'MEMORY_LIMIT': 1024 * 1024 * 1024,  # Address space per worker, in bytes
+    'MAX_RENDERS_PER_WORKER': 100,  # Renders before a worker is replaced
+    'STYLESHEETS': [],  # CSS files parsed once per worker and applied to every PDF
+    'BASE_URL': None,  # Base for relative URLs in templates; defaults to MEDIA_ROOT
+    'TEMPLATE_CACHE_ENTRIES': 32,  # Compiled report templates kept in memory
+}
+
+# Notification delivery (see apps.notifications)
+NOTIFICATIONS = {
+    'CHANNELS': ['email', 'in_app'],  # Channels used unless a notification type names its own
+    'BATCH_SIZE': 100,  # Messages claimed per dispatcher round
+    'POLL_INTERVAL': 2.0,  # Seconds between outbox polls when idle
+    'MAX_ATTEMPTS': 5,  # Delivery attempts before a message is marked failed
+    'RETRY_DELAY': 30,  # Seconds before the first retry, doubled per attempt
+    'LEASE_TIMEOUT': 300,  # Seconds before a claimed message is queued again
+    'DEDUP_WINDOW': 60 * 60,  # Seconds an identical notification is not delivered again
+    'DIGEST_THRESHOLD': 5,  # Emails to one recipient in a round merged into one digest
+    'KEEP_DELIVERED': 60 * 60 * 24 * 7,  # Seconds finished messages stay in the outbox
+}
+
+# Sequential IDs such as AST00004F (see core.sequences.IdAllocator)
+ID_SEQUENCES = {
+    'BLOCK_SIZE': 50,  # Numbers a process reserves per database round trip
+    'WIDTH': 6,  # Base-36 digits after the prefix, 36**6 IDs per prefix
+}
+
 # Email settings (configure for your email provider)
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
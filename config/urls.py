@@ -33,6 +33,7 @@ schema_view = get_schema_view(
         path('api/reports/', include('apps.reports.urls', namespace='reports')),
         path('api/categories/', include('apps.categories.urls')),
         path('api/tags/', include('apps.tags.urls')),
+        path('api/notifications/', include('apps.notifications.urls', namespace='notifications')),
     ],
 )
 
@@ -48,6 +49,7 @@ urlpatterns = [
     path('api/reports/', include('apps.reports.urls', namespace='reports')),
     path('api/categories/', include('apps.categories.urls')),
     path('api/tags/', include('apps.tags.urls')),
+    path('api/notifications/', include('apps.notifications.urls', namespace='notifications')),
     
     # Swagger URLs (only in debug mode)
     path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
@@ -0,0 +1,323 @@
+import atexit
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_DROP_NEWEST = 'drop_newest'
+
+ACTIVITY_LOG_DEFAULTS = {
+    'MAX_SIZE': 10000,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 2.0,
+    'OVERFLOW_POLICY': OVERFLOW_DROP_OLDEST,
+}
+
+
+class BufferedWriter(ABC):
+    """
+    Base class for in-process write buffers drained by a daemon thread.
+
+    Subclasses implement ``flush()`` and call ``_ensure_flusher()`` when they
+    accept work; ``_wakeup`` can be set to request an early flush.
+    """
+    thread_name = 'buffered-writer'
+
+    def __init__(self, flush_interval=2.0):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = os.getpid()
+
+    @abstractmethod
+    def flush(self):
+        """Write out the pending work"""
+
+    def shutdown(self):
+        """Stop the flusher thread and write whatever is still pending"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name=self.thread_name,
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("%s flush failed", self.thread_name)
+        close_old_connections()
+
+    def _reset_after_fork(self):
+        # A forked worker inherits the parent's state but not its thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            self._pid = os.getpid()
+            self._thread = None
+            self._clear()
+
+    def _clear(self):
+        pass
+
+
+class ActivityLogBuffer(BufferedWriter):
+    """
+    Bounded in-process buffer for user activity records.
+
+    Requests only append a compact tuple to a ring buffer; a daemon thread
+    drains it with ``bulk_create`` whenever ``batch_size`` records are
+    pending or ``flush_interval`` seconds have passed, whichever comes first.
+    """
+
+    thread_name = 'activity-log-flusher'
+
+    def __init__(self, max_size=10000, batch_size=500, flush_interval=2.0,
+                 overflow_policy=OVERFLOW_DROP_OLDEST):
+        if overflow_policy not in (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST):
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        super().__init__(flush_interval=flush_interval)
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.overflow_policy = overflow_policy
+        self._records = deque(maxlen=max_size)
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @classmethod
+    def from_settings(cls):
+        """Build a buffer from the ``ACTIVITY_LOG_BUFFER`` setting"""
+        options = {
+            **ACTIVITY_LOG_DEFAULTS,
+            **getattr(settings, 'ACTIVITY_LOG_BUFFER', {}),
+        }
+        return cls(
+            max_size=options['MAX_SIZE'],
+            batch_size=options['BATCH_SIZE'],
+            flush_interval=options['FLUSH_INTERVAL'],
+            overflow_policy=options['OVERFLOW_POLICY'],
+        )
+
+    def enqueue(self, user_id, action, ip_address=None, user_agent='',
+                action_details=None):
+        """Queue one activity record without touching the database"""
+        record = (
+            user_id,
+            action,
+            ip_address,
+            (user_agent or '')[:255],
+            action_details or {},
+            timezone.now(),
+        )
+        self._reset_after_fork()
+        with self._lock:
+            if len(self._records) >= self.max_size:
+                self.dropped += 1
+                if self.overflow_policy == OVERFLOW_DROP_NEWEST:
+                    return False
+                # deque(maxlen) evicts the oldest record on append
+            self._records.append(record)
+            self.enqueued += 1
+            pending = len(self._records)
+
+        self._ensure_flusher()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def flush(self):
+        """Write every pending record, one ``bulk_create`` per batch"""
+        from apps.users.models import UserActivityLog
+
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._drain(self.batch_size)
+                if not batch:
+                    break
+                try:
+                    UserActivityLog.objects.bulk_create([
+                        UserActivityLog(
+                            user_id=user_id,
+                            action=action[:50],
+                            ip_address=ip_address,
+                            user_agent=user_agent,
+                            action_details={
+                                **details,
+                                'requested_at': requested_at.isoformat(),
+                            },
+                            status='ACTIVE',
+                        )
+                        for (user_id, action, ip_address, user_agent,
+                             details, requested_at) in batch
+                    ], batch_size=self.batch_size)
+                except Exception:
+                    logger.exception(
+                        "Failed to write %s activity log records", len(batch)
+                    )
+                    with self._lock:
+                        self.failed += len(batch)
+                    continue
+                written += len(batch)
+                with self._lock:
+                    self.flushed += len(batch)
+        return written
+
+    def stats(self):
+        """Return pipeline counters"""
+        with self._lock:
+            return {
+                'pending': len(self._records),
+                'enqueued': self.enqueued,
+                'flushed': self.flushed,
+                'dropped': self.dropped,
+                'failed': self.failed,
+            }
+
+    def _drain(self, limit):
+        with self._lock:
+            count = min(limit, len(self._records))
+            return [self._records.popleft() for _ in range(count)]
+
+    def _clear(self):
+        self._records.clear()
+
+
+class LastActivityTracker(BufferedWriter):
+    """
+    Coalesce per-user "last seen" timestamps in memory.
+
+    ``touch()`` never hits the database. A user becomes due for persistence
+    at most once per ``interval`` seconds; due users are written by the
+    flusher thread with a single ``UPDATE ... WHERE user_id IN (...)`` that
+    only sets ``UserProfile.last_activity``.
+    """
+    thread_name = 'last-activity-flusher'
+
+    def __init__(self, interval=300, flush_interval=5.0, batch_size=500):
+        super().__init__(flush_interval=flush_interval)
+        self.interval = interval
+        self.batch_size = batch_size
+        self._seen = {}
+        self._persisted = {}
+        self._due = set()
+
+    @classmethod
+    def from_settings(cls):
+        """Build a tracker from the ``LAST_ACTIVITY_INTERVAL`` setting"""
+        return cls(interval=getattr(settings, 'LAST_ACTIVITY_INTERVAL', 300))
+
+    def touch(self, user_id, when=None):
+        """Record that ``user_id`` was active at ``when`` (default: now)"""
+        when = when or timezone.now()
+        self._reset_after_fork()
+        with self._lock:
+            self._seen[user_id] = when
+            persisted = self._persisted.get(user_id)
+            if persisted is not None and \
+                    (when - persisted).total_seconds() < self.interval:
+                return False
+            self._due.add(user_id)
+        self._ensure_flusher()
+        return True
+
+    def flush(self):
+        """Persist every due user, one UPDATE per ``batch_size`` users"""
+        from apps.users.models import UserProfile
+
+        with self._flush_lock:
+            with self._lock:
+                due = {user_id: self._seen[user_id] for user_id in self._due}
+                self._due.clear()
+            if not due:
+                return 0
+
+            user_ids = list(due)
+            for start in range(0, len(user_ids), self.batch_size):
+                chunk = user_ids[start:start + self.batch_size]
+                UserProfile.objects.filter(user_id__in=chunk).update(
+                    last_activity=Case(
+                        *[When(user_id=user_id, then=Value(due[user_id]))
+                          for user_id in chunk],
+                        output_field=DateTimeField(),
+                    )
+                )
+
+            with self._lock:
+                self._persisted.update(due)
+                self._prune()
+            return len(due)
+
+    def _prune(self):
+        # Forget users whose window has closed, they will be due again anyway
+        cutoff = timezone.now()
+        for user_id, persisted in list(self._persisted.items()):
+            if (cutoff - persisted).total_seconds() >= self.interval:
+                del self._persisted[user_id]
+                if user_id not in self._due:
+                    self._seen.pop(user_id, None)
+
+    def _clear(self):
+        self._seen.clear()
+        self._persisted.clear()
+        self._due.clear()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+_tracker = None
+
+
+def get_activity_buffer():
+    """Return the process-wide activity log buffer"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ActivityLogBuffer.from_settings()
+                atexit.register(_buffer.shutdown)
+    return _buffer
+
+
+def get_last_activity_tracker():
+    """Return the process-wide last-activity tracker"""
+    global _tracker
+    if _tracker is None:
+        with _buffer_lock:
+            if _tracker is None:
+                _tracker = LastActivityTracker.from_settings()
+                atexit.register(_tracker.shutdown)
+    return _tracker
@@ -0,0 +1,426 @@
+import fnmatch
+import mmap
+import os
+import pickle
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no shared epoch, so no L1 either
+    fcntl = None
+
+# LOCATION of a cache private to this process, e.g. for test runs
+MEMORY = ':memory:'
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache_entries ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_entries_expires ON cache_entries (expires)',
+    'CREATE TABLE IF NOT EXISTS cache_changes ('
+    ' id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL,'
+    ' key TEXT NOT NULL, created REAL NOT NULL'
+    ')',
+)
+
+# What a logged change covers, replayed by other processes against their L1
+CHANGE_KEY = 'key'
+CHANGE_PATTERN = 'pattern'
+CHANGE_CLEAR = 'clear'
+
+# Keys per SELECT ... IN (...), below SQLite's parameter limit
+READ_CHUNK = 500
+
+# Range of SQLite's INTEGER; larger ints are pickled like anything else
+INTEGER_RANGE = range(-2 ** 63, 2 ** 63)
+
+LIVE = '(expires IS NULL OR expires > ?)'
+
+
+def encode(value):
+    # Integers are stored as such so incr() is a single UPDATE
+    if type(value) is int and value in INTEGER_RANGE:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def decode(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+class Epoch:
+    """
+    Highest change id committed by any process, kept in an 8-byte shared
+    file mapping so a read notices other processes' writes without a query.
+    """
+
+    def __init__(self, path):
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < 8:
+            os.ftruncate(self._fd, 8)
+        self._map = mmap.mmap(self._fd, 8)
+
+    def read(self):
+        return struct.unpack_from('q', self._map)[0]
+
+    def advance(self, change_id):
+        # Locked so a slow writer never moves the epoch back
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if change_id > self.read():
+                struct.pack_into('q', self._map, 0, change_id)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class CacheStore:
+    """
+    The cache of one LOCATION within a process: the SQLite connection, the
+    L1 copies of recently read entries and how far the change log of other
+    processes has been replayed against them.
+
+    Django creates a cache instance per thread; they all share the store
+    of their LOCATION, and its lock serializes their use of it.
+    """
+
+    def __init__(self, location, options, max_entries, cull_frequency):
+        self.location = location
+        self.max_entries = max_entries
+        self.cull_frequency = cull_frequency
+        self.l1_max_entries = options.get('L1_MAX_ENTRIES', 1000)
+        self.busy_timeout = options.get('BUSY_TIMEOUT', 5.0)
+        self.cull_interval = options.get('CULL_INTERVAL', 60)
+        self.change_retention = options.get('CHANGE_RETENTION', 300)
+        self._open()
+
+    def _open(self):
+        self.pid = os.getpid()
+        self.lock = threading.RLock()
+        self.l1 = OrderedDict()
+        self.culled_at = time.monotonic()
+        if self.location == MEMORY:
+            self.connection = sqlite3.connect(
+                MEMORY, isolation_level=None, check_same_thread=False
+            )
+            # Every writer is in this process and updates the L1 itself
+            self.epoch = None
+        else:
+            self.connection = sqlite3.connect(
+                self.location,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            if fcntl is None:
+                # Other processes' writes could not be noticed
+                self.l1_max_entries = 0
+                self.epoch = None
+            else:
+                self.epoch = Epoch(f'{self.location}.epoch')
+        for statement in SCHEMA:
+            self.connection.execute(statement)
+        self.seen_change = self.connection.execute(
+            'SELECT COALESCE(MAX(id), 0) FROM cache_changes'
+        ).fetchone()[0]
+        self.seen_epoch = self.epoch.read() if self.epoch else 0
+
+    @contextmanager
+    def using(self):
+        """Hold the store, reopened first in a forked child"""
+        if self.pid != os.getpid():
+            # The parent's connection, lock and epoch descriptor are not ours
+            self._open()
+        with self.lock:
+            yield self.connection
+
+    def read(self, keys):
+        """Return ``{key: stored value}`` of the live ``keys``"""
+        found = {}
+        with self.using() as connection:
+            epoch = self.sync()
+            now = time.time()
+            missing = []
+            for key in keys:
+                entry = self.l1.get(key)
+                if entry is not None and (entry[1] is None or entry[1] > now):
+                    self.l1.move_to_end(key)
+                    found[key] = entry[0]
+                else:
+                    missing.append(key)
+            rows = []
+            for i in range(0, len(missing), READ_CHUNK):
+                chunk = missing[i:i + READ_CHUNK]
+                rows.extend(connection.execute(
+                    f'SELECT key, value, expires FROM cache_entries '
+                    f'WHERE key IN ({", ".join("?" * len(chunk))}) AND {LIVE}',
+                    (*chunk, now)
+                ))
+            # A write committed meanwhile elsewhere may not be in ``rows``
+            remember = self.l1_max_entries and (self.epoch is None or self.epoch.read() == epoch)
+            for key, value, expires in rows:
+                found[key] = value
+                if remember:
+                    self.l1[key] = (value, expires)
+            while len(self.l1) > self.l1_max_entries:
+                self.l1.popitem(last=False)
+        return found
+
+    def write(self, changes, apply):
+        """
+        Run ``apply(cursor)`` in a write transaction that logs ``changes``
+        for the L1 of other processes; returns what ``apply`` returned
+        """
+        with self.using() as connection:
+            cursor = connection.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                result = apply(cursor)
+                last_change = None
+                if self.epoch is not None:
+                    now = time.time()
+                    cursor.executemany(
+                        'INSERT INTO cache_changes (kind, key, created) VALUES (?, ?, ?)',
+                        [(kind, key, now) for kind, key in changes]
+                    )
+                    last_change = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+                cursor.execute('COMMIT')
+            except BaseException:
+                cursor.execute('ROLLBACK')
+                raise
+            for kind, key in changes:
+                self.forget(kind, key)
+            if last_change is not None:
+                self.epoch.advance(last_change)
+            if time.monotonic() - self.culled_at > self.cull_interval:
+                self.cull()
+            return result
+
+    def sync(self):
+        """Replay other processes' changes against the L1; returns the epoch synced to"""
+        if self.epoch is None:
+            return 0
+        epoch = self.epoch.read()
+        if epoch == self.seen_epoch:
+            return epoch
+        changes = self.connection.execute(
+            'SELECT id, kind, key FROM cache_changes WHERE id > ? ORDER BY id',
+            (self.seen_change,)
+        ).fetchall()
+        if (changes and changes[0][0] != self.seen_change + 1) or (
+            not changes and epoch > self.seen_change
+        ):
+            # Part of the log was trimmed since the last sync
+            self.l1.clear()
+        else:
+            for _, kind, key in changes:
+                self.forget(kind, key)
+        if changes:
+            self.seen_change = changes[-1][0]
+        self.seen_epoch = epoch
+        return epoch
+
+    def forget(self, kind, key):
+        """Drop the L1 copies a change covers"""
+        if kind == CHANGE_KEY:
+            self.l1.pop(key, None)
+        elif kind == CHANGE_PATTERN:
+            for cached in [cached for cached in self.l1 if fnmatch.fnmatchcase(cached, key)]:
+                del self.l1[cached]
+        else:
+            self.l1.clear()
+
+    def cull(self):
+        """Delete expired entries, the soonest to expire beyond MAX_ENTRIES and old log rows"""
+        self.culled_at = time.monotonic()
+        now = time.time()
+        cursor = self.connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('DELETE FROM cache_entries WHERE expires <= ?', (now,))
+            count = cursor.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+            if count > self.max_entries:
+                if self.cull_frequency == 0:
+                    cursor.execute('DELETE FROM cache_entries')
+                else:
+                    cursor.execute(
+                        'DELETE FROM cache_entries WHERE key IN ('
+                        ' SELECT key FROM cache_entries'
+                        ' ORDER BY expires IS NULL, expires LIMIT ?)',
+                        (count // self.cull_frequency,)
+                    )
+            cursor.execute(
+                'DELETE FROM cache_changes WHERE created < ?',
+                (now - self.change_retention,)
+            )
+            cursor.execute('COMMIT')
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(location, options, max_entries, cull_frequency):
+    """Return this process's store of ``location``"""
+    store = _stores.get(location)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(location)
+            if store is None:
+                store = _stores[location] = CacheStore(
+                    location, options, max_entries, cull_frequency
+                )
+    return store
+
+
+class SQLiteCache(BaseCache):
+    """
+    Cache shared by all processes on the host through one SQLite file,
+    with no service to run.
+
+    Reads are served from an in-process L1 copy of recent entries when
+    possible. Every write is logged in the file and advances a shared
+    epoch, so other processes drop their stale copies before their next
+    read. ``incr`` is a single atomic UPDATE, entries expire by TTL and
+    ``delete_pattern`` removes keys by glob, e.g. every key of a prefix.
+    A LOCATION of ':memory:' keeps the cache private to the process.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._store = get_store(
+            location or MEMORY, params.get('OPTIONS', {}),
+            self._max_entries, self._cull_frequency
+        )
+
+    def _read(self, keys):
+        return self._store.read(keys)
+
+    def _write(self, keys, apply):
+        return self._store.write([(CHANGE_KEY, key) for key in keys], apply)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+
+        def apply(cursor):
+            cursor.execute(
+                'INSERT INTO cache_entries (key, value, expires) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+                'WHERE cache_entries.expires <= ?',
+                (key, encode(value), expires, time.time())
+            )
+            return cursor.rowcount == 1
+        return self._write([key], apply)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        found = self._read([key])
+        return decode(found[key]) if key in found else default
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        found = self._read(list(keys))
+        return {keys[key]: decode(value) for key, value in found.items()}
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return key in self._read([key])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self.make_and_validate_key(key, version=version), encode(value), expires)
+            for key, value in data.items()
+        ]
+
+        def apply(cursor):
+            cursor.executemany(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)',
+                rows
+            )
+        self._write([key for key, _, _ in rows], apply)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+
+        def apply(cursor):
+            cursor.execute(
+                f'UPDATE cache_entries SET expires = ? WHERE key = ? AND {LIVE}',
+                (expires, key, time.time())
+            )
+            return cursor.rowcount == 1
+        return self._write([key], apply)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+
+        def apply(cursor):
+            now = time.time()
+            row = cursor.execute(
+                f'UPDATE cache_entries SET value = value + ? '
+                f"WHERE key = ? AND typeof(value) = 'integer' AND {LIVE} RETURNING value",
+                (delta, key, now)
+            ).fetchone()
+            if row is not None:
+                return row[0]
+            # Not stored as an integer, e.g. a float
+            row = cursor.execute(
+                f'SELECT value FROM cache_entries WHERE key = ? AND {LIVE}', (key, now)
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = decode(row[0]) + delta
+            cursor.execute(
+                'UPDATE cache_entries SET value = ? WHERE key = ?', (encode(value), key)
+            )
+            return value
+        return self._write([key], apply)
+
+    def delete(self, key, version=None):
+        return bool(self.delete_many([key], version))
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+
+        def apply(cursor):
+            cursor.executemany('DELETE FROM cache_entries WHERE key = ?', [(key,) for key in keys])
+            return cursor.rowcount
+        return self._write(keys, apply)
+
+    def delete_pattern(self, pattern, version=None):
+        """
+        Delete the keys matching the glob ``pattern``; returns how many.
+
+        A pattern starting with literal text, such as ``department_*``,
+        is resolved with the key index.
+        """
+        pattern = self.make_key(pattern, version=version)
+
+        def apply(cursor):
+            cursor.execute('DELETE FROM cache_entries WHERE key GLOB ?', (pattern,))
+            return cursor.rowcount
+        return self._store.write([(CHANGE_PATTERN, pattern)], apply)
+
+    def clear(self):
+        def apply(cursor):
+            cursor.execute('DELETE FROM cache_entries')
+        self._store.write([(CHANGE_CLEAR, '')], apply)
@@ -0,0 +1,164 @@
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+
+from .constants import CACHE_TIMEOUT
+
+# Cache key prefix of tag versions
+TAG_VERSION_PREFIX = 'cache_tag:'
+
+# Tag every versioned entry depends on, to drop them all at once
+GLOBAL_TAG = 'global'
+
+
+def model_tag(model):
+    """Tag of every instance of ``model`` (a class or an instance)"""
+    return model._meta.label_lower
+
+
+def instance_tag(model, pk=None):
+    """Tag of one instance: pass it, or its model and pk"""
+    if pk is None:
+        pk = model.pk
+    return f'{model._meta.label_lower}:{pk}'
+
+
+def new_version():
+    return uuid.uuid4().hex
+
+
+class TaggedCache:
+    """
+    Cache entries that depend on tags, e.g. ``departments.department:5``
+    for one department or ``departments.department`` for all of them.
+
+    Every tag has a version, a random token kept in the cache. An entry is
+    stored under its key plus a digest of the versions of its tags, so
+    invalidating a tag (giving it a new version) makes every entry that
+    depends on it unreachable at once; the orphans simply expire. Nothing
+    has to be found or deleted, and it works on any cache backend.
+    """
+
+    @staticmethod
+    def versions(tags):
+        """Return ``{tag: version}``, giving tags seen for the first time one"""
+        keys = {TAG_VERSION_PREFIX + tag: tag for tag in set(tags)}
+        stored = cache.get_many(list(keys))
+        for key in keys.keys() - stored.keys():
+            version = new_version()
+            # Set meanwhile by another process: use theirs
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+            stored[key] = version
+        return {tag: stored[key] for key, tag in keys.items()}
+
+    @staticmethod
+    def versioned_keys(entries):
+        """Map ``{key: tags}`` to the key each entry is stored under now"""
+        versions = TaggedCache.versions(
+            tag for tags in entries.values() for tag in tags
+        )
+        versioned = {}
+        for key, tags in entries.items():
+            state = '|'.join(f'{tag}={versions[tag]}' for tag in sorted(set(tags)))
+            digest = hashlib.md5(state.encode(), usedforsecurity=False).hexdigest()[:16]
+            versioned[key] = f'{key}:{digest}'
+        return versioned
+
+    @staticmethod
+    def get(key, tags, default=None):
+        return cache.get(TaggedCache.versioned_keys({key: tags})[key], default)
+
+    @staticmethod
+    def set(key, value, tags, timeout=CACHE_TIMEOUT):
+        cache.set(TaggedCache.versioned_keys({key: tags})[key], value, timeout)
+
+    @staticmethod
+    def get_or_set(key, callback, tags, timeout=CACHE_TIMEOUT):
+        """Return the entry of ``key``, computed by ``callback`` when missing"""
+        versioned = TaggedCache.versioned_keys({key: tags})[key]
+        value = cache.get(versioned)
+        if value is None:
+            value = callback()
+            cache.set(versioned, value, timeout)
+        return value
+
+    @staticmethod
+    def invalidate(*tags):
+        """
+        Give ``tags`` new versions: now, so the current transaction reads
+        its own writes, and again once it commits, so entries other
+        processes computed from the data it replaced are dropped too
+        """
+        tags = set(tags)
+        if not tags:
+            return
+
+        def bump():
+            cache.set_many(
+                {TAG_VERSION_PREFIX + tag: new_version() for tag in tags}, timeout=None
+            )
+        if transaction.get_connection().in_atomic_block:
+            bump()
+        transaction.on_commit(bump)
+
+
+def track_model(model, parents=()):
+    """
+    Invalidate the tags of ``model`` instances when they are saved or
+    deleted, or their many-to-many links change.
+
+    ``parents`` names foreign keys whose targets' instance tags are
+    invalidated as well, both the old and the new one, e.g. a
+    department's when a profile moves in or out of it.
+    """
+    fields = [model._meta.get_field(name) for name in parents]
+    uid = f'cache_tags_{model._meta.label_lower}'
+
+    def parent_tags(instance):
+        tags = set()
+        loaded = getattr(instance, '_cache_parents', {})
+        for field in fields:
+            for pk in (loaded.get(field.attname), getattr(instance, field.attname)):
+                if pk is not None:
+                    tags.add(instance_tag(field.related_model, pk))
+        return tags
+
+    def remember_parents(sender, instance, **kwargs):
+        # Only fields actually loaded, so deferred ones stay deferred
+        instance._cache_parents = {
+            field.attname: instance.__dict__[field.attname]
+            for field in fields if field.attname in instance.__dict__
+        }
+
+    def saved(sender, instance, **kwargs):
+        TaggedCache.invalidate(
+            model_tag(model), instance_tag(instance), *parent_tags(instance)
+        )
+        remember_parents(sender, instance)
+
+    def deleted(sender, instance, **kwargs):
+        TaggedCache.invalidate(
+            model_tag(model), instance_tag(instance), *parent_tags(instance)
+        )
+
+    def links_changed(sender, instance, action, pk_set, **kwargs):
+        if action not in ('post_add', 'post_remove', 'post_clear'):
+            return
+        # ``model`` is the other side, either way round the change was made
+        related = kwargs['model']
+        tags = {model_tag(instance), instance_tag(instance), model_tag(related)}
+        tags.update(instance_tag(related, pk) for pk in pk_set or ())
+        TaggedCache.invalidate(*tags)
+
+    if fields:
+        post_init.connect(remember_parents, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(saved, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(deleted, sender=model, weak=False, dispatch_uid=uid)
+    for field in model._meta.many_to_many:
+        m2m_changed.connect(
+            links_changed, sender=field.remote_field.through, weak=False, dispatch_uid=uid
+        )
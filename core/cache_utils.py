@@ -1,47 +1,87 @@
 from django.core.cache import cache
+from django.db.models import Q
 from django.utils import timezone
-from apps.departments.models import Department
+
+from core.cache_tags import TaggedCache, instance_tag
+from core.counters import DEPARTMENT_ACTIVE_USERS, CounterService
+
+DEPARTMENT_TREE_TIMEOUT = 3600
+
+
+def department_tag(department_id):
+    from apps.departments.models import Department
+    return instance_tag(Department, department_id)
+
 
 def cache_department_tree(departments):
-    """Optimized department tree caching"""
-    department_tree = {}
-    # Prefetch related data to avoid N+1 queries
-    departments = departments.prefetch_related('sub_departments')
-    
-    for dept in departments:
-        cache_key = f'department_tree_{dept.id}'
-        if cache.get(cache_key):
-            continue  # Skip if already cached
-            
-        department_tree[dept.id] = {
+    """
+    Cache the tree node of each department not cached yet.
+
+    Accepts any iterable of departments. Children come from the closure
+    table and member counts from the maintained counters, one query each
+    whatever the number of departments. Entries depend on the tag of
+    their department, which is invalidated when it, a child or a member
+    changes.
+    """
+    departments = list(departments)
+    keys = TaggedCache.versioned_keys({
+        f'department_tree_{dept.pk}': [department_tag(dept.pk)] for dept in departments
+    })
+    cached = cache.get_many(list(keys.values()))
+    missing = [
+        dept for dept in departments
+        if keys[f'department_tree_{dept.pk}'] not in cached
+    ]
+    if not missing:
+        return {}
+
+    from apps.departments.models import DepartmentClosure
+
+    ids = [dept.pk for dept in missing]
+    children = {pk: [] for pk in ids}
+    for parent_id, child_id in DepartmentClosure.objects.filter(
+        ancestor_id__in=ids, depth=1
+    ).values_list('ancestor_id', 'descendant_id'):
+        children[parent_id].append(child_id)
+    # Counter keys are strings; list querysets carry the count already
+    unannotated = [dept.pk for dept in missing if not hasattr(dept, 'counted_members')]
+    members = CounterService.get_many(DEPARTMENT_ACTIVE_USERS, unannotated) if unannotated else {}
+
+    now = timezone.now().isoformat()
+    department_tree = {
+        dept.pk: {
             'name': dept.name,
             'parent': dept.parent_id,
-            'children': list(dept.sub_departments.values_list('id', flat=True)),
-            'member_count': dept.member_count,
-            'last_updated': timezone.now().isoformat()
+            'children': children[dept.pk],
+            'member_count': (
+                dept.counted_members if hasattr(dept, 'counted_members')
+                else members.get(str(dept.pk), 0)
+            ),
+            'last_updated': now,
         }
-        cache.set(cache_key, department_tree[dept.id], timeout=3600)
-    
-    return department_tree 
+        for dept in missing
+    }
+    cache.set_many(
+        {keys[f'department_tree_{pk}']: node for pk, node in department_tree.items()},
+        timeout=DEPARTMENT_TREE_TIMEOUT
+    )
+    return department_tree
+
 
 def invalidate_department_cache(department_id):
     """
-    Bug: Cache invalidation not cascading to related objects
-    Solution: Implement proper cache invalidation
+    Invalidate the tag of a department and those of the departments whose
+    tree node names it: its parent and its children, found with one
+    closure query.
+
+    Saves and deletes invalidate their own tags; this is for changes made
+    without signals, such as children losing a deleted parent.
     """
-    keys_to_delete = [
-        f'department_tree_{department_id}',
-        f'department_stats_{department_id}',
-        f'department_users_{department_id}',
-        f'department_assets_{department_id}'
-    ]
-    
-    # Get parent and child departments
-    department = Department.objects.get(id=department_id)
-    if department.parent:
-        keys_to_delete.append(f'department_tree_{department.parent.id}')
-    
-    for child in department.sub_departments.all():
-        keys_to_delete.append(f'department_tree_{child.id}')
-    
-    cache.delete_many(keys_to_delete) 
\ No newline at end of file
+    from apps.departments.models import DepartmentClosure
+
+    neighbours = DepartmentClosure.objects.filter(
+        Q(descendant_id=department_id) | Q(ancestor_id=department_id),
+        depth=1
+    ).values_list('ancestor_id', 'descendant_id')
+    department_ids = {department_id} | {pk for pair in neighbours for pk in pair}
+    TaggedCache.invalidate(*(department_tag(pk) for pk in department_ids))
@@ -0,0 +1,76 @@
+from django.core.exceptions import ValidationError
+
+
+class ClosureTable:
+    """
+    Maintains the closure table of a tree of nodes with a ``parent`` key.
+
+    ``model`` holds one row per ancestor and descendant pair, at the
+    ``depth`` between them, with every node linked to itself at depth 0.
+    The trees wrap one of these (see apps.categories.tree and
+    apps.departments.tree) and call it from the node's save and delete.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def insert(self, node):
+        """Link a new node to itself and to every ancestor of its parent"""
+        links = [self.model(ancestor_id=node.pk, descendant_id=node.pk, depth=0)]
+        if node.parent_id:
+            links.extend(
+                self.model(ancestor_id=ancestor_id, descendant_id=node.pk, depth=depth + 1)
+                for ancestor_id, depth in self.model.objects.filter(
+                    descendant_id=node.parent_id
+                ).values_list('ancestor_id', 'depth')
+            )
+        self.model.objects.bulk_create(links)
+
+    def move(self, node):
+        """
+        Re-link the subtree of ``node`` below its new parent and return
+        the ids of the nodes it now hangs from
+        """
+        subtree = list(self.model.objects.filter(
+            ancestor_id=node.pk
+        ).values_list('descendant_id', 'depth'))
+        subtree_ids = [pk for pk, _ in subtree]
+        if node.parent_id in subtree_ids:
+            raise ValidationError("Circular dependency detected")
+
+        self.detach(subtree_ids)
+        if not node.parent_id:
+            return []
+        ancestors = list(self.model.objects.filter(
+            descendant_id=node.parent_id
+        ).values_list('ancestor_id', 'depth'))
+        self.model.objects.bulk_create([
+            self.model(
+                ancestor_id=ancestor_id,
+                descendant_id=descendant_id,
+                depth=ancestor_depth + depth + 1
+            )
+            for ancestor_id, ancestor_depth in ancestors
+            for descendant_id, depth in subtree
+        ])
+        return [ancestor_id for ancestor_id, _ in ancestors]
+
+    def remove(self, node):
+        """Turn the children of a node being deleted into roots"""
+        below = list(self.model.objects.filter(
+            ancestor_id=node.pk, depth__gt=0
+        ).values_list('descendant_id', flat=True))
+        if below:
+            self.detach(below)
+
+    def ancestor_ids(self, node_id):
+        """Ids of the nodes above ``node_id``"""
+        return list(self.model.objects.filter(
+            descendant_id=node_id, depth__gt=0
+        ).values_list('ancestor_id', flat=True))
+
+    def detach(self, subtree_ids):
+        """Drop the links from nodes outside ``subtree_ids`` into it"""
+        self.model.objects.filter(
+            descendant_id__in=subtree_ids
+        ).exclude(ancestor_id__in=subtree_ids).delete()
@@ -0,0 +1,166 @@
+import hashlib
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .cache_tags import TaggedCache, instance_tag, model_tag
+
+
+class ConditionalRequestMixin:
+    """
+    HTTP conditional requests for model viewsets.
+
+    ``list`` and ``retrieve`` send an ETag and answer a matching
+    ``If-None-Match`` with 304 Not Modified before anything is loaded or
+    serialized. ``update``, ``partial_update`` and ``destroy`` honour
+    ``If-Match`` and ``If-Unmodified-Since``, answering 412 Precondition
+    Failed when the object changed since the client read it.
+
+    A detail ETag digests the object's ``updated_at`` and ``version``, a
+    list ETag the count and latest ``updated_at`` of the filtered
+    queryset; each costs one query. Both also digest the versions of the
+    cache tags (see core.cache_tags) of the object, of the targets of
+    ``etag_parents`` and of every model in ``etag_models``, since
+    counters and embedded objects change representations without
+    touching ``updated_at``. For the same reason ``If-Modified-Since`` is
+    not used on reads: ``Last-Modified`` only guards writes.
+
+    A list ETag covers the targets of ``etag_parents`` whose model is not
+    in ``etag_models`` by their instance tags, read with one more query,
+    so changes to unrelated rows of such models leave it alone.
+    """
+    # Models whose changes show up in the representations of this view
+    etag_models = ()
+    # Foreign keys whose targets are embedded in the representations
+    etag_parents = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.list_etag(), None, super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        state = self.object_state()
+        if state is None:
+            # Not found: let get_object answer 404
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(*state, super().retrieve, request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        response = self.check_preconditions(request)
+        if response is not None:
+            return response
+        response = super().update(request, *args, **kwargs)
+        state = self.object_state() if response.status_code == 200 else None
+        if state is not None:
+            self.set_validators(response, *state)
+        return response
+
+    def destroy(self, request, *args, **kwargs):
+        response = self.check_preconditions(request)
+        if response is not None:
+            return response
+        return super().destroy(request, *args, **kwargs)
+
+    def conditional_response(self, etag, last_modified, handler, request, *args, **kwargs):
+        """Answer 304 (or 412) when the request's conditions allow, else call ``handler``"""
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        self.set_validators(response, etag, last_modified)
+        return response
+
+    def check_preconditions(self, request):
+        """Return a 412 response when a write's preconditions fail, else None"""
+        conditions = {'HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_UNMODIFIED_SINCE'}
+        if not conditions & request.META.keys():
+            return None
+        state = self.object_state()
+        if state is None:
+            return None
+        etag, last_modified = state
+        return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    @staticmethod
+    def set_validators(response, etag, last_modified=None):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+
+    def object_state(self):
+        """
+        Return ``(etag, last_modified)`` of the object the URL names, read
+        with the lookup and filters of get_object, or None if there is none
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        model = queryset.model
+        parents = [model._meta.get_field(name) for name in self.etag_parents]
+        fields = ['pk', 'updated_at', *(field.attname for field in parents)]
+        try:
+            model._meta.get_field('version')
+            fields.append('version')
+        except FieldDoesNotExist:
+            pass
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            row = queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            ).values(*fields).first()
+        except (TypeError, ValueError, ValidationError):
+            return None
+        if row is None:
+            return None
+
+        tags = [instance_tag(model, row['pk']), *map(model_tag, self.etag_models)]
+        tags.extend(
+            instance_tag(field.related_model, row[field.attname])
+            for field in parents if row[field.attname] is not None
+        )
+        state = [row['pk'], row['updated_at'], row.get('version')]
+        return self.make_etag(state, tags), int(row['updated_at'].timestamp())
+
+    def list_etag(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        summary = queryset.order_by().aggregate(
+            count=Count('pk'), last_modified=Max('updated_at')
+        )
+        tags = [model_tag(queryset.model), *map(model_tag, self.etag_models)]
+        tags.extend(self.parent_tags(queryset))
+        return self.make_etag([summary['count'], summary['last_modified']], tags)
+
+    def parent_tags(self, queryset):
+        """Instance tags of the ``etag_parents`` targets of ``queryset`` not tagged model-wide"""
+        fields = [
+            field for field in map(queryset.model._meta.get_field, self.etag_parents)
+            if field.related_model not in self.etag_models
+        ]
+        if not fields:
+            return []
+        rows = queryset.order_by().values_list(
+            *(field.attname for field in fields)
+        ).distinct()
+        return {
+            instance_tag(field.related_model, pk)
+            for row in rows
+            for field, pk in zip(fields, row) if pk is not None
+        }
+
+    def make_etag(self, state, tags):
+        """Strong ETag of ``state`` and ``tags`` as this request would render them"""
+        request = self.request
+        versions = TaggedCache.versions(tags)
+        renderer = getattr(request, 'accepted_renderer', None)
+        parts = [
+            request.get_full_path(),
+            getattr(renderer, 'format', None),
+            request.user.pk,
+            *state,
+            *(f'{tag}={versions[tag]}' for tag in sorted(versions)),
+        ]
+        digest = hashlib.md5('|'.join(map(str, parts)).encode(), usedforsecurity=False)
+        return f'"{digest.hexdigest()}"'
@@ -35,6 +35,7 @@ CACHE_KEY_PREFIX = 'sph_asset_'
 # Pagination Settings
 DEFAULT_PAGE_SIZE = 10
 MAX_PAGE_SIZE = 100
+KEYSET_COUNT_TIMEOUT = 60  # seconds a keyset page's total count is reused
 
 # File Upload Settings
 ALLOWED_FILE_TYPES = ['image/jpeg', 'image/png', 'application/pdf']
@@ -80,6 +81,24 @@ REQUEST_PRIORITY_CHOICES = [
     (REQUEST_PRIORITY_URGENT, 'Urgent'),
 ]
 
+BULK_DECISION_MAX_REQUESTS = 1000  # request ids accepted by one bulk decision
+BULK_DECISION_CHUNK_SIZE = 250  # requests decided per transaction
+
+# Background Job Status Constants
+JOB_STATUS_QUEUED = 'QUEUED'
+JOB_STATUS_RUNNING = 'RUNNING'
+JOB_STATUS_COMPLETED = 'COMPLETED'
+JOB_STATUS_FAILED = 'FAILED'
+JOB_STATUS_CANCELLED = 'CANCELLED'
+
+JOB_STATUS_CHOICES = [
+    (JOB_STATUS_QUEUED, 'Queued'),
+    (JOB_STATUS_RUNNING, 'Running'),
+    (JOB_STATUS_COMPLETED, 'Completed'),
+    (JOB_STATUS_FAILED, 'Failed'),
+    (JOB_STATUS_CANCELLED, 'Cancelled'),
+]
+
 # Error Messages
 ERROR_MESSAGES = {
     'INVALID_CREDENTIALS': 'Invalid credentials provided.',
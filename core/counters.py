@@ -0,0 +1,151 @@
+import logging
+
+from django.apps import apps as django_apps
+from django.db import IntegrityError, transaction
+from django.db.models import CharField, F, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce
+
+from .models import Counter
+
+logger = logging.getLogger(__name__)
+
+# Counter names
+TAG_ASSETS = 'tag_assets'
+CATEGORY_ASSETS = 'category_assets'
+DEPARTMENT_ASSETS = 'department_assets'
+DEPARTMENT_USERS = 'department_users'
+DEPARTMENT_ACTIVE_USERS = 'department_active_users'
+ASSET_STATUS = 'asset_status'
+# Assets in a category and every category below it, and their value in cents
+CATEGORY_SUBTREE_ASSETS = 'category_subtree_assets'
+CATEGORY_SUBTREE_VALUE = 'category_subtree_value'
+
+# Counter name -> callable returning the true {key: count} mapping
+_registry = {}
+
+
+def register_counter(name, compute):
+    """
+    Register how to recount ``name`` from scratch.
+
+    ``compute`` takes an app registry to get models from and returns an
+    iterable of ``(key, count)`` pairs. It is used by the
+    ``reconcile_counters`` command to detect and repair drift, and by data
+    migrations, with their historical models, to backfill counters.
+    """
+    _registry[name] = compute
+
+
+def registered_counters():
+    return dict(_registry)
+
+
+class CounterService:
+    """
+    Service class for maintained counters
+    """
+
+    @staticmethod
+    def increment(name, key, delta=1):
+        """Add ``delta`` to a counter inside the caller's transaction"""
+        if not delta or key is None:
+            return
+        key = str(key)
+        updated = Counter.objects.filter(name=name, key=key).update(
+            value=F('value') + delta
+        )
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                Counter.objects.create(name=name, key=key, value=delta)
+        except IntegrityError:
+            # Created concurrently, apply the delta to that row instead
+            Counter.objects.filter(name=name, key=key).update(
+                value=F('value') + delta
+            )
+
+    @staticmethod
+    def apply(name, deltas):
+        """Apply a ``{key: delta}`` mapping"""
+        for key, delta in deltas.items():
+            CounterService.increment(name, key, delta)
+
+    @staticmethod
+    def get(name, key):
+        value = Counter.objects.filter(name=name, key=str(key)).values_list(
+            'value', flat=True
+        ).first()
+        return value or 0
+
+    @staticmethod
+    def get_many(name, keys=None):
+        """Return ``{key: value}`` for the given keys (all keys if None)"""
+        counters = Counter.objects.filter(name=name)
+        if keys is not None:
+            counters = counters.filter(key__in=[str(key) for key in keys])
+        return dict(counters.values_list('key', 'value'))
+
+    @staticmethod
+    def get_for(key, names):
+        """Return ``{name: value}`` of several counters sharing a key"""
+        values = dict(Counter.objects.filter(
+            name__in=names, key=str(key)
+        ).values_list('name', 'value'))
+        return {name: values.get(name, 0) for name in names}
+
+    @staticmethod
+    def subquery(name, outer_ref='pk'):
+        """Expression reading a counter keyed by ``outer_ref``, for annotate()"""
+        return Coalesce(
+            Subquery(
+                Counter.objects.filter(
+                    name=name,
+                    key=Cast(OuterRef(outer_ref), CharField())
+                ).values('value')[:1]
+            ),
+            Value(0)
+        )
+
+    @staticmethod
+    def discard(name, key):
+        """Forget a counter, e.g. when the counted-by object is deleted"""
+        Counter.objects.filter(name=name, key=str(key)).delete()
+
+    @staticmethod
+    def reconcile(name, repair=True, apps=None):
+        """
+        Compare a counter with a recount and optionally repair it.
+
+        Models come from ``apps``, so data migrations can pass their
+        historical registry. Returns ``{key: (stored, actual)}`` for every
+        key that drifted.
+        """
+        apps = apps or django_apps
+        Counter = apps.get_model('core', 'Counter')
+        compute = _registry[name]
+        with transaction.atomic():
+            actual = {
+                str(key): count for key, count in compute(apps)
+                if key is not None and count
+            }
+            stored = dict(
+                Counter.objects.filter(name=name).values_list('key', 'value')
+            )
+            drift = {
+                key: (stored.get(key, 0), actual.get(key, 0))
+                for key in set(stored) | set(actual)
+                if stored.get(key, 0) != actual.get(key, 0)
+            }
+            if repair and drift:
+                for key, (_, value) in drift.items():
+                    if value:
+                        Counter.objects.update_or_create(
+                            name=name, key=key, defaults={'value': value}
+                        )
+                    else:
+                        Counter.objects.filter(name=name, key=key).delete()
+                logger.warning(
+                    "Repaired %s drifted %s counters", len(drift), name
+                )
+        return drift
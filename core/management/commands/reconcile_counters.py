@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.counters import CounterService, registered_counters
+
+
+class Command(BaseCommand):
+    help = 'Recount maintained counters and repair any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'counters',
+            nargs='*',
+            help='Counter names to check (default: all registered counters)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report drift, do not repair it'
+        )
+
+    def handle(self, *args, **options):
+        available = registered_counters()
+        names = options['counters'] or sorted(available)
+        unknown = set(names) - set(available)
+        if unknown:
+            raise CommandError(f"Unknown counters: {', '.join(sorted(unknown))}")
+
+        drifted = 0
+        for name in names:
+            drift = CounterService.reconcile(name, repair=not options['dry_run'])
+            if not drift:
+                self.stdout.write(f'{name}: OK')
+                continue
+            drifted += len(drift)
+            self.stdout.write(self.style.WARNING(f'{name}: {len(drift)} drifted'))
+            for key, (stored, actual) in sorted(drift.items()):
+                self.stdout.write(f'  {key}: stored {stored}, actual {actual}')
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('All counters are consistent'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{drifted} counters drifted'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Repaired {drifted} counters'))
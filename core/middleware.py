@@ -1,7 +1,6 @@
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
-from apps.users.models import UserActivityLog
-from django.urls import resolve
+from .activity import get_activity_buffer
 import json
 
 class RequestValidationMiddleware:
@@ -22,16 +21,22 @@ class RequestValidationMiddleware:
         return response 
 
 class UserActivityMiddleware(MiddlewareMixin):
-    def process_request(self, request):
+    """
+    Record authenticated API activity.
+
+    Records are handed to the in-process activity buffer and written in
+    batches by its flusher thread, so no INSERT happens on the request path.
+    """
+    def process_view(self, request, view_func, view_args, view_kwargs):
         # Skip logging for admin, static and media urls
         path = request.path_info.lstrip('/')
         if path.startswith(('admin/', 'static/', 'media/')):
             return None
-            
+
         if hasattr(request, 'user') and request.user.is_authenticated:
             try:
-                # Get the resolved URL name
-                resolver_match = resolve(request.path)
+                # URL resolution already happened, reuse its result
+                resolver_match = request.resolver_match
                 action = f"{resolver_match.url_name}_{request.method.lower()}"
                 
                 # Prepare request data for logging
@@ -46,14 +51,13 @@ class UserActivityMiddleware(MiddlewareMixin):
                     safe_data = self.sanitize_request_data(request.POST)
                     request_data['body'] = safe_data
                 
-                # Create activity log
-                UserActivityLog.objects.create(
-                    user=request.user,
+                # Queue activity log, written by the background flusher
+                get_activity_buffer().enqueue(
+                    user_id=request.user.pk,
                     action=action,
                     ip_address=self.get_client_ip(request),
                     user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                    action_details=request_data,
-                    status='ACTIVE'
+                    action_details=request_data
                 )
             except Exception as e:
                 # Log the error but don't block the request
@@ -0,0 +1,46 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    """
+    Count what the counters maintained since the Counter table was added
+    cover, as the tables stand at this migration
+    """
+    Asset = apps.get_model('assets', 'Asset')
+    UserProfile = apps.get_model('users', 'UserProfile')
+    Counter = apps.get_model('core', 'Counter')
+    assets = Asset.objects.order_by()
+    profiles = UserProfile.objects.order_by()
+
+    recounts = {
+        'tag_assets': Asset.tags.through.objects.order_by().values_list('tag_id'),
+        'category_assets': assets.values_list('category_id'),
+        'department_assets': assets.values_list('department_id'),
+        'asset_status': assets.values_list('asset_status'),
+        'department_users': profiles.values_list('department_id'),
+        'department_active_users': profiles.filter(is_active=True).values_list(
+            'department_id'
+        ),
+    }
+    Counter.objects.filter(name__in=list(recounts)).delete()
+    Counter.objects.bulk_create([
+        Counter(name=name, key=str(key), value=count)
+        for name, rows in recounts.items()
+        for key, count in rows.annotate(Count('pk'))
+        if key is not None and count
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_idsequence'),
+        ('assets', '0004_asset_assets_asse_updated_16bcc3_idx_and_more'),
+        ('tags', '0001_initial'),
+        ('users', '0005_useractivitylog_users_usera_timesta_aabea0_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -74,3 +74,35 @@ class AuditableModel(TrackableModel):
 
     class Meta:
         abstract = True
+
+class Counter(models.Model):
+    """
+    Maintained row count, e.g. number of assets per tag.
+
+    Kept up to date by signal handlers (see core.counters), so reads are a
+    single indexed lookup instead of a COUNT over the counted table.
+    """
+    name = models.CharField(max_length=50)
+    key = models.CharField(max_length=64)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['name', 'key']
+
+    def __str__(self):
+        return f"{self.name}[{self.key}] = {self.value}"
+
+
+class IdSequence(models.Model):
+    """
+    Next unreserved number of an ID prefix.
+
+    Reserved in blocks by core.sequences.IdAllocator, which turns the
+    numbers into IDs such as AST00004F.
+    """
+    prefix = models.CharField(max_length=10, unique=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.prefix}: {self.next_value}"
@@ -46,12 +46,16 @@ class AuthenticationMonitor:
     @staticmethod
     def log_auth_metrics():
         """Enhanced authentication monitoring"""
+        stored = cache.get_many([
+            'active_sessions', 'failed_attempts', 'auth_response_time',
+            'token_refresh_count', 'concurrent_users'
+        ])
         metrics = {
-            'active_sessions': cache.get('active_sessions', 0),
-            'failed_attempts': cache.get('failed_attempts', 0),
-            'avg_response_time': cache.get('auth_response_time', 0),
-            'token_refresh_count': cache.get('token_refresh_count', 0),
-            'concurrent_users': cache.get('concurrent_users', 0)
+            'active_sessions': stored.get('active_sessions', 0),
+            'failed_attempts': stored.get('failed_attempts', 0),
+            'avg_response_time': stored.get('auth_response_time', 0),
+            'token_refresh_count': stored.get('token_refresh_count', 0),
+            'concurrent_users': stored.get('concurrent_users', 0)
         }
         
         # Alert on high failure rates
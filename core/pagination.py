@@ -0,0 +1,234 @@
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .constants import KEYSET_COUNT_TIMEOUT, MAX_PAGE_SIZE
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination for large, append-mostly lists.
+
+    Pages are selected with ``WHERE (key) < (last key seen)`` on the
+    ordering instead of ``OFFSET``, so the 1000th page of a list costs the
+    same as the first. The position is handed to the client as an opaque
+    ``cursor`` query parameter.
+
+    The ordering defaults to the model's ``Meta.ordering`` followed by the
+    primary key as a tie-breaker; ordering fields must be non-null and
+    should be indexed. Responses keep the ``count`` of page-number
+    responses, cached for ``KEYSET_COUNT_TIMEOUT`` seconds so paging
+    through a list counts it once; clients that do not need it send
+    ``?count=false`` and no ``COUNT(*)`` is issued at all.
+
+    Endpoints opt in by setting ``pagination_class``. Requests carrying
+    one of ``page_number_params`` (``?page=`` by default) are served by
+    ``fallback_class`` so existing page-number clients keep working.
+    """
+    ordering = None
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_timeout = KEYSET_COUNT_TIMEOUT
+    page_number_params = ('page',)
+    fallback_class = PageNumberPagination
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.fallback = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if any(param in request.query_params for param in self.page_number_params):
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        self.keys = self.get_ordering(queryset)
+        page_size = self.get_page_size(request)
+
+        self.count = None
+        if self.wants_count(request):
+            self.count = self.approximate_count(queryset)
+
+        values, reverse = self.decode_cursor(request)
+        ordering = self.keys
+        if reverse:
+            ordering = [self.flip(field) for field in ordering]
+        if values is not None:
+            queryset = queryset.filter(self.seek(ordering, values))
+
+        results = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        # Coming from a cursor means there is a page on the side we came from
+        self.has_next = has_more if not reverse else True
+        self.has_previous = has_more if reverse else values is not None
+        self.first = results[0] if results else None
+        self.last = results[-1] if results else None
+        return results
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_ordering(self, queryset):
+        ordering = list(self.ordering or queryset.model._meta.ordering or [])
+        names = [field.lstrip('-') for field in ordering]
+        if 'pk' not in names and queryset.model._meta.pk.name not in names:
+            descending = bool(ordering) and ordering[0].startswith('-')
+            ordering.append('-pk' if descending else 'pk')
+        return ordering
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def wants_count(self, request):
+        value = request.query_params.get(self.count_query_param, '')
+        return value.lower() not in ('0', 'false', 'no')
+
+    def approximate_count(self, queryset):
+        """Count of the whole list, reused for ``count_timeout`` seconds"""
+        sql, params = queryset.order_by().query.sql_with_params()
+        digest = hashlib.md5(f'{sql}{params}'.encode()).hexdigest()
+        key = f'keyset_count_{queryset.model._meta.label_lower}_{digest}'
+        count = cache.get(key)
+        if count is None:
+            count = queryset.order_by().count()
+            cache.set(key, count, self.count_timeout)
+        return count
+
+    @staticmethod
+    def flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def seek(ordering, values):
+        """Rows strictly after ``values`` in ``ordering``"""
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def key_for(self, instance):
+        return [getattr(instance, field.lstrip('-')) for field in self.keys]
+
+    def key_field(self, field):
+        name = field.lstrip('-')
+        if name == 'pk':
+            return self.model._meta.pk
+        return self.model._meta.get_field(name)
+
+    def encode_cursor(self, values, reverse=False):
+        # str() keeps full precision; DjangoJSONEncoder would drop the
+        # microseconds and make rows sharing a millisecond skip or repeat
+        payload = json.dumps([values, reverse], default=str)
+        token = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        """Return ``(values, reverse)``, or ``(None, False)`` without a cursor"""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            values, reverse = json.loads(base64.urlsafe_b64decode(padded))
+            if len(values) != len(self.keys):
+                raise ValueError(token)
+            values = [
+                self.key_field(field).to_python(value)
+                for field, value in zip(self.keys, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(reverse)
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.key_for(self.last))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.key_for(self.first), reverse=True)
+
+    def get_schema_fields(self, view):
+        if self.fallback is not None:
+            return self.fallback.get_schema_fields(view)
+        return super().get_schema_fields(view)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': force_str('The pagination cursor value.'),
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': force_str('Number of results to return per page.'),
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': force_str(
+                    'Include the total count, reused for a short while '
+                    '(default). Send false to leave it out.'
+                ),
+                'schema': {'type': 'boolean'},
+            },
+        ]
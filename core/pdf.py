@@ -0,0 +1,356 @@
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.template import Context, Template
+
+logger = logging.getLogger(__name__)
+
+PDF_RENDERING_DEFAULTS = {
+    'WORKERS': None,
+    'TIMEOUT': 120,
+    'MEMORY_LIMIT': 1024 * 1024 * 1024,
+    'MAX_RENDERS_PER_WORKER': 100,
+    'STYLESHEETS': [],
+    'BASE_URL': None,
+    'TEMPLATE_CACHE_ENTRIES': 32,
+}
+
+
+class PDFRenderError(Exception):
+    """A render failed inside a worker"""
+
+
+class PDFRenderTimeout(PDFRenderError):
+    """A render exceeded its time limit"""
+
+
+# Per-render alarms need SIGALRM, which Windows lacks
+HAS_ALARM = hasattr(signal, 'setitimer')
+
+# Seconds the caller waits past the time limit of a started render before
+# giving up on its worker, e.g. one stuck in native code where the alarm
+# cannot reach it
+TIMEOUT_GRACE = 10
+
+# Worker process state, set up once by _init_worker
+_font_config = None
+_stylesheets = []
+_timeout = None
+_started = None
+
+
+def _on_alarm(signum, frame):
+    raise PDFRenderTimeout(f"PDF render exceeded {_timeout}s")
+
+
+def _init_worker(stylesheets, memory_limit, timeout, started):
+    """
+    Load WeasyPrint, fonts and stylesheets once per worker process
+    """
+    global _font_config, _stylesheets, _timeout, _started
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+
+    if memory_limit:
+        try:
+            import resource
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+        except (ImportError, ValueError, OSError):
+            logger.warning("PDF worker memory limit not supported here")
+
+    _timeout = timeout
+    _started = started
+    if timeout and HAS_ALARM:
+        signal.signal(signal.SIGALRM, _on_alarm)
+
+    _font_config = FontConfiguration()
+    _stylesheets = [
+        CSS(filename=path, font_config=_font_config) for path in stylesheets
+    ]
+
+
+def _render(html, base_url, submitted_at, job):
+    """Worker side of a render: returns ``(pdf_bytes, timings)``"""
+    from weasyprint import HTML
+
+    started = time.time()
+    # Tells the caller its time limit starts now
+    _started.put(job)
+    timer = bool(_timeout and HAS_ALARM)
+    if timer:
+        signal.setitimer(signal.ITIMER_REAL, _timeout)
+    try:
+        document = HTML(string=html, base_url=base_url)
+        parsed = time.time()
+        rendered = document.render(
+            stylesheets=_stylesheets, font_config=_font_config
+        )
+        laid_out = time.time()
+        pdf = rendered.write_pdf()
+        written = time.time()
+    except MemoryError:
+        raise PDFRenderError("PDF render exceeded the worker memory limit")
+    finally:
+        if timer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    return pdf, {
+        'queued': started - submitted_at,
+        'parse': parsed - started,
+        'layout': laid_out - parsed,
+        'write': written - laid_out,
+        'pages': len(rendered.pages),
+        'pid': os.getpid(),
+    }
+
+
+class PDFRenderPool:
+    """
+    Pool of warm WeasyPrint worker processes.
+
+    Each worker parses the configured stylesheets and loads their fonts
+    once, then renders HTML sent to it over the executor's queue, so
+    throughput scales with cores and no render pays the start-up cost.
+    Renders are limited in wall time (``TIMEOUT``) and address space
+    (``MEMORY_LIMIT``), and workers are replaced every
+    ``MAX_RENDERS_PER_WORKER`` renders to bound memory growth.
+
+    WeasyPrint is only imported in the workers.
+    """
+
+    def __init__(self, workers=None, timeout=120, memory_limit=None,
+                 max_renders_per_worker=None, stylesheets=(), base_url=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.max_renders_per_worker = max_renders_per_worker
+        self.stylesheets = list(stylesheets)
+        self.base_url = base_url
+        self._executor = None
+        self._started = None
+        self._jobs = itertools.count()
+        # Events of jobs in flight, set once a worker starts them
+        self._begun = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'renders': 0,
+            'failures': 0,
+            'timeouts': 0,
+            'seconds': 0.0,
+            'max_seconds': 0.0,
+        }
+
+    @classmethod
+    def from_settings(cls):
+        """Build a pool from the ``PDF_RENDERING`` setting"""
+        options = {
+            **PDF_RENDERING_DEFAULTS,
+            **getattr(settings, 'PDF_RENDERING', {}),
+        }
+        return cls(
+            workers=options['WORKERS'],
+            timeout=options['TIMEOUT'],
+            memory_limit=options['MEMORY_LIMIT'],
+            max_renders_per_worker=options['MAX_RENDERS_PER_WORKER'],
+            stylesheets=options['STYLESHEETS'],
+            base_url=options['BASE_URL'] or settings.MEDIA_ROOT,
+        )
+
+    def render(self, html, base_url=None):
+        """
+        Render an HTML string; returns ``(pdf_bytes, timings)``
+
+        ``timings`` holds the seconds spent queued, parsing, laying out
+        and writing, plus ``total`` as seen by the caller.
+        """
+        submitted_at = time.time()
+        executor = self._get_executor()
+        job = next(self._jobs)
+        begun = threading.Event()
+        with self._lock:
+            self._begun[job] = begun
+        try:
+            future = executor.submit(
+                _render, html, base_url or self.base_url, submitted_at, job
+            )
+            future.add_done_callback(lambda future: begun.set())
+            pdf, timings = self._result(future, begun)
+        except PDFRenderTimeout:
+            self._record(time.time() - submitted_at, timeout=True)
+            raise
+        except FutureTimeout:
+            # Started but never finished: the worker is stuck with it
+            self._record(time.time() - submitted_at, timeout=True)
+            self._reset(executor)
+            raise PDFRenderTimeout(f"PDF render exceeded {self.timeout}s")
+        except BrokenProcessPool:
+            self._record(time.time() - submitted_at, failed=True)
+            self._reset(executor)
+            raise PDFRenderError("PDF worker died during the render")
+        except Exception:
+            self._record(time.time() - submitted_at, failed=True)
+            raise
+        finally:
+            with self._lock:
+                self._begun.pop(job, None)
+
+        timings['total'] = time.time() - submitted_at
+        self._record(timings['total'])
+        logger.info(
+            "Rendered %s page PDF in %.2fs (queued %.2fs, parse %.2fs, "
+            "layout %.2fs, write %.2fs)",
+            timings['pages'], timings['total'], timings['queued'],
+            timings['parse'], timings['layout'], timings['write']
+        )
+        return pdf, timings
+
+    def _result(self, future, begun):
+        """
+        Wait for a render to finish. Workers enforce the time limit
+        themselves where they can; the caller only gives up once a render
+        has been running for longer, so time spent queued behind other
+        renders never counts against it.
+        """
+        if not self.timeout:
+            return future.result()
+        begun.wait()
+        return future.result(timeout=self.timeout + TIMEOUT_GRACE)
+
+    def _job_started(self, job):
+        with self._lock:
+            begun = self._begun.get(job)
+        if begun is not None:
+            begun.set()
+
+    def _watch_starts(self, started):
+        """Relay the start notices of the workers until told to stop"""
+        while True:
+            job = started.get()
+            if job is None:
+                return
+            self._job_started(job)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['workers'] = self.workers
+        stats['mean_seconds'] = (
+            stats['seconds'] / stats['renders'] if stats['renders'] else 0.0
+        )
+        return stats
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            started, self._started = self._started, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if started is not None:
+            started.put(None)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Spawned, not forked: the parent may be running threads
+                context = multiprocessing.get_context('spawn')
+                self._started = context.SimpleQueue()
+                self._executor = ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(
+                        self.stylesheets, self.memory_limit, self.timeout, self._started
+                    ),
+                    max_tasks_per_child=self.max_renders_per_worker,
+                )
+                threading.Thread(
+                    target=self._watch_starts,
+                    args=(self._started,),
+                    name='pdf-render-starts',
+                    daemon=True,
+                ).start()
+            return self._executor
+
+    def _reset(self, executor):
+        started = None
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                started, self._started = self._started, None
+        executor.shutdown(wait=False, cancel_futures=True)
+        if started is not None:
+            started.put(None)
+        for process in list(getattr(executor, '_processes', {}).values()):
+            process.terminate()
+
+    def _record(self, seconds, failed=False, timeout=False):
+        with self._lock:
+            if timeout:
+                self._stats['timeouts'] += 1
+            elif failed:
+                self._stats['failures'] += 1
+            else:
+                self._stats['renders'] += 1
+                self._stats['seconds'] += seconds
+                self._stats['max_seconds'] = max(self._stats['max_seconds'], seconds)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pdf_pool():
+    """Return the process-wide PDF rendering pool"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PDFRenderPool.from_settings()
+    return _pool
+
+
+_templates = OrderedDict()
+_templates_lock = threading.Lock()
+
+
+def compile_template(source):
+    """
+    Return a compiled Django Template for ``source``
+
+    Report templates are uploaded files rather than loader templates, so
+    they are kept compiled here, keyed by content.
+    """
+    key = hashlib.sha1(source.encode()).hexdigest()
+    with _templates_lock:
+        template = _templates.get(key)
+        if template is not None:
+            _templates.move_to_end(key)
+            return template
+
+    template = Template(source)
+    limit = getattr(settings, 'PDF_RENDERING', {}).get(
+        'TEMPLATE_CACHE_ENTRIES', PDF_RENDERING_DEFAULTS['TEMPLATE_CACHE_ENTRIES']
+    )
+    with _templates_lock:
+        _templates[key] = template
+        while len(_templates) > limit:
+            _templates.popitem(last=False)
+    return template
+
+
+def render_template_file(template_file, context):
+    """Render an uploaded template file to an HTML string"""
+    with template_file.open('rb') as f:
+        source = f.read().decode('utf-8')
+    return compile_template(source).render(Context(context))
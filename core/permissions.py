@@ -1,5 +1,5 @@
 from rest_framework import permissions
-from core.constants import ROLE_ADMIN, ROLE_MANAGER
+from core.principal import get_principal
 
 print("Loading core permissions")
 
@@ -8,9 +8,7 @@ class IsAdmin(permissions.BasePermission):
     Permission check for admin users
     """
     def has_permission(self, request, view):
-        return bool(request.user and 
-                   request.user.is_authenticated and 
-                   request.user.profile.role == ROLE_ADMIN)
+        return get_principal(request).is_admin
 
 # Alias for backwards compatibility
 IsAdminUser = IsAdmin
@@ -20,9 +18,7 @@ class IsManager(permissions.BasePermission):
     Permission check for manager users
     """
     def has_permission(self, request, view):
-        return bool(request.user and 
-                   request.user.is_authenticated and 
-                   request.user.profile.role == ROLE_MANAGER)
+        return get_principal(request).is_manager
 
 # Alias for backwards compatibility
 IsManagerUser = IsManager
@@ -32,7 +28,7 @@ class IsOwnerOrAdmin(permissions.BasePermission):
     Object-level permission to only allow owners of an object or admins to edit it
     """
     def has_object_permission(self, request, view, obj):
-        if request.user.profile.role == ROLE_ADMIN:
+        if get_principal(request).is_admin:
             return True
         return obj.created_by == request.user 
 
@@ -41,29 +37,22 @@ class CanApproveRequests(permissions.BasePermission):
     Permission check for users who can approve requests
     """
     def has_permission(self, request, view):
-        return bool(
-            request.user and 
-            request.user.is_authenticated and 
-            request.user.profile.role in [ROLE_ADMIN, ROLE_MANAGER]
-        )
+        return get_principal(request).can_approve_requests
 
 class IsRequesterOrApprover(permissions.BasePermission):
     """
     Object-level permission to only allow requesters or approvers to view/edit
     """
     def has_object_permission(self, request, view, obj):
-        user = request.user
+        principal = get_principal(request)
         
         # Allow if user is the requester
-        if obj.requester == user:
-            return True
-            
-        # Allow if user is an approver for this request
-        if obj.approvals.filter(approver=user).exists():
+        if obj.requester_id == principal.user.pk:
             return True
             
         # Allow if user is admin
-        if user.profile.role == ROLE_ADMIN:
+        if principal.is_admin:
             return True
             
-        return False 
\ No newline at end of file
+        # Allow if user is an approver for this request
+        return principal.is_approver(obj) 
\ No newline at end of file
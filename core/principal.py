@@ -0,0 +1,68 @@
+from django.apps import apps
+from django.core.exceptions import ObjectDoesNotExist
+
+from .constants import ROLE_ADMIN, ROLE_MANAGER
+
+
+class Principal:
+    """
+    The user behind a request, with the profile fields that permission
+    checks and queryset scoping need.
+
+    Built once per request by get_principal and shared by every
+    permission class and get_queryset, so the profile is read once and
+    scoping filters on ``department_id`` without loading the department.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.is_authenticated = bool(user and user.is_authenticated)
+        self.profile = None
+        if self.is_authenticated:
+            try:
+                self.profile = user.profile
+            except ObjectDoesNotExist:
+                pass
+        self.role = getattr(self.profile, 'role', None)
+        self.department_id = getattr(self.profile, 'department_id', None)
+        # Request pk -> whether this user recorded a decision on it
+        self._approvals = {}
+
+    @property
+    def is_admin(self):
+        return self.role == ROLE_ADMIN
+
+    @property
+    def is_manager(self):
+        return self.role == ROLE_MANAGER
+
+    @property
+    def can_approve_requests(self):
+        return self.role in (ROLE_ADMIN, ROLE_MANAGER)
+
+    def is_approver(self, request):
+        """
+        Whether this user decided on ``request`` (an instance or pk), read
+        once per request. Lists need no such check per object: their
+        get_queryset scopes them with a semi-join on the approvals.
+        """
+        pk = getattr(request, 'pk', request)
+        if pk not in self._approvals:
+            RequestApproval = apps.get_model('requests', 'RequestApproval')
+            self._approvals[pk] = self.is_authenticated and (
+                RequestApproval.objects.filter(request_id=pk, approver=self.user).exists()
+            )
+        return self._approvals[pk]
+
+
+def get_principal(request):
+    """Return the principal of ``request``, built on first use"""
+    # Kept on the HttpRequest so DRF views and plain middleware share it
+    http_request = getattr(request, '_request', request)
+    user = getattr(request, 'user', None)
+    principal = getattr(http_request, '_principal', None)
+    # Rebuilt when authentication replaced the user, e.g. by a JWT
+    if principal is None or principal.user is not user:
+        principal = Principal(user)
+        http_request._principal = principal
+    return principal
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import qrcode
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+# Bump when the rendering code changes in a way the options do not capture
+RENDERER_VERSION = 1
+
+QR_RENDER_OPTIONS = {
+    'version': 1,
+    'error_correction': 'L',
+    'box_size': 10,
+    'border': 4,
+}
+
+QR_CODE_CACHE_DEFAULTS = {
+    'MEMORY_ENTRIES': 256,
+    'DIRECTORY': 'qr_codes',
+}
+
+ERROR_CORRECTION_LEVELS = {
+    'L': qrcode.constants.ERROR_CORRECT_L,
+    'M': qrcode.constants.ERROR_CORRECT_M,
+    'Q': qrcode.constants.ERROR_CORRECT_Q,
+    'H': qrcode.constants.ERROR_CORRECT_H,
+}
+
+
+def render_qr_png(data, options=None):
+    """
+    Render a QR code as PNG bytes
+
+    Kept free of Django state so it can run in worker processes.
+
+    Args:
+        data (str): Data to encode in QR code
+        options (dict): Rendering options, defaults to QR_RENDER_OPTIONS
+
+    Returns:
+        bytes: PNG image
+    """
+    options = {**QR_RENDER_OPTIONS, **(options or {})}
+    qr = qrcode.QRCode(
+        version=options['version'],
+        error_correction=ERROR_CORRECTION_LEVELS[options['error_correction']],
+        box_size=options['box_size'],
+        border=options['border'],
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class QRCodeCache:
+    """
+    Content-addressed cache of rendered QR codes.
+
+    PNGs are keyed by a hash of the payload and the rendering options. The
+    first tier is a small in-process LRU; the second is the file storage,
+    where each PNG lives at a path derived from its key. Identical payloads
+    therefore share one file, and a file only has to be rendered again when
+    the payload (or the renderer) changes.
+    """
+
+    def __init__(self, memory_entries=256, directory='qr_codes',
+                 storage=None, options=None):
+        self.memory_entries = memory_entries
+        self.directory = directory.strip('/')
+        self.storage = storage or default_storage
+        self.options = {**QR_RENDER_OPTIONS, **(options or {})}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls):
+        """Build a cache from the ``QR_CODE_CACHE`` setting"""
+        options = {
+            **QR_CODE_CACHE_DEFAULTS,
+            **getattr(settings, 'QR_CODE_CACHE', {}),
+        }
+        return cls(
+            memory_entries=options['MEMORY_ENTRIES'],
+            directory=options['DIRECTORY'],
+        )
+
+    def key_for(self, data):
+        """Return the content key for ``data`` rendered with our options"""
+        material = json.dumps(
+            [RENDERER_VERSION, self.options, data],
+            sort_keys=True,
+        )
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def path_for(self, data):
+        """Return the storage path the PNG for ``data`` lives at"""
+        key = self.key_for(data)
+        return f'{self.directory}/{key[:2]}/{key}.png'
+
+    def get_png(self, data):
+        """Return PNG bytes for ``data``, rendering only on a full miss"""
+        key = self.key_for(data)
+        png = self._memory_get(key)
+        if png is not None:
+            return png
+
+        path = self.path_for(data)
+        png = self._disk_get(path)
+        if png is None:
+            png = render_qr_png(data, self.options)
+            self.misses += 1
+            self._disk_put(path, png)
+        else:
+            self.disk_hits += 1
+        self._memory_put(key, png)
+        return png
+
+    def get_path(self, data):
+        """Make sure the PNG for ``data`` is in storage and return its path"""
+        path = self.path_for(data)
+        if self.storage.exists(path):
+            self.disk_hits += 1
+            return path
+        return self.put(data, render_qr_png(data, self.options))
+
+    def put(self, data, png):
+        """Store PNG bytes rendered elsewhere (e.g. in a worker process)"""
+        self.misses += 1
+        path = self.path_for(data)
+        self._disk_put(path, png)
+        self._memory_put(self.key_for(data), png)
+        return path
+
+    def replace(self, data, png):
+        """
+        Store PNG bytes over the file for ``data``, e.g. to repair it
+
+        The file is shared by every asset with this payload, so it is
+        swapped in place atomically and never missing in between. Storages
+        without local paths cannot do that and keep the existing file.
+        """
+        path = self.path_for(data)
+        try:
+            target = self.storage.path(path)
+        except NotImplementedError:
+            if self.storage.exists(path):
+                logger.warning("Cannot replace %s in place, keeping it", path)
+                return path
+            return self.put(data, png)
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(png)
+            os.replace(temporary, target)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self.misses += 1
+        self._memory_put(self.key_for(data), png)
+        return path
+
+    def exists(self, data):
+        return self.storage.exists(self.path_for(data))
+
+    def owns(self, path):
+        """Whether ``path`` is a content-addressed file of this cache"""
+        return bool(path) and path.startswith(self.directory + '/')
+
+    def stats(self):
+        with self._lock:
+            cached = len(self._memory)
+        return {
+            'memory_entries': cached,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+        }
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+    def _memory_get(self, key):
+        with self._lock:
+            png = self._memory.get(key)
+            if png is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+            return png
+
+    def _memory_put(self, key, png):
+        if self.memory_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = png
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_get(self, path):
+        try:
+            with self.storage.open(path, 'rb') as f:
+                return f.read()
+        except (FileNotFoundError, OSError):
+            return None
+
+    def _disk_put(self, path, png):
+        if self.storage.exists(path):
+            return
+        saved = self.storage.save(path, ContentFile(png))
+        if saved != path:
+            # Somebody else stored the same content first, keep theirs
+            self.storage.delete(saved)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_qr_cache():
+    """Return the process-wide QR code cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QRCodeCache.from_settings()
+    return _cache
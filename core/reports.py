@@ -1,22 +1,27 @@
 from datetime import datetime, timedelta
-from django.utils import timezone
 from django.db.models import Count, Sum, Avg
+from django.core.files import File
 from django.core.files.base import ContentFile
 import csv
 import io
+import tempfile
 import json
 
 class ReportGenerator:
     """Base class for generating reports"""
     
     @staticmethod
-    def generate_csv(data, headers):
-        """Generate CSV report"""
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=headers)
+    def generate_csv(data, headers, name='report.csv'):
+        """Generate CSV report, writing rows to a temporary file as they arrive"""
+        output = tempfile.TemporaryFile()
+        text = io.TextIOWrapper(output, encoding='utf-8', newline='')
+        writer = csv.DictWriter(text, fieldnames=headers)
         writer.writeheader()
         writer.writerows(data)
-        return ContentFile(output.getvalue().encode('utf-8'))
+        text.flush()
+        text.detach()
+        output.seek(0)
+        return File(output, name=name)
 
     @staticmethod
     def generate_json(data):
@@ -27,35 +32,27 @@ class ReportScheduler:
     """Class for scheduling report generation"""
     
     @staticmethod
-    def schedule_report(report_type, parameters, schedule_time):
-        """Schedule a report for generation"""
-        from apps.reports.models import Report
+    def schedule_report(report_type, parameters, schedule_time, report_format='PDF'):
+        """Queue a report of the first template of ``report_type``"""
+        from apps.reports.jobs import ReportJobService
+        from apps.reports.models import ReportTemplate
         
-        report = Report.objects.create(
-            report_type=report_type,
-            parameters=parameters,
-            scheduled_time=schedule_time,
-            status='SCHEDULED'
+        template = ReportTemplate.objects.filter(template_type=report_type).first()
+        if template is None:
+            raise ValueError(f"No template for report type {report_type}")
+        return ReportJobService.enqueue(
+            template,
+            report_format,
+            parameters,
+            run_at=schedule_time
         )
-        return report
 
     @staticmethod
     def process_scheduled_reports():
-        """Process all scheduled reports that are due"""
-        from apps.reports.models import Report
+        """
+        Run due report jobs in this process, for deployments without a
+        ``run_report_jobs`` worker
+        """
+        from apps.reports.jobs import ReportJobService
         
-        now = timezone.now()
-        scheduled_reports = Report.objects.filter(
-            status='SCHEDULED',
-            scheduled_time__lte=now
-        )
-        
-        for report in scheduled_reports:
-            try:
-                # Generate report
-                report.generate()
-                report.status = 'COMPLETED'
-            except Exception as e:
-                report.status = 'FAILED'
-                report.error_message = str(e)
-            report.save() 
\ No newline at end of file
+        return ReportJobService.run_due() 
\ No newline at end of file
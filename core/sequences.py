@@ -0,0 +1,161 @@
+import string
+import threading
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import IdSequence
+
+ID_SEQUENCES_DEFAULTS = {
+    'BLOCK_SIZE': 50,
+    'WIDTH': 6,
+}
+
+# Digits before letters, so fixed-width IDs sort like the numbers they encode
+ALPHABET = string.digits + string.ascii_uppercase
+
+# IDs looked up per query when skipping already stored ones
+TAKEN_CHECK_CHUNK = 500
+
+# Prefix -> [(model, field)] holding IDs issued for it, e.g. older random ones
+_registry = defaultdict(list)
+
+
+def register_id_prefix(prefix, model, field):
+    """
+    Declare that ``model.field`` stores IDs with ``prefix``.
+
+    Values already present there, such as IDs generated before sequences
+    existed, are skipped when a block of numbers is reserved.
+    """
+    _registry[prefix].append((model, field))
+
+
+def id_sequence_settings():
+    return {**ID_SEQUENCES_DEFAULTS, **getattr(settings, 'ID_SEQUENCES', {})}
+
+
+def encode(number, width):
+    """Base-36 ``number``, zero padded to ``width`` characters"""
+    digits = ''
+    while number:
+        number, remainder = divmod(number, len(ALPHABET))
+        digits = ALPHABET[remainder] + digits
+    return digits.rjust(width, '0')
+
+
+class IdAllocator:
+    """
+    Hands out IDs made of a prefix and a fixed-width base-36 sequence
+    number, e.g. AST00004F, so they are unique and sort in allocation
+    order.
+
+    Numbers are reserved from the IdSequence row of the prefix with one
+    UPDATE, ``block_size`` at a time or as many as a bulk allocation asks
+    for; no two reservations overlap, so IDs never need a retry. The
+    unused rest of a block is kept in memory, and only once the reserving
+    transaction commits: a rolled back reservation is handed out again by
+    the table, never from memory.
+    """
+
+    def __init__(self, block_size=50, width=6):
+        self.block_size = block_size
+        self.width = width
+        self._free = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        """Build an allocator from the ``ID_SEQUENCES`` setting"""
+        options = id_sequence_settings()
+        return cls(block_size=options['BLOCK_SIZE'], width=options['WIDTH'])
+
+    def allocate(self, prefix, count=1):
+        """Return ``count`` new IDs for ``prefix``"""
+        ids = []
+        with self._lock:
+            free = self._free[prefix]
+            while free and len(ids) < count:
+                ids.append(free.popleft())
+
+        while len(ids) < count:
+            missing = count - len(ids)
+            size = max(missing, self.block_size)
+            start = self.reserve(prefix, size)
+            candidates = [
+                f"{prefix}{encode(number, self.width)}"
+                for number in range(start, start + size)
+            ]
+            taken = self.taken(prefix, candidates)
+            candidates = [candidate for candidate in candidates if candidate not in taken]
+            ids.extend(candidates[:missing])
+            if candidates[missing:]:
+                transaction.on_commit(
+                    lambda rest=candidates[missing:]: self.release(prefix, rest)
+                )
+        return ids
+
+    def release(self, prefix, ids):
+        """Keep reserved but unused IDs for later allocations"""
+        with self._lock:
+            self._free[prefix].extend(ids)
+
+    @staticmethod
+    def reserve(prefix, count):
+        """Reserve ``count`` numbers for ``prefix``; returns the first one"""
+        with transaction.atomic():
+            updated = IdSequence.objects.filter(prefix=prefix).update(
+                next_value=F('next_value') + count
+            )
+            if not updated:
+                try:
+                    with transaction.atomic():
+                        IdSequence.objects.create(prefix=prefix, next_value=1 + count)
+                    return 1
+                except IntegrityError:
+                    # Created concurrently, reserve from that row instead
+                    IdSequence.objects.filter(prefix=prefix).update(
+                        next_value=F('next_value') + count
+                    )
+            # Our own UPDATE holds the row, so nobody moved it since
+            next_value = IdSequence.objects.filter(prefix=prefix).values_list(
+                'next_value', flat=True
+            ).get()
+            return next_value - count
+
+    @staticmethod
+    def taken(prefix, candidates):
+        """IDs among ``candidates`` already stored in a registered field"""
+        taken = set()
+        for model, field in _registry.get(prefix, ()):
+            for i in range(0, len(candidates), TAKEN_CHECK_CHUNK):
+                taken.update(model._default_manager.filter(
+                    **{f'{field}__in': candidates[i:i + TAKEN_CHECK_CHUNK]}
+                ).values_list(field, flat=True))
+        return taken
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_id_allocator():
+    """Return the process-wide ID allocator"""
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                _allocator = IdAllocator.from_settings()
+    return _allocator
+
+
+def next_id(prefix):
+    """Return one new ID for ``prefix``"""
+    return get_id_allocator().allocate(prefix)[0]
+
+
+def allocate_ids(prefix, count):
+    """Return ``count`` new IDs for ``prefix``, reserved as one block"""
+    return get_id_allocator().allocate(prefix, count)
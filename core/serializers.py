@@ -30,3 +30,30 @@ class AuditableModelSerializer(TrackableModelSerializer):
     is_active = serializers.BooleanField(read_only=True)
     deactivated_at = serializers.DateTimeField(read_only=True)
     deactivated_by = serializers.PrimaryKeyRelatedField(read_only=True)
+
+class ExpandableFieldsMixin:
+    """
+    Serializer mixin replacing flat fields with nested representations
+    requested through ``?expand=field,other_field``.
+
+    ``expandable_fields`` maps a field name to ``(serializer_class, kwargs)``.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in self.requested_expansions(self.context):
+            serializer_class, options = self.expandable_fields[name]
+            self.fields[name] = serializer_class(read_only=True, **options)
+
+    @classmethod
+    def requested_expansions(cls, context):
+        """Expandable field names asked for by the request in ``context``"""
+        request = context.get('request')
+        if request is None:
+            return []
+        requested = request.query_params.get('expand', '')
+        return [
+            name for name in dict.fromkeys(part.strip() for part in requested.split(','))
+            if name in cls.expandable_fields
+        ]
@@ -1,42 +1,58 @@
-from django.db import transaction
-from django.contrib.auth import get_user_model
-from apps.users.models import UserProfile
+import logging
 import json
+
+from django.db import transaction
 from django.core.exceptions import ValidationError
 
-User = get_user_model()
+from .utils import CacheManager
+
+logger = logging.getLogger(__name__)
 
 class BaseService:
-    """Base service class with performance optimizations"""
-    
+    """
+    Base service class with performance optimizations
+
+    Subclasses set ``model`` (and ``history_model`` to record bulk updates)
+    and may override ``validate`` and ``_process_batch``.
+    """
+
+    model = None
+    # Model with model_id and changes fields, written by bulk_update_with_history
+    history_model = None
+
     @classmethod
-    def bulk_create_with_profiles(cls, users_data, batch_size=100):
+    def validate(cls, data):
+        """Raise ValidationError for invalid rows; accepts everything by default"""
+
+    @classmethod
+    def _process_batch(cls, batch):
+        return cls.model.objects.bulk_create([cls.model(**data) for data in batch])
+
+    @classmethod
+    def bulk_create_validated(cls, rows, batch_size=100):
         """
-        Bug: No validation before bulk creation
-        Bottleneck: Single transaction for large datasets
+        Validate every row, then create them one transaction per batch
+
+        Nothing is written when a row fails validation.
         """
+        errors = []
+        for number, data in enumerate(rows, 1):
+            try:
+                cls.validate(data)
+            except ValidationError as e:
+                errors.append(f"Row {number}: {'; '.join(e.messages)}")
+        if errors:
+            raise ValidationError(errors)
+
+        created = []
         try:
-            # Validate data first
-            errors = []
-            for data in users_data:
-                try:
-                    cls.validate_user_data(data)
-                except ValidationError as e:
-                    errors.append(f"Error in data: {data.get('email')} - {str(e)}")
-            
-            if errors:
-                raise ValidationError(errors)
-                
-            # Split into smaller transactions
-            for i in range(0, len(users_data), batch_size):
+            for i in range(0, len(rows), batch_size):
                 with transaction.atomic():
-                    batch = users_data[i:i + batch_size]
-                    # Process batch
-                    cls._process_batch(batch)
-                    
+                    created.extend(cls._process_batch(rows[i:i + batch_size]))
         except Exception as e:
             logger.error(f"Bulk creation failed: {str(e)}")
             raise
+        return created
     
     @classmethod
     def bulk_update(cls, objects, fields, batch_size=100):
@@ -51,14 +67,16 @@ class BaseService:
     def bulk_update_with_history(cls, objects, fields, batch_size=100):
         """Bulk update with history tracking"""
         with transaction.atomic():
-            # Create history records
-            history_records = [
-                ModelHistory(
-                    model_id=obj.id,
-                    changes=json.dumps({field: getattr(obj, field) for field in fields})
-                ) for obj in objects
-            ]
-            ModelHistory.objects.bulk_create(history_records)
+            if cls.history_model is not None:
+                # Create history records
+                cls.history_model.objects.bulk_create([
+                    cls.history_model(
+                        model_id=obj.pk,
+                        changes=json.dumps(
+                            {field: getattr(obj, field) for field in fields}, default=str
+                        )
+                    ) for obj in objects
+                ])
             
             # Perform bulk update
             return cls.model.objects.bulk_update(objects, fields, batch_size=batch_size)
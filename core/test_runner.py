@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .cache_backend import MEMORY
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs the tests against an empty in-memory cache of their own instead
+    of the SQLite file shared by the running site
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        caches = {**settings.CACHES}
+        caches['default'] = {**caches['default'], 'LOCATION': MEMORY}
+        self.cache_settings = override_settings(CACHES=caches)
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        super().teardown_test_environment(**kwargs)
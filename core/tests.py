@@ -0,0 +1,182 @@
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps as django_apps
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from apps.assets.models import Asset
+from apps.categories.models import Category
+from apps.tags.models import Tag
+from .counters import (
+    ASSET_STATUS, CATEGORY_ASSETS, TAG_ASSETS, CounterService,
+)
+from .models import Counter
+from .qrcodes import QRCodeCache, render_qr_png
+from .sequences import IdAllocator, encode
+
+
+class QRCodeCacheTests(SimpleTestCase):
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        self.storage = FileSystemStorage(location=location)
+        self.cache = QRCodeCache(memory_entries=2, storage=self.storage)
+
+    def test_paths_are_content_addressed(self):
+        path = self.cache.path_for('Asset ID: AST1')
+        self.assertTrue(self.cache.owns(path))
+        self.assertEqual(path, QRCodeCache(storage=self.storage).path_for('Asset ID: AST1'))
+        self.assertNotEqual(path, self.cache.path_for('Asset ID: AST2'))
+        # Rendering options are part of the key
+        self.assertNotEqual(
+            path, QRCodeCache(options={'box_size': 5}).path_for('Asset ID: AST1')
+        )
+        self.assertFalse(self.cache.owns('asset_qr_codes/asset_qr_AST1.png'))
+
+    def test_tiers(self):
+        png = self.cache.get_png('one')
+        self.assertEqual(png, render_qr_png('one'))
+        self.assertTrue(self.cache.exists('one'))
+        self.assertEqual(self.cache.get_png('one'), png)
+        self.cache.clear_memory()
+        self.assertEqual(self.cache.get_png('one'), png)
+        self.assertEqual(
+            self.cache.stats(),
+            {'memory_entries': 1, 'memory_hits': 1, 'disk_hits': 1, 'misses': 1}
+        )
+
+        # The memory tier is a bounded LRU
+        self.cache.get_png('two')
+        self.cache.get_png('one')
+        self.cache.get_png('three')
+        self.assertEqual(list(self.cache._memory), [
+            self.cache.key_for('one'), self.cache.key_for('three')
+        ])
+
+    def test_get_path_renders_each_payload_once(self):
+        path = self.cache.get_path('one')
+        self.assertEqual(self.cache.get_path('one'), path)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+        self.assertEqual(self.storage.listdir(os.path.dirname(path))[1], [os.path.basename(path)])
+
+    def test_replace_swaps_the_shared_file_in_place(self):
+        path = self.cache.get_path('one')
+        self.cache.replace('one', b'repaired')
+        with self.storage.open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'repaired')
+        # No temporary files are left next to it
+        self.assertEqual(self.storage.listdir(os.path.dirname(path))[1], [os.path.basename(path)])
+        self.assertEqual(self.cache.replace('two', b'new'), self.cache.path_for('two'))
+        self.assertTrue(self.cache.exists('two'))
+
+
+class IdAllocationTests(TestCase):
+    def test_codes_are_unique_and_sort_in_creation_order(self):
+        codes = [
+            Category.objects.create(name=f'Category {i}').code for i in range(3)
+        ]
+        self.assertEqual(len(set(codes)), 3)
+        self.assertEqual(codes, sorted(codes))
+        self.assertTrue(all(code.startswith('CAT') for code in codes))
+        self.assertLess(encode(35, 6), encode(36, 6))
+
+    def test_bulk_allocation_skips_stored_ids(self):
+        Category.objects.create(name='Legacy', code='CAT000002')
+        allocator = IdAllocator(block_size=5)
+        self.assertEqual(
+            allocator.allocate('CAT', 3), ['CAT000001', 'CAT000003', 'CAT000004']
+        )
+
+        # The rest of a block is only reused once its reservation committed
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(allocator.allocate('CAT'), ['CAT000006'])
+        with self.assertNumQueries(0):
+            self.assertEqual(allocator.allocate('CAT', 2), ['CAT000007', 'CAT000008'])
+
+
+class AssetCounterTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Laptops')
+        self.other_category = Category.objects.create(name='Phones')
+        self.tags = [Tag.objects.create(name=f'Tag {i}') for i in range(3)]
+        self.asset = self.create_asset()
+
+    def create_asset(self):
+        return Asset.objects.create(
+            name='Asset',
+            category=self.category,
+            purchase_date=timezone.now().date(),
+            purchase_price=Decimal('100.00')
+        )
+
+    def assertCounters(self, name, expected):
+        stored = {
+            key: value
+            for key, value in CounterService.get_many(name).items() if value
+        }
+        self.assertEqual(stored, {str(k): v for k, v in expected.items()})
+
+    def test_tag_counters_follow_m2m_changes(self):
+        first, second, third = self.tags
+        self.asset.tags.add(first, second)
+        self.asset.tags.add(first)  # Already linked, not counted twice
+        third.asset_set.add(self.asset, self.create_asset())
+        self.assertCounters(TAG_ASSETS, {first.pk: 1, second.pk: 1, third.pk: 2})
+
+        self.asset.tags.remove(second, second)
+        third.asset_set.clear()
+        self.assertCounters(TAG_ASSETS, {first.pk: 1})
+
+        self.asset.delete()
+        self.assertCounters(TAG_ASSETS, {})
+        self.assertEqual(first.asset_count, 0)
+
+    def test_category_and_status_counters(self):
+        self.asset.category = self.other_category
+        self.asset.asset_status = 'ASSIGNED'
+        self.asset.save()
+        self.create_asset()
+        self.assertCounters(CATEGORY_ASSETS, {
+            self.category.pk: 1, self.other_category.pk: 1
+        })
+        self.assertCounters(ASSET_STATUS, {'AVAILABLE': 1, 'ASSIGNED': 1})
+        self.assertEqual(self.other_category.asset_count, 1)
+
+    def test_reconcile_repairs_drift(self):
+        self.asset.tags.add(self.tags[0])
+        Counter.objects.filter(name=TAG_ASSETS).update(value=5)
+        Asset.objects.update(asset_status='RETIRED')  # No signals
+
+        self.assertEqual(
+            CounterService.reconcile(TAG_ASSETS),
+            {str(self.tags[0].pk): (5, 1)}
+        )
+        CounterService.reconcile(ASSET_STATUS)
+        self.assertCounters(ASSET_STATUS, {'RETIRED': 1})
+        self.assertEqual(CounterService.reconcile(TAG_ASSETS), {})
+
+    def test_migration_backfills_counters(self):
+        self.asset.tags.add(self.tags[0])
+        Counter.objects.all().delete()
+        migration = import_module('core.migrations.0003_backfill_counters')
+        migration.backfill_counters(django_apps, None)
+        self.assertCounters(TAG_ASSETS, {self.tags[0].pk: 1})
+        self.assertCounters(CATEGORY_ASSETS, {self.category.pk: 1})
+        self.assertCounters(ASSET_STATUS, {'AVAILABLE': 1})
+        # Counts reconcile finds no drift in
+        for name in (TAG_ASSETS, CATEGORY_ASSETS, ASSET_STATUS):
+            self.assertEqual(CounterService.reconcile(name, repair=False), {})
+
+    def test_counters_commit_with_the_row(self):
+        with mock.patch.object(CounterService, 'increment', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.create_asset()
+        self.assertEqual(Asset.objects.count(), 1)
+        self.assertCounters(CATEGORY_ASSETS, {self.category.pk: 1})
+
@@ -1,10 +1,11 @@
 from rest_framework.throttling import UserRateThrottle
+from core.principal import get_principal
 
 class CustomUserRateThrottle(UserRateThrottle):
     rate = '100/minute'
     
     def allow_request(self, request, view):
-        if request.user.profile.role == ROLE_ADMIN:
+        if get_principal(request).is_admin:
             return True
         return super().allow_request(request, view) 
 
@@ -1,16 +1,20 @@
+import os
+import socket
 import uuid
 from django.utils import timezone
 from django.core.cache import cache
 from .constants import CACHE_TIMEOUT
-import qrcode
-from io import BytesIO
+from .cache_tags import GLOBAL_TAG, TaggedCache
 from django.core.files.base import ContentFile
-import string
-import random
+from .qrcodes import get_qr_cache
+from .pdf import get_pdf_pool, render_template_file
 
 def generate_qr_code(data):
     """
     Generate QR code from data
+
+    Rendered PNGs are shared through the content-addressed QR cache, so
+    the same payload is only rendered once.
     
     Args:
         data (str): Data to encode in QR code
@@ -18,38 +22,7 @@ def generate_qr_code(data):
     Returns:
         ContentFile: QR code image as a ContentFile
     """
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert PIL image to ContentFile
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    
-    return ContentFile(buffer.getvalue())
-
-def generate_unique_id(prefix='', length=6):
-    """
-    Generate a unique ID with optional prefix
-    
-    Args:
-        prefix (str): Prefix for the ID
-        length (int): Length of random part
-        
-    Returns:
-        str: Generated unique ID
-    """
-    chars = string.ascii_uppercase + string.digits
-    random_str = ''.join(random.choices(chars, k=length))
-    return f"{prefix}{random_str}" if prefix else random_str
+    return ContentFile(get_qr_cache().get_png(data))
 
 def get_file_path(instance, filename):
     """
@@ -91,10 +64,9 @@ def generate_pdf(template_file, data):
     Returns:
         ContentFile: Generated PDF as ContentFile
     """
-    # TODO: Implement PDF generation
-    # This is a placeholder that should be implemented based on your PDF generation needs
-    # You might want to use libraries like reportlab, WeasyPrint, or xhtml2pdf
-    pass
+    html = render_template_file(template_file, data)
+    pdf, timings = get_pdf_pool().render(html)
+    return ContentFile(pdf, name='report.pdf')
 
 def generate_excel(data, format='EXCEL'):
     """
@@ -134,16 +106,27 @@ class CacheManager:
         cache.delete(key)
 
     @staticmethod
-    def get_or_set_with_version(key, callback, timeout=CACHE_TIMEOUT):
-        """Version-aware caching"""
-        cache_key = f"{key}_v{get_cache_version()}"
-        return CacheManager.get_or_set(cache_key, callback, timeout)
+    def get_or_set_with_version(key, callback, timeout=CACHE_TIMEOUT, tags=()):
+        """
+        Version-aware caching: the entry is dropped whenever one of ``tags``
+        is invalidated, or all versioned entries by bump_version()
+        """
+        return TaggedCache.get_or_set(key, callback, (GLOBAL_TAG, *tags), timeout)
+
+    @staticmethod
+    def bump_version():
+        """Drop every entry cached with get_or_set_with_version"""
+        TaggedCache.invalidate(GLOBAL_TAG)
+
+    @staticmethod
+    def invalidate_tags(*tags):
+        """Drop the versioned entries depending on any of ``tags``"""
+        TaggedCache.invalidate(*tags)
 
     @staticmethod
     def invalidate_patterns(pattern):
-        """Invalidate all keys matching pattern"""
-        keys = cache.keys(f"*{pattern}*")
-        cache.delete_many(keys)
+        """Invalidate all keys containing pattern"""
+        return cache.delete_pattern(f"*{pattern}*")
 
 def get_current_user(request):
     """Get the current authenticated user."""
@@ -158,22 +141,8 @@ def update_model_status(instance, status, user=None):
     instance.save()
     return instance
 
-def send_notification(notification_type, recipient, context):
+def worker_name():
     """
-    Send notifications to users
-    Args:
-        notification_type (str): Type of notification
-        recipient (User): User to receive notification
-        context (dict): Context data for notification
+    Identify this process to the work queues it takes items from
     """
-    # TODO: Implement actual notification sending logic
-    # This is a placeholder that just prints the notification
-    print(f"Sending {notification_type} notification to {recipient}")
-    print(f"Context: {context}")
-    
-    # In future, implement actual notification sending:
-    # - Email notifications
-    # - In-app notifications
-    # - Push notifications
-    # etc.
-    return True
+    return f'{socket.gethostname()}:{os.getpid()}'